@@ -0,0 +1,280 @@
+# Benchmark các hàm báo cáo của database/db_manager.py trên DB cỡ thật (100k / 1M / 10M dòng ActivityLog).
+# - DB mẫu sinh bằng database/generator.py (365 ngày), lưu lại để lần sau dùng tiếp;
+#   tự sinh lại khi schema đổi phiên bản.
+# - Mỗi hàm: chạy nóng 1 lần, đo REPEAT lần, lấy trung vị (ms).
+# - Ghi lại các câu SQL mà hàm chạy và EXPLAIN QUERY PLAN của chúng: bảng nào bị quét toàn bộ
+#   (SCAN không dùng index) mà baseline không có -> coi là hồi quy.
+# - So với baseline.json, thoát với mã 1 khi:
+#     * có SCAN mới (mọi máy),
+#     * query plan khác baseline (chỉ khi cùng phiên bản SQLite: bản khác có thể chọn plan khác mà không sai),
+#     * chậm hơn quá --tolerance (chỉ khi cùng môi trường với lúc ghi baseline: python, sqlite, máy, host).
+#   Khác môi trường thì ms tuyệt đối không so được với nhau -> chỉ cảnh báo. --timing fail/warn để ép.
+#
+#   python -m benchmarks.bench_reports                       # 100k + 1M
+#   python -m benchmarks.bench_reports --sizes 10M
+#   python -m benchmarks.bench_reports --update-baseline     # ghi kết quả hiện tại làm baseline
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from database import db_manager, generator
+from database.db_manager import db
+from database.migrations import SCHEMA_VERSION
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_FIXTURES_DIR = os.path.join(tempfile.gettempdir(), 'codefocus-bench')
+SIZES = {'100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+FIXTURE_DAYS = 365
+# Hàm quá nhanh thì sai số đo lớn hơn cả tolerance -> cho phép chậm thêm ít nhất chừng này
+MIN_SLACK_MS = 1.0
+# Các trường của 'environment' phải trùng với baseline thì mới so thời gian
+ENVIRONMENT_KEYS = ('python', 'sqlite', 'machine', 'host')
+
+
+def _breakdown(day):
+    sessions, app_stats = db_manager.get_daily_breakdown(day)
+    # Danh sách Session trả về dạng query lười -> duyệt hết như ReportTab
+    return list(sessions), app_stats
+
+
+# (tên, hàm(ngày cần báo cáo))
+CASES = [
+    ('get_total_work_time_str', db_manager.get_total_work_time_str),
+    ('get_daily_breakdown', _breakdown),
+    ('get_daily_health_report', db_manager.get_daily_health_report),
+    ('get_historical_data[7]', lambda day: db_manager.get_historical_data(7)),
+    ('get_historical_data[30]', lambda day: db_manager.get_historical_data(30)),
+    ('get_historical_data[365]', lambda day: db_manager.get_historical_data(365)),
+    ('get_history_series[365]', lambda day: db_manager.get_history_series(365)),
+    ('get_history_series[all]', lambda day: db_manager.get_history_series(None)),
+]
+
+# Bước quét toàn bảng trong EXPLAIN QUERY PLAN ('SCAN activitylog', không phải '... USING INDEX')
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+# peewee đặt bí danh cho bảng ("activitylog" AS "t1") -> đổi lại thành tên bảng trong plan
+TABLE_ALIAS = re.compile(r'"(\w+)" AS "(\w+)"')
+PLAN_TABLE = re.compile(r'^(SCAN|SEARCH) (\w+)')
+
+
+# --- DB MẪU ---
+def fixture_path(size, fixtures_dir):
+    return os.path.join(fixtures_dir, f"reports-{size}.db")
+
+
+def _fixture_ok(path):
+    if not os.path.exists(path):
+        return False
+    # Mở bằng sqlite3 để không kích hoạt migration của app
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    finally:
+        conn.close()
+
+
+def ensure_fixture(size, fixtures_dir, rebuild=False):
+    path = fixture_path(size, fixtures_dir)
+    if rebuild or not _fixture_ok(path):
+        os.makedirs(fixtures_dir, exist_ok=True)
+        generator._remove_db_files(path)
+        print(f"⏳ Sinh DB mẫu {size} dòng -> {path}")
+        generator.generate(path, days=FIXTURE_DAYS, rows=SIZES[size], seed=0)
+        db.checkpoint('TRUNCATE')
+        db.close()
+    return path
+
+
+def open_fixture(path):
+    db_manager.configure_database(path)
+    db.connect()
+    # Benchmark không được sửa DB mẫu
+    db.use_read_connection()
+
+
+def report_day():
+    """Ngày có dữ liệu gần nhất của DB mẫu (DB sinh từ hôm trước vẫn đo được như cũ)"""
+    latest = db_manager.ActivityLog.select(db_manager.fn.MAX(db_manager.ActivityLog.timestamp)).scalar()
+    return db_manager.format_date_str(latest)[:10] if latest else datetime.date.today()
+
+
+# --- ĐO ---
+@contextlib.contextmanager
+def capture_sql():
+    """Ghi lại các câu (sql, params) chạy qua db trong khối with"""
+    captured = []
+    original = db.execute_sql
+
+    def execute_sql(sql, params=None):
+        captured.append((sql, params))
+        return original(sql, params)
+
+    db.execute_sql = execute_sql
+    try:
+        yield captured
+    finally:
+        del db.execute_sql
+
+
+def query_plans(statements):
+    plans = []
+    for sql, params in statements:
+        aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+        rows = db.execute_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+        plans.append([PLAN_TABLE.sub(lambda m: f"{m.group(1)} {aliases.get(m.group(2), m.group(2))}", row[-1])
+                      for row in rows])
+    return plans
+
+
+def full_scans(plans):
+    return sorted({m.group(1) for plan in plans for step in plan for m in [FULL_SCAN.match(step)] if m})
+
+
+def run_case(func, day, repeat):
+    func(day)  # chạy nóng: page cache, cache chuỗi
+    with capture_sql() as statements:
+        func(day)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(day)
+        timings.append((time.perf_counter() - started) * 1000)
+    plans = query_plans(statements)
+    return {'ms': round(statistics.median(timings), 3), 'min_ms': round(min(timings), 3),
+            'queries': len(statements), 'plans': plans, 'full_scans': full_scans(plans)}
+
+
+def run_size(size, fixtures_dir, repeat, rebuild=False):
+    path = ensure_fixture(size, fixtures_dir, rebuild)
+    open_fixture(path)
+    try:
+        day = report_day()
+        rows = db_manager.ActivityLog.select().count()
+        print(f"\n📊 {size}: {rows:,} dòng ActivityLog, ngày báo cáo {day}")
+        results = {}
+        for name, func in CASES:
+            results[name] = run_case(func, day, repeat)
+            r = results[name]
+            scans = f"  SCAN: {', '.join(r['full_scans'])}" if r['full_scans'] else ""
+            print(f"  {name:<28} {r['ms']:>10.2f} ms  ({r['queries']} truy vấn){scans}")
+        return results
+    finally:
+        db.close()
+
+
+# --- BASELINE ---
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def environment():
+    return {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(), 'host': platform.node()}
+
+
+def same_environment(baseline, keys=ENVIRONMENT_KEYS):
+    base, current = baseline.get('environment', {}), environment()
+    return all(base.get(key) == current[key] for key in keys)
+
+
+def save_baseline(path, results, previous):
+    data = dict(previous)
+    data['environment'] = dict(environment(), updated=datetime.date.today().isoformat())
+    data.setdefault('sizes', {}).update(results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance, timing='auto'):
+    """Danh sách mô tả các hồi quy so với baseline.
+    timing: 'fail' = chậm hơn baseline là hồi quy, 'warn' = chỉ cảnh báo, 'auto' = 'fail' nếu cùng môi trường"""
+    problems = []
+    timing_gate = timing == 'fail' or (timing == 'auto' and same_environment(baseline))
+    plan_gate = same_environment(baseline, keys=('sqlite',))
+    if not timing_gate:
+        print(f"ℹ️ Môi trường khác baseline ({baseline.get('environment', {})} / {environment()}) "
+              f"-> thời gian chỉ để tham khảo")
+    for size, cases in results.items():
+        base_cases = baseline.get('sizes', {}).get(size)
+        if not base_cases:
+            print(f"⚠️ Chưa có baseline cho {size}")
+            continue
+        for name, result in cases.items():
+            base = base_cases.get(name)
+            if not base:
+                continue
+            limit = max(base['ms'] * (1 + tolerance), base['ms'] + MIN_SLACK_MS)
+            if result['ms'] > limit:
+                message = f"{size} {name}: {result['ms']:.2f} ms > {limit:.2f} ms (baseline {base['ms']:.2f} ms)"
+                if timing_gate:
+                    problems.append(message)
+                else:
+                    print(f"⚠️ {message}")
+            new_scans = set(result['full_scans']) - set(base.get('full_scans', []))
+            if new_scans:
+                problems.append(f"{size} {name}: quét toàn bảng mới {', '.join(sorted(new_scans))}")
+            if result['plans'] != base.get('plans'):
+                if plan_gate:
+                    problems.append(f"{size} {name}: query plan khác baseline")
+                else:
+                    print(f"ℹ️ {size} {name}: query plan khác baseline (SQLite khác phiên bản)")
+    return problems
+
+
+def _parse_size(text):
+    if text not in SIZES:
+        raise argparse.ArgumentTypeError(f"chọn trong {', '.join(SIZES)}")
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark các hàm báo cáo của CodeFocus")
+    parser.add_argument('--sizes', nargs='+', type=_parse_size, default=['100k', '1M'],
+                        help="Cỡ DB mẫu: 100k 1M 10M (mặc định: 100k 1M)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fixtures-dir', default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument('--rebuild', action='store_true', help="Sinh lại DB mẫu")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="Cho phép chậm hơn baseline bao nhiêu (0.5 = 50%%)")
+    parser.add_argument('--timing', choices=('auto', 'fail', 'warn'), default='auto',
+                        help="Chậm hơn baseline có tính là hồi quy không (auto: chỉ khi cùng môi trường)")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--json', default=None, help="Ghi kết quả đầy đủ ra file")
+    args = parser.parse_args(argv)
+
+    results = {size: run_size(size, args.fixtures_dir, args.repeat, args.rebuild) for size in args.sizes}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"\n✅ Đã cập nhật baseline: {args.baseline}")
+        return 0
+
+    problems = compare(results, baseline, args.tolerance, args.timing)
+    if problems:
+        print("\n❌ Hồi quy so với baseline:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print("\n✅ Không có hồi quy")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
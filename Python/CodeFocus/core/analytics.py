@@ -0,0 +1,152 @@
+# Phân tích theo cột bằng NumPy (numpy đi kèm matplotlib nên luôn có sẵn)
+# Nạp ActivityLog / Session của 1 khoảng ngày thành các mảng cột, mỗi bảng đúng 1 truy vấn
+# (thời gian đổi sang epoch và category đổi sang mã số ngay trong SQL), rồi mỗi chỉ số chỉ là
+# vài phép toán mảng (bincount / cumsum) thay vì 1 truy vấn cho mỗi ô.
+# Thời gian trong DB là giờ địa phương không kèm múi giờ -> epoch ở đây cũng "theo giờ địa phương",
+# giờ trong ngày / thứ trong tuần tính thẳng từ epoch là đúng giờ người dùng thấy.
+# Lưu ý: ngày đã lưu trữ (database/retention.py) không còn ActivityLog trong DB.
+import datetime
+
+import numpy as np
+
+from database import db_manager
+from database.db_manager import db
+
+# Mã category: vị trí trong CATEGORIES, category khác = len(CATEGORIES)
+CATEGORIES = ('Work', 'Distraction')
+HOUR = 3600
+DAY = 24 * HOUR
+# 01/01/1970 là thứ Năm -> cộng 3 để thứ Hai = 0
+EPOCH_WEEKDAY = 3
+WEEKDAY_LABELS = ('T2', 'T3', 'T4', 'T5', 'T6', 'T7', 'CN')
+
+ACTIVITY_DTYPE = np.dtype([('start', np.int64), ('duration', np.int64), ('category', np.int8),
+                           ('session', np.int64), ('process', np.int32), ('title', np.int32)])
+SESSION_DTYPE = np.dtype([('start', np.int64), ('duration', np.int64), ('completed', np.int8),
+                          ('pomodoro', np.int8)])
+
+
+# Biểu thức SQL đổi category -> mã số
+CATEGORY_CODE_SQL = ('CASE "category" ' +
+                     " ".join(f"WHEN '{name}' THEN {code}" for code, name in enumerate(CATEGORIES)) +
+                     f' ELSE {len(CATEGORIES)} END')
+
+
+def _epoch(date_obj):
+    """Ngày -> epoch (giây) của 00:00 ngày đó, cùng quy ước với strftime('%s') của SQLite"""
+    return (datetime.date.fromisoformat(db_manager.format_date_str(date_obj)[:10])
+            - datetime.date(1970, 1, 1)).days * DAY
+
+
+def load_activity(start_date, end_date):
+    """ActivityLog của các ngày [start_date, end_date] -> mảng có cấu trúc ACTIVITY_DTYPE,
+    sắp theo thời gian bắt đầu (title = 0 nếu không có)"""
+    start, _ = db_manager.day_range(start_date)
+    _, end = db_manager.day_range(end_date)
+    cursor = db.execute_sql(
+        f'SELECT CAST(strftime(\'%s\', "timestamp") AS INTEGER), "duration", {CATEGORY_CODE_SQL}, '
+        '"session_id", "process_id", COALESCE("title_id", 0) FROM "activitylog" WHERE "timestamp" >= ? AND "timestamp" < ? ORDER BY "timestamp"',
+        (str(start), str(end)))
+    return np.fromiter(cursor, dtype=ACTIVITY_DTYPE)
+
+
+def load_sessions(start_date, end_date):
+    """Session đã kết thúc của các ngày [start_date, end_date] -> mảng SESSION_DTYPE"""
+    start, _ = db_manager.day_range(start_date)
+    _, end = db_manager.day_range(end_date)
+    cursor = db.execute_sql(
+        'SELECT CAST(strftime(\'%s\', "start_time") AS INTEGER), "duration", "is_completed", '
+        '"mode" = \'Pomodoro\' FROM "session" '
+        'WHERE "start_time" >= ? AND "start_time" < ? AND "end_time" IS NOT NULL ORDER BY "start_time"',
+        (str(start), str(end)))
+    return np.fromiter(cursor, dtype=SESSION_DTYPE)
+
+
+def seconds_per_hour(starts, durations, origin, hours):
+    """Trải mỗi khoảng [start, start + duration) lên các giờ nó đi qua.
+    Trả về mảng `hours` phần tử: số giây trong giờ thứ i kể từ `origin` (epoch, tròn giờ)."""
+    if not len(starts):
+        return np.zeros(hours)
+    begin = np.clip(starts - origin, 0, hours * HOUR)
+    end = np.clip(starts + durations - origin, 0, hours * HOUR)
+    # Hàm tích luỹ F(t) = số giây hoạt động trước thời điểm t; số giây của giờ i = F((i+1)h) - F(ih).
+    # F tuyến tính từng đoạn: mỗi khoảng cộng độ dốc +1 tại begin và -1 tại end
+    # -> tại các mốc tròn giờ chỉ cần (số khoảng đang mở) và phần lẻ của giờ đầu / cuối.
+    first, last = begin // HOUR, end // HOUR
+    partial = np.bincount(first, weights=HOUR - begin % HOUR, minlength=hours + 1)
+    partial -= np.bincount(last, weights=HOUR - end % HOUR, minlength=hours + 1)
+    opened = np.cumsum(np.bincount(first + 1, minlength=hours + 2)[:hours + 1] -
+                       np.bincount(last + 1, minlength=hours + 2)[:hours + 1])
+    return (partial + opened * HOUR)[:hours]
+
+
+def _hour_grid(start_date, end_date):
+    origin = _epoch(start_date)
+    return origin, (_epoch(end_date) - origin) // HOUR + 24
+
+
+def focus_heatmap(activity, start_date, end_date, category='Work'):
+    """Ma trận 7 x 24 (thứ Hai..CN x giờ): số phút trung bình mỗi ngày cho category đó"""
+    origin, hours = _hour_grid(start_date, end_date)
+    rows = activity[activity['category'] == CATEGORIES.index(category)]
+    per_hour = seconds_per_hour(rows['start'], rows['duration'], origin, hours)
+
+    absolute = origin // HOUR + np.arange(hours)
+    weekday = (absolute // 24 + EPOCH_WEEKDAY) % 7
+    cell = weekday * 24 + absolute % 24
+    total = np.bincount(cell, weights=per_hour, minlength=7 * 24)
+    # Mỗi ô chia cho số lần thứ đó xuất hiện trong khoảng ngày
+    occurrences = np.bincount(cell, minlength=7 * 24)
+    return (total / np.maximum(occurrences, 1) / 60).reshape(7, 24)
+
+
+def context_switches_per_hour(activity, start_date, end_date):
+    """Số lần chuyển cửa sổ trung bình trong 1 giờ có hoạt động, theo giờ trong ngày (24 phần tử).
+    Chuyển cửa sổ = 2 dòng liền nhau trong cùng phiên khác app hoặc khác tiêu đề."""
+    if len(activity) < 2:
+        return np.zeros(24)
+    same_session = activity['session'][1:] == activity['session'][:-1]
+    changed = ((activity['process'][1:] != activity['process'][:-1]) |
+               (activity['title'][1:] != activity['title'][:-1]))
+    switch_at = activity['start'][1:][same_session & changed]
+    switches = np.bincount((switch_at // HOUR) % 24, minlength=24)
+
+    origin, hours = _hour_grid(start_date, end_date)
+    active = seconds_per_hour(activity['start'], activity['duration'], origin, hours) > 0
+    active_hours = np.bincount((origin // HOUR + np.flatnonzero(active)) % 24, minlength=24)
+    return switches / np.maximum(active_hours, 1)
+
+
+def daily_totals(starts, durations, start_date, end_date):
+    """Tổng số giây theo ngày bắt đầu, 1 phần tử cho mỗi ngày của [start_date, end_date]"""
+    origin = _epoch(start_date)
+    days = (_epoch(end_date) - origin) // DAY + 1
+    index = (starts - origin) // DAY
+    keep = (index >= 0) & (index < days)
+    return np.bincount(index[keep], weights=durations[keep], minlength=days)
+
+
+def rolling_mean(values, window=7):
+    """Trung bình trượt `window` phần tử; đầu chuỗi chưa đủ cửa sổ thì chia cho số phần tử đã có"""
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums / np.minimum(np.arange(1, len(values) + 1), window)
+
+
+def focus_analytics(start_date, end_date, window=7):
+    """Toàn bộ chỉ số cho ReportTab (chạy ở thread nền)"""
+    activity = load_activity(start_date, end_date)
+    sessions = load_sessions(start_date, end_date)
+    pomodoro = sessions[sessions['pomodoro'] == 1]
+    daily_minutes = daily_totals(pomodoro['start'], pomodoro['duration'], start_date, end_date) / 60
+    return {
+        'start': db_manager.format_date_str(start_date)[:10],
+        'end': db_manager.format_date_str(end_date)[:10],
+        'heatmap': focus_heatmap(activity, start_date, end_date),
+        'switches_per_hour': context_switches_per_hour(activity, start_date, end_date),
+        'daily_minutes': daily_minutes,
+        'rolling_minutes': rolling_mean(daily_minutes, window),
+    }
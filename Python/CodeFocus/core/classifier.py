@@ -0,0 +1,108 @@
+# Phân loại hoạt động Work / Distraction theo Blacklist (biên dịch sẵn 1 lần)
+from collections import deque
+
+from core.process_cache import base_process_name
+
+# Từ khoá khớp ở bất kỳ đâu (title hoặc URL)
+MATCH_ANYWHERE = 1
+# Tên miền rút gọn từ từ khoá (vd: "facebook.com" từ "https://www.facebook.com/x") - chỉ xét trong title
+MATCH_TITLE_ONLY = 2
+
+# Ký tự ngăn cách title và URL khi quét chung 1 lượt (không xuất hiện trong từ khoá)
+SEPARATOR = "\x00"
+
+
+def normalize_keyword(keyword):
+    """Trả về (từ khoá, tên miền) đã chuẩn hoá, giống logic cũ của check_is_forbidden"""
+    kw = keyword.lower().strip()
+    clean_kw = kw.replace("https://", "").replace("http://", "").replace("www.", "")
+    domain_only = clean_kw.split('/')[0]
+    return kw, domain_only
+
+
+class KeywordAutomaton:
+    """Automaton Aho-Corasick: tìm mọi từ khoá trong 1 lượt quét tuyến tính,
+    không phụ thuộc số lượng từ khoá trong Blacklist"""
+
+    def __init__(self, patterns):
+        # patterns: {chuỗi: cờ}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [0]
+        for pattern, flags in patterns.items():
+            self._add(pattern, flags)
+        self._build_fail_links()
+
+    def _add(self, pattern, flags):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(0)
+                self.goto[state][ch] = nxt
+            state = nxt
+        self.output[state] |= flags
+
+    def _build_fail_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                # Gộp output của trạng thái fail để không phải đi ngược chuỗi fail lúc quét
+                self.output[nxt] |= self.output[self.fail[nxt]]
+
+    def scan(self, text, title_length):
+        """True nếu có từ khoá hợp lệ: MATCH_ANYWHERE ở bất kỳ đâu,
+        MATCH_TITLE_ONLY chỉ khi kết thúc trong phần title (text[:title_length])"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            flags = output[state]
+            if flags:
+                if flags & MATCH_ANYWHERE:
+                    return True
+                if i < title_length:
+                    return True
+        return False
+
+
+class BlacklistClassifier:
+    """Biên dịch Blacklist khi refresh_settings(): app -> hash set, từ khoá -> automaton"""
+
+    def __init__(self, apps, keywords):
+        self.apps = {a.lower() for a in apps}
+
+        patterns = {}
+        for keyword in keywords:
+            kw, domain_only = normalize_keyword(keyword)
+            # Bỏ qua từ khoá rỗng (nếu không sẽ khớp mọi cửa sổ)
+            if kw:
+                patterns[kw] = patterns.get(kw, 0) | MATCH_ANYWHERE
+            if domain_only:
+                patterns[domain_only] = patterns.get(domain_only, 0) | MATCH_TITLE_ONLY
+        self.automaton = KeywordAutomaton(patterns) if patterns else None
+
+    def is_forbidden(self, process, title, url):
+        # 'python.exe:game.py': chặn được riêng script đó, hoặc cả 'python.exe'
+        process = process.lower() if process else ""
+        if process in self.apps or base_process_name(process) in self.apps:
+            return True
+        if self.automaton is None:
+            return False
+        t_check = title.lower() if title else ""
+        u_check = url.lower() if url else ""
+        return self.automaton.scan(t_check + SEPARATOR + u_check, len(t_check))
+
+    def classify(self, process, title, url):
+        return "Distraction" if self.is_forbidden(process, title, url) else "Work"
@@ -0,0 +1,42 @@
+# Thread chạy nền: xuất dữ liệu ra file (có thể hàng triệu dòng) mà không làm đơ giao diện
+from PySide6.QtCore import QThread, Signal
+
+from database.db_manager import db, flush_activity_log
+from database.exporter import export_range
+
+
+class ExportWorker(QThread):
+    # (số dòng đã ghi, tổng số dòng)
+    progress = Signal(int, int)
+    # (danh sách file đã ghi, thông báo lỗi - rỗng nếu thành công)
+    done = Signal(list, str)
+
+    def __init__(self, prefix, start_date, end_date, fmt='csv', chunk_size=10000):
+        super().__init__()
+        self.prefix = prefix
+        self.start_date = start_date
+        self.end_date = end_date
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.cancelled = False
+
+    def run(self):
+        files, error = [], ""
+        try:
+            # Ghi nốt log đang chờ trong bộ đệm để file xuất có cả span đang mở
+            flush_activity_log()
+            db.use_read_connection()
+            files = export_range(self.prefix, self.start_date, self.end_date, self.fmt,
+                                 chunk_size=self.chunk_size, progress_callback=self.progress.emit,
+                                 should_stop=lambda: self.cancelled)
+        except Exception as e:
+            print(f"Export Error: {e}")
+            error = str(e)
+        finally:
+            # Đóng kết nối riêng của thread này
+            db.close()
+        if not self.cancelled:
+            self.done.emit(files, error)
+
+    def cancel(self):
+        self.cancelled = True
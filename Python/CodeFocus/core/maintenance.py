@@ -0,0 +1,32 @@
+# Thread chạy nền: dọn dẹp dữ liệu cũ (lưu trữ + xoá + thu gọn DB) lúc khởi động
+from PySide6.QtCore import QThread, Signal
+
+from database.db_manager import db
+from database.retention import run_retention
+
+
+class RetentionWorker(QThread):
+    # Số dòng ActivityLog đã chuyển ra archive (-1 nếu lỗi)
+    done = Signal(int)
+
+    def __init__(self, retention_days, batch_size=5000):
+        super().__init__()
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.cancelled = False
+
+    def run(self):
+        try:
+            moved = run_retention(self.retention_days, batch_size=self.batch_size,
+                                  should_stop=lambda: self.cancelled)
+        except Exception as e:
+            print(f"Retention Error: {e}")
+            moved = -1
+        finally:
+            # Đóng kết nối riêng của thread này
+            db.close()
+        if not self.cancelled:
+            self.done.emit(moved)
+
+    def cancel(self):
+        self.cancelled = True
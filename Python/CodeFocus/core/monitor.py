@@ -1,88 +1,150 @@
 # Class theo dõi Window, URL, Input
+import threading
 import time
-import psutil
-import win32gui
-import win32process
-import uiautomation as auto
-from PySide6.QtCore import QThread, Signal
 
+from PySide6.QtCore import QThread, Signal, Qt
+
+from core.process_cache import process_label
+from core.profiler import StageProfiler
+from core.scheduler import AdaptiveScheduler
+from core.url_resolver import UrlResolver
+from core.window_source import Win32WindowSource
 
-class ActivityMonitor(QThread):
-    # Signal gửi dữ liệu về UI: (process_name, window_title, url)
-    activity_signal = Signal(str, str, str)
 
-    def __init__(self):
+class ActivityMonitor(QThread):
+    # Chỉ gửi khi cửa sổ foreground thay đổi:
+    # (process_name, window_title, url, thời điểm bắt đầu (epoch), số giây đã ở cửa sổ trước)
+    focus_changed = Signal(str, str, str, float, float)
+    # Nhịp báo sống định kỳ khi không có gì thay đổi: (thời điểm bắt đầu, số giây đã ở cửa sổ hiện tại)
+    heartbeat = Signal(float, float)
+    # URL đến sau (đọc bất đồng bộ) cho interval hiện tại: (process_name, window_title, url)
+    url_resolved = Signal(str, str, str)
+
+    def __init__(self, source=None, interval_ms=1000, heartbeat_seconds=15, adaptive=True):
         super().__init__()
         self.running = True
         self.last_window_handle = None
-        self.last_url = ""
+
+        # Trạng thái khoảng thời gian (interval) hiện tại
+        self.current_activity = None
+        self.current_started_at = 0.0
+        self.last_heartbeat_at = 0.0
+        self.heartbeat_seconds = heartbeat_seconds
+
+        # Nguồn dữ liệu cửa sổ (mặc định: Win32/UIA). Truyền SyntheticWindowSource
+        # hoặc ReplayWindowSource để chạy/benchmark trên máy không có Windows
+        self.source = source if source is not None else Win32WindowSource()
+        self.wake = threading.Event()
+        # Histogram độ trễ từng bước (foreground / pid / title / url / emit)
+        self.profiler = StageProfiler()
+        # Nhịp lấy mẫu thay đổi theo trạng thái phiên (xem AdaptiveScheduler)
+        self.scheduler = AdaptiveScheduler(base_interval_ms=interval_ms, adaptive=adaptive)
+
+        # Đọc URL trên thread riêng, có deadline; xong thì đánh thức vòng lấy mẫu
+        self.url_resolver = UrlResolver(self.source, profiler=self.profiler)
+        self.url_resolver.resolved.connect(self._on_url_resolved, Qt.DirectConnection)
 
         # Danh sách các trình duyệt hỗ trợ
         self.browser_processes = ['chrome.exe', 'msedge.exe', 'brave.exe', 'firefox.exe']
 
-
     def run(self):
         """Vòng lặp vô tận của Thread"""
+        self.url_resolver.start()
         while self.running:
             try:
-                # 1. Lấy Active Window Handle
-                hwnd = win32gui.GetForegroundWindow()
-
-                # 2. Lấy Process Name
-                _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                try:
-                    process = psutil.Process(pid)
-                    process_name = process.name().lower()
-                except psutil.NoSuchProcess:
-                    process_name = "unknown"
-
-                # 3. Lấy Window Title
-                window_title = win32gui.GetWindowText(hwnd)
-
-                # 4. Lấy URL (Nếu là trình duyệt)
-                url = ""
-                if process_name in self.browser_processes:
-                    # Chỉ quét URL nếu cửa sổ thay đổi hoặc chưa có URL
-                    # Logic này giúp giảm tải CPU
-                    if hwnd != self.last_window_handle or not self.last_url:
-                        url = self.get_browser_url(window_title)
-                        self.last_url = url
-                    else:
-                        url = self.last_url  # Dùng lại kết quả cũ
-                else:
-                    self.last_url = ""  # Reset nếu không phải trình duyệt
-
-                self.last_window_handle = hwnd
-
-                # 5. Gửi tín hiệu về UI
-                self.activity_signal.emit(process_name, window_title, url)
-
+                self.sample_once()
             except Exception as e:
                 # Bắt lỗi để thread không bị chết
                 print(f"Monitor Error: {e}")
 
-            # Nghỉ 1 giây rồi quét tiếp (đừng để thấp hơn, sẽ tốn CPU)
-            self.sleep(1)
-
-    def get_browser_url(self, window_title):
-        """Dùng UI Automation để lấy URL từ thanh địa chỉ"""
-        try:
-            # Tìm cửa sổ trình duyệt
-            window = auto.WindowControl(searchDepth=1, Name=window_title)
-            if not window.Exists(0, 0):
-                return ""
-
-            # Tìm thanh địa chỉ (Address Bar)
-            # Chrome/Edge thường để URL trong EditControl
-            edit = window.EditControl(searchDepth=10, RegexName=".*Address.*|.*Bar.*|.*Địa chỉ.*")
-
-            if edit.Exists(0, 0):
-                # Lấy ValuePattern để đọc text
-                return edit.GetValuePattern().Value
-        except Exception:
-            return ""
-        return ""
+            # Nghỉ theo nhịp của scheduler; đổi trạng thái phiên / có URL mới sẽ đánh thức sớm
+            interval_ms = self.scheduler.next_interval_ms(time.time() - self.current_started_at)
+            self.wake.wait(interval_ms / 1000.0)
+            self.wake.clear()
+
+    def sample_once(self):
+        """Lấy 1 mẫu (process, title, url), chỉ gửi tín hiệu về UI khi có thay đổi"""
+        profiler = self.profiler
+
+        # 1. Lấy Active Window Handle
+        with profiler.measure('foreground'):
+            hwnd = self.source.get_foreground_window()
+
+        # 2. Lấy Process Name
+        with profiler.measure('pid'):
+            pid = self.source.get_window_pid(hwnd)
+            # Trình thông dịch kèm tên script (vd: 'python.exe:manage.py') để phân loại / ghi log riêng
+            process_name = process_label(self.source.get_process_info(pid))
+
+        # 3. Lấy Window Title
+        with profiler.measure('title'):
+            window_title = self.source.get_window_title(hwnd)
+
+        # 4. Lấy URL (Nếu là trình duyệt)
+        url = ""
+        if process_name in self.browser_processes:
+            # Cache theo (hwnd, title): chỉ quét cây UIA khi gặp tab mới
+            cached = self.url_resolver.lookup(hwnd, window_title)
+            if cached is not None:
+                url = cached
+            elif self.url_resolver.isRunning():
+                # Gửi process/title ngay, URL sẽ đến sau qua url_resolved
+                self.url_resolver.request(hwnd, window_title)
+            else:
+                url = self.url_resolver.resolve_now(hwnd, window_title)
+        else:
+            self.url_resolver.cancel()  # Không còn ở trình duyệt
+
+        self.last_window_handle = hwnd
+
+        # 5. Gửi tín hiệu về UI
+        emit_start = time.perf_counter()
+        now = time.time()
+        activity = (process_name, window_title, url)
+        if (self.current_activity and url and not self.current_activity[2]
+                and activity[:2] == self.current_activity[:2]):
+            # Cùng cửa sổ, chỉ là URL vừa đọc xong -> không tính là đổi foreground
+            self.current_activity = activity
+            self.url_resolved.emit(process_name, window_title, url)
+        elif activity != self.current_activity:
+            # Foreground đổi -> khép interval cũ, mở interval mới
+            dwell = now - self.current_started_at if self.current_activity else 0.0
+            self.current_activity = activity
+            self.current_started_at = now
+            self.last_heartbeat_at = now
+            self.focus_changed.emit(process_name, window_title, url, now, dwell)
+        elif now - self.last_heartbeat_at >= self.heartbeat_seconds:
+            self.last_heartbeat_at = now
+            self.heartbeat.emit(self.current_started_at, now - self.current_started_at)
+        profiler.record('emit', (time.perf_counter() - emit_start) * 1000.0)
+        return activity
+
+    def get_stage_stats(self):
+        """p50/p95/p99/max (ms) của từng bước trong nhịp lấy mẫu"""
+        return self.profiler.stats()
+
+    def set_session_active(self, active):
+        """Gọi từ UI khi bắt đầu / kết thúc giờ làm việc"""
+        self.scheduler.session_active = active
+        self.wake.set()
+
+    def set_violation_active(self, active):
+        """Gọi từ UI khi bắt đầu / dừng đếm ngược vi phạm"""
+        if self.scheduler.violation_active != active:
+            self.scheduler.violation_active = active
+            self.wake.set()
+
+    def set_sampling_limits(self, min_interval_ms, max_interval_ms):
+        self.scheduler.set_limits(min_interval_ms, max_interval_ms)
+        self.wake.set()
+
+    def _on_url_resolved(self, hwnd, window_title, url):
+        # Chạy trên thread của UrlResolver: chỉ đánh thức để lấy mẫu lại ngay
+        if hwnd == self.last_window_handle:
+            self.wake.set()
 
     def stop(self):
         self.running = False
-        self.wait()
\ No newline at end of file
+        self.wake.set()
+        self.url_resolver.stop()
+        self.wait()
@@ -0,0 +1,103 @@
+# Cache thông tin tiến trình theo PID (có kiểm tra thời điểm khởi tạo tiến trình)
+import os
+import time
+from collections import OrderedDict, namedtuple
+
+ProcessInfo = namedtuple('ProcessInfo', ['pid', 'create_time', 'name', 'exe', 'cmdline'])
+
+# Các trình thông dịch: cùng 1 tên exe nhưng chạy script khác nhau
+INTERPRETERS = {'python.exe', 'pythonw.exe', 'python', 'python3', 'node.exe', 'node', 'java.exe', 'javaw.exe'}
+# Ngăn cách tên trình thông dịch và tên script trong tên tiến trình (không có trong tên file Windows)
+SCRIPT_SEPARATOR = ':'
+
+
+def get_script_name(info):
+    """Tên script mà trình thông dịch đang chạy (vd: 'manage.py'), rỗng nếu không có"""
+    if not info or info.name not in INTERPRETERS:
+        return ""
+    for arg in info.cmdline[1:]:
+        if arg.startswith('-'):
+            continue
+        return os.path.basename(arg)
+    return ""
+
+
+def process_label(info):
+    """Tên tiến trình dùng để phân loại / ghi log: trình thông dịch kèm script
+    (vd: 'python.exe:manage.py') để tách các script khác nhau, còn lại giữ nguyên tên exe"""
+    script = get_script_name(info)
+    return f"{info.name}{SCRIPT_SEPARATOR}{script.lower()}" if script else info.name
+
+
+def base_process_name(process):
+    """'python.exe:manage.py' -> 'python.exe'"""
+    return process.split(SCRIPT_SEPARATOR, 1)[0]
+
+
+class ProcessInfoCache:
+    """LRU cache khoá theo (pid, create_time).
+    Windows tái sử dụng PID rất nhanh, nên chỉ khớp PID là chưa đủ: tiến trình mới
+    mang PID cũ sẽ có create_time khác và bị coi là miss.
+    PID giống nhịp trước thì dùng lại kết quả, chỉ kiểm tra lại create_time sau mỗi
+    revalidate_seconds -> đứng yên 1 cửa sổ không tốn syscall nào."""
+
+    def __init__(self, psutil_module, max_size=256, revalidate_seconds=5.0):
+        self.psutil = psutil_module
+        self.max_size = max_size
+        self.revalidate_seconds = revalidate_seconds
+        self.entries = OrderedDict()
+        # (ProcessInfo, thời điểm kiểm tra create_time gần nhất) của PID nhịp trước
+        self.last = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pid):
+        """Trả về ProcessInfo, hoặc None nếu tiến trình không còn tồn tại"""
+        now = time.monotonic()
+        if self.last is not None and self.last[0].pid == pid and now - self.last[1] < self.revalidate_seconds:
+            self.hits += 1
+            return self.last[0]
+        info = self._lookup(pid)
+        self.last = (info, now) if info is not None else None
+        return info
+
+    def _lookup(self, pid):
+        try:
+            # Process() chỉ đọc create_time để định danh, rẻ hơn nhiều so với name/exe/cmdline
+            process = self.psutil.Process(pid)
+            key = (pid, process.create_time())
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied, ValueError):
+            return None
+
+        info = self.entries.get(key)
+        if info is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return info
+
+        self.misses += 1
+        try:
+            name = process.name().lower()
+        except self.psutil.NoSuchProcess:
+            return None
+        except self.psutil.AccessDenied:
+            name = "unknown"
+        # exe/cmdline hay bị AccessDenied với tiến trình chạy quyền admin
+        try:
+            exe = process.exe()
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+            exe = ""
+        try:
+            cmdline = tuple(process.cmdline())
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+            cmdline = ()
+
+        info = ProcessInfo(pid, key[1], name, exe, cmdline)
+        self.entries[key] = info
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return info
+
+    def clear(self):
+        self.entries.clear()
+        self.last = None
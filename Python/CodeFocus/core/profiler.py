@@ -0,0 +1,83 @@
+# Đo độ trễ từng bước trong 1 nhịp của ActivityMonitor
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Thứ tự các bước trong 1 nhịp lấy mẫu
+MONITOR_STAGES = ['foreground', 'pid', 'title', 'url', 'emit']
+
+
+class StageProfiler:
+    """Giữ N mẫu gần nhất (ms) cho mỗi bước, tính p50/p95/p99/max khi được hỏi.
+    Ghi chỉ là 1 lần append vào deque nên gần như không tốn gì trong vòng lặp."""
+
+    def __init__(self, window=2000, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.samples = {}
+        self.counts = {}
+        # URL được đo trên thread khác (UrlResolver) nên cần khoá
+        self.lock = threading.Lock()
+
+    def record(self, stage, elapsed_ms):
+        if not self.enabled:
+            return
+        with self.lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.window)
+                self.counts[stage] = 0
+            self.samples[stage].append(elapsed_ms)
+            self.counts[stage] += 1
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000.0)
+
+    def stats(self):
+        """{stage: {'count', 'p50', 'p95', 'p99', 'max'}} tính trên cửa sổ hiện tại (ms)"""
+        with self.lock:
+            snapshot = {stage: (sorted(values), self.counts[stage]) for stage, values in self.samples.items()}
+
+        result = {}
+        for stage, (values, count) in snapshot.items():
+            if not values:
+                continue
+            result[stage] = {
+                'count': count,
+                'p50': _percentile(values, 50),
+                'p95': _percentile(values, 95),
+                'p99': _percentile(values, 99),
+                'max': values[-1],
+            }
+        return result
+
+    def format_table(self):
+        """Bảng text để in ra console"""
+        return format_stats(self.stats())
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.counts.clear()
+
+
+def format_stats(stats):
+    """Kết quả stats() -> bảng text (các bước theo thứ tự trong nhịp lấy mẫu)"""
+    lines = [f"{'stage':<12}{'count':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)"]
+    stages = [s for s in MONITOR_STAGES if s in stats] + [s for s in stats if s not in MONITOR_STAGES]
+    for stage in stages:
+        s = stats[stage]
+        lines.append(f"{stage:<12}{s['count']:>10}{s['p50']:>10.3f}{s['p95']:>10.3f}"
+                     f"{s['p99']:>10.3f}{s['max']:>10.3f}")
+    return "\n".join(lines)
+
+
+def _percentile(sorted_values, pct):
+    # Nearest-rank trên list đã sắp xếp
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
@@ -0,0 +1,92 @@
+# Chạy truy vấn báo cáo trên QThreadPool để không làm đơ giao diện
+import itertools
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from database.db_manager import db
+
+
+class _QueryTask(QRunnable):
+    # autoDelete (mặc định): pool giữ và tự xoá task sau khi run() xong -> phía Python không giữ tham chiếu,
+    # không có chuyện wrapper bị giải phóng khi thread của pool chưa ra khỏi run()
+    def __init__(self, service, key, token, fn, args):
+        super().__init__()
+        self.service = service
+        self.key = key
+        self.token = token
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        # Đã bị huỷ khi còn trong hàng đợi -> bỏ qua luôn
+        if not self.service.is_current(self.key, self.token):
+            return
+        try:
+            # Thread của pool chỉ đọc: kết nối riêng bật query_only, giữ mở cho task sau
+            db.use_read_connection()
+            result, error = self.fn(*self.args), ""
+        except Exception as e:
+            result, error = None, str(e)
+        try:
+            # Signal phát từ thread của pool -> Qt tự chuyển về thread giao diện
+            self.service.task_finished.emit(self.key, self.token, result, error)
+        except RuntimeError:
+            pass  # Service đã bị xoá (đang thoát app)
+
+
+class ReportQueryService(QObject):
+    """Mỗi loại truy vấn có 1 key (vd: 'chart', 'detail'). Gửi yêu cầu mới cùng key sẽ
+    huỷ yêu cầu cũ: nếu chưa chạy thì bỏ qua khi tới lượt, nếu đang chạy thì bỏ kết quả.
+    Nhờ vậy kéo DatePicker liên tục chỉ hiển thị kết quả của ngày cuối cùng.
+    Kết quả chỉ đi qua signal; task do pool sở hữu."""
+
+    task_finished = Signal(str, int, object, str)
+
+    def __init__(self, max_threads=2, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.tokens = itertools.count(1)
+        # key -> (token, callback); thread của pool đọc để biết task còn cần chạy không
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.task_finished.connect(self._on_task_finished)
+
+    def submit(self, key, callback, fn, *args):
+        """Chạy fn(*args) ở thread nền rồi gọi callback(result, error) trên thread giao diện"""
+        token = next(self.tokens)
+        with self.lock:
+            self.latest[key] = (token, callback)
+        self.pool.start(_QueryTask(self, key, token, fn, args))
+        return token
+
+    def cancel(self, key):
+        with self.lock:
+            self.latest.pop(key, None)
+
+    def is_pending(self, key):
+        with self.lock:
+            return key in self.latest
+
+    def is_current(self, key, token):
+        with self.lock:
+            entry = self.latest.get(key)
+        return entry is not None and entry[0] == token
+
+    def _on_task_finished(self, key, token, result, error):
+        with self.lock:
+            entry = self.latest.get(key)
+            if not entry or entry[0] != token:
+                return  # Kết quả đã lỗi thời
+            del self.latest[key]
+        if error:
+            print(f"Report Query Error ({key}): {error}")
+        entry[1](result, error)
+
+    def shutdown(self):
+        with self.lock:
+            self.latest.clear()
+        # Bỏ các task chưa chạy, chờ task đang chạy xong
+        self.pool.clear()
+        self.pool.waitForDone(2000)
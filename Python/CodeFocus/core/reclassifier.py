@@ -0,0 +1,34 @@
+# Thread chạy nền: phân loại lại lịch sử ActivityLog khi Blacklist thay đổi
+from PySide6.QtCore import QThread, Signal
+
+from database.db_manager import db, reclassify_activity
+
+
+class ReclassifyWorker(QThread):
+    # (số dòng đã xử lý, tổng số dòng)
+    progress = Signal(int, int)
+    # Số dòng đã đổi category (-1 nếu lỗi)
+    done = Signal(int)
+
+    def __init__(self, classifier, chunk_size=5000):
+        super().__init__()
+        self.classifier = classifier
+        self.chunk_size = chunk_size
+        self.cancelled = False
+
+    def run(self):
+        try:
+            changed = reclassify_activity(self.classifier.classify, chunk_size=self.chunk_size,
+                                          progress_callback=self.progress.emit,
+                                          should_stop=lambda: self.cancelled)
+        except Exception as e:
+            print(f"Reclassify Error: {e}")
+            changed = -1
+        finally:
+            # Đóng kết nối riêng của thread này
+            db.close()
+        if not self.cancelled:
+            self.done.emit(changed)
+
+    def cancel(self):
+        self.cancelled = True
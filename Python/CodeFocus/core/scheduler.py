@@ -0,0 +1,40 @@
+# Điều chỉnh nhịp lấy mẫu của ActivityMonitor theo trạng thái phiên làm việc
+
+
+class AdaptiveScheduler:
+    """Quyết định khoảng nghỉ giữa 2 lần lấy mẫu:
+    - Đang đếm ngược vi phạm: quét nhanh (min) để phát hiện ngay khi người dùng tắt app.
+    - Không có phiên làm việc: quét chậm (max), chỉ cần cập nhật nhãn Dashboard.
+    - Cửa sổ đứng yên lâu: giãn dần từ nhịp cơ bản lên tới max.
+    """
+
+    def __init__(self, base_interval_ms=1000, min_interval_ms=250, max_interval_ms=5000,
+                 stable_after_seconds=120, adaptive=True):
+        self.base_interval_ms = base_interval_ms
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.stable_after_seconds = stable_after_seconds
+        # adaptive=False => luôn dùng nhịp cơ bản (benchmark với nguồn giả lập)
+        self.adaptive = adaptive
+
+        self.session_active = False
+        self.violation_active = False
+
+    def set_limits(self, min_interval_ms, max_interval_ms):
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max(min_interval_ms, max_interval_ms)
+
+    def next_interval_ms(self, dwell_seconds):
+        if not self.adaptive:
+            return self.base_interval_ms
+        if self.violation_active:
+            return self.min_interval_ms
+        if not self.session_active:
+            return self.max_interval_ms
+
+        base = min(max(self.base_interval_ms, self.min_interval_ms), self.max_interval_ms)
+        if dwell_seconds <= self.stable_after_seconds:
+            return base
+        # Mỗi stable_after_seconds đứng yên thì nhân đôi khoảng nghỉ, tối đa max
+        steps = int(dwell_seconds // self.stable_after_seconds)
+        return min(self.max_interval_ms, base * (2 ** min(steps, 8)))
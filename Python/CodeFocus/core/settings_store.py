@@ -0,0 +1,103 @@
+# Kho cấu hình dùng chung cho cả app: đọc Settings + Blacklist từ DB đúng 1 lần,
+# ghi xuyên (write-through) xuống DB khi thay đổi và báo cho nơi dùng qua signal
+from PySide6.QtCore import QObject, Signal
+
+from database import db_manager
+
+# Giá trị mặc định (cũng quyết định kiểu của get(): int / str)
+DEFAULTS = {
+    'pomodoro_minutes': 25,
+    'break_minutes': 5,
+    'grace_period_seconds': 60,
+    'log_interval_seconds': 30,
+    'log_storage_mode': 'span',
+    'monitor_min_interval_ms': 250,
+    'monitor_max_interval_seconds': 5,
+    'retention_days': 365,  # 0 = giữ ActivityLog mãi mãi
+}
+
+
+class SettingsStore(QObject):
+    # (key, giá trị mới đã đổi kiểu) - chỉ phát khi giá trị thực sự khác
+    changed = Signal(str, object)
+    # Blacklist vừa thêm / xoá
+    blacklist_changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = {}
+        self.apps = []
+        self.urls = []
+        self.load()
+
+    def load(self):
+        """Đọc lại toàn bộ từ DB (2 truy vấn)"""
+        self.values = db_manager.get_all_settings()
+        self.apps, self.urls = db_manager.get_blacklist_items()
+
+    # --- SETTINGS ---
+    def get(self, key, default=None):
+        if default is None:
+            default = DEFAULTS.get(key)
+        raw = self.values.get(key)
+        if raw is None:
+            return default
+        if isinstance(default, int):
+            try:
+                return int(raw)
+            except ValueError:
+                return default
+        return raw
+
+    def get_int(self, key, default=None):
+        return int(self.get(key, default))
+
+    def get_str(self, key, default=None):
+        return str(self.get(key, default))
+
+    def set(self, key, value):
+        """Ghi xuống DB rồi phát changed. Trả về True nếu giá trị có thay đổi"""
+        raw = str(value)
+        if self.values.get(key) == raw:
+            return False
+        db_manager.update_setting(key, raw)
+        self.values[key] = raw
+        self.changed.emit(key, self.get(key))
+        return True
+
+    def update(self, values):
+        """Lưu nhiều key cùng lúc, trả về danh sách key đã đổi"""
+        return [key for key, value in values.items() if self.set(key, value)]
+
+    # --- BLACKLIST ---
+    def get_blacklist(self):
+        """(apps, urls); chưa có mục nào thì dùng Blacklist mặc định như get_blacklist() cũ"""
+        if not self.apps and not self.urls:
+            return db_manager.DEFAULT_BLACKLIST[0][:], db_manager.DEFAULT_BLACKLIST[1][:]
+        return self.apps[:], self.urls[:]
+
+    def add_to_blacklist(self, value, type_):
+        if not db_manager.add_to_blacklist(value, type_):
+            return False
+        (self.apps if type_ == 'app' else self.urls).append(value.lower())
+        self.blacklist_changed.emit()
+        return True
+
+    def remove_from_blacklist(self, value):
+        if not db_manager.remove_from_blacklist(value):
+            return False
+        self.apps = [a for a in self.apps if a != value]
+        self.urls = [u for u in self.urls if u != value]
+        self.blacklist_changed.emit()
+        return True
+
+
+_store = None
+
+
+def get_settings_store():
+    """Kho cấu hình duy nhất của tiến trình (tạo & nạp lần đầu khi được gọi, sau initialize_db())"""
+    global _store
+    if _store is None:
+        _store = SettingsStore()
+    return _store
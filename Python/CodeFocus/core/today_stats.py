@@ -0,0 +1,127 @@
+# Số liệu "hôm nay" giữ trong bộ nhớ cho Dashboard: đọc DB đúng 1 lần lúc khởi động (vài dòng
+# DailyStats của hôm nay), sau đó chỉ cộng dồn các phần DailyStats mà thread ghi log / end_session()
+# vừa commit -> luôn khớp với DB mà không phải truy vấn lại. Qua nửa đêm thì tự sang ngày mới.
+# DailyStats chỉ cộng phiên khi kết thúc; phiên đang chạy (create_session() báo qua listener) được giữ
+# riêng và tính thêm vào số phiên cho tới khi end_session() cộng nó vào DailyStats.
+import datetime
+import heapq
+import threading
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from database import db_manager
+from database.db_manager import db, DailyStats, SESSION_CATEGORY
+
+
+class TodayStats(QObject):
+    # Có số liệu mới (có thể phát từ thread ghi log, Qt tự chuyển về thread giao diện)
+    changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lock = threading.Lock()
+        self.day = None
+        # id phiên đang chạy -> ngày bắt đầu (phiên được tính vào ngày bắt đầu, kể cả khi kết thúc sau nửa đêm)
+        self.running_sessions = {}
+        self._reset(datetime.date.today())
+
+        db_manager.add_daily_stats_listener(self.apply_rows)
+        self.reload()
+
+        # Hẹn giờ sang ngày mới (đặt lại sau mỗi lần chạy)
+        self.midnight_timer = QTimer(self)
+        self.midnight_timer.setSingleShot(True)
+        self.midnight_timer.timeout.connect(self.on_midnight)
+        self._schedule_midnight()
+
+    def _reset(self, day):
+        self.day = db_manager.format_date_str(day)
+        self.work = 0
+        self.distraction = 0
+        self.focus_seconds = 0  # Tổng duration các phiên Pomodoro đã kết thúc
+        self.sessions = 0
+        self.completed_sessions = 0
+        self.apps = {}  # process -> số giây
+
+    def _apply(self, row):
+        if 'started_session' in row:
+            self.running_sessions[row['started_session']] = row['day']
+        elif 'ended_session' in row:
+            self.running_sessions.pop(row['ended_session'], None)
+        if row['day'] != self.day:
+            return
+        category = row['category']
+        if category == SESSION_CATEGORY:
+            self.sessions += row['sessions']
+            self.completed_sessions += row['completed_sessions']
+            if row['process_name'] == 'Pomodoro':
+                self.focus_seconds += row['seconds']
+            return
+        if category == 'Work':
+            self.work += row['seconds']
+        elif category == 'Distraction':
+            self.distraction += row['seconds']
+        self.apps[row['process_name']] = self.apps.get(row['process_name'], 0) + row['seconds']
+
+    def _roll_over(self):
+        """Đã sang ngày mới -> về 0 (hôm nay chưa có gì trong DB). Gọi khi đang giữ lock"""
+        today = db_manager.format_date_str(datetime.date.today())
+        if today == self.day:
+            return False
+        self._reset(today)
+        return True
+
+    def reload(self):
+        """Đọc lại từ DailyStats (lúc khởi động, sau khi phân loại lại lịch sử)"""
+        today = datetime.date.today()
+        # Giữ write_lock: không phần cộng dồn nào được commit (và báo tới apply_rows) giữa lúc đọc và lúc thay số
+        with db.write_lock:
+            rows = list(DailyStats
+                        .select(DailyStats.day, DailyStats.category, DailyStats.process_name, DailyStats.seconds,
+                                DailyStats.sessions, DailyStats.completed_sessions)
+                        .where(DailyStats.day == db_manager.format_date_str(today))
+                        .dicts())
+            with self.lock:
+                self._reset(today)
+                for row in rows:
+                    self._apply(row)
+        self.changed.emit()
+
+    def apply_rows(self, rows):
+        """Listener của db_manager: các phần cộng dồn DailyStats vừa commit"""
+        with self.lock:
+            self._roll_over()
+            for row in rows:
+                self._apply(row)
+        self.changed.emit()
+
+    def on_midnight(self):
+        with self.lock:
+            rolled = self._roll_over()
+        if rolled:
+            self.changed.emit()
+        self._schedule_midnight()
+
+    def _schedule_midnight(self):
+        now = datetime.datetime.now()
+        midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min)
+        # +1 giây cho chắc đã qua ngày
+        self.midnight_timer.start(int((midnight - now).total_seconds() * 1000) + 1000)
+
+    # --- ĐỌC (O(1), không truy vấn DB) ---
+    def snapshot(self, top=3):
+        with self.lock:
+            self._roll_over()
+            return {
+                'day': self.day,
+                'work': self.work,
+                'distraction': self.distraction,
+                'focus_seconds': self.focus_seconds,
+                'sessions': self.sessions + sum(1 for day in self.running_sessions.values() if day == self.day),
+                'completed_sessions': self.completed_sessions,
+                'top_apps': heapq.nlargest(top, self.apps.items(), key=lambda item: item[1]),
+            }
+
+    def close(self):
+        db_manager.remove_daily_stats_listener(self.apply_rows)
+        self.midnight_timer.stop()
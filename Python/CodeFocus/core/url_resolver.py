@@ -0,0 +1,110 @@
+# Thread riêng để đọc URL trình duyệt (UI Automation chậm, không được chặn vòng lấy mẫu)
+import threading
+import time
+from collections import OrderedDict
+
+from PySide6.QtCore import QThread, Signal
+
+
+class UrlResolver(QThread):
+    # (hwnd, window_title, url) - chỉ gửi cho yêu cầu mới nhất, xong trước deadline
+    resolved = Signal(int, str, str)
+
+    def __init__(self, source, deadline_ms=1500, cache_size=128, profiler=None):
+        super().__init__()
+        self.source = source
+        self.profiler = profiler
+        self.deadline = deadline_ms / 1000.0
+        self.cache_size = cache_size
+        self.running = True
+
+        # Cache theo (hwnd, title): chuyển qua lại giữa các tab không phải quét lại cây UIA
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+        # Chỉ giữ 1 yêu cầu chờ: yêu cầu mới thay thế (huỷ) yêu cầu cũ
+        self.pending = None  # (hwnd, title, deadline_at)
+        self.in_flight = None  # (hwnd, title)
+
+    def lookup(self, hwnd, title):
+        """URL đã cache, None nếu chưa có"""
+        with self.lock:
+            url = self.cache.get((hwnd, title))
+            if url is not None:
+                self.cache.move_to_end((hwnd, title))
+            return url
+
+    def request(self, hwnd, title):
+        """Xếp yêu cầu đọc URL, không chờ kết quả"""
+        with self.lock:
+            key = (hwnd, title)
+            if self.in_flight == key or (self.pending and self.pending[:2] == key):
+                return
+            self.pending = (hwnd, title, time.monotonic() + self.deadline)
+        self.wake.set()
+
+    def cancel(self):
+        """Huỷ yêu cầu đang chờ (vd: người dùng đã rời khỏi trình duyệt)"""
+        with self.lock:
+            self.pending = None
+            self.in_flight = None
+
+    def resolve_now(self, hwnd, title):
+        """Đọc URL đồng bộ ngay trên thread gọi (dùng khi thread chưa chạy)"""
+        url = self._fetch(hwnd, title)
+        self._store(hwnd, title, url)
+        return url
+
+    def _fetch(self, hwnd, title):
+        start = time.perf_counter()
+        try:
+            return self.source.get_browser_url(hwnd, title)
+        except Exception:
+            return ""
+        finally:
+            if self.profiler:
+                self.profiler.record('url', (time.perf_counter() - start) * 1000.0)
+
+    def _store(self, hwnd, title, url):
+        # Không cache kết quả rỗng để lần sau còn thử lại (thanh địa chỉ có thể chưa sẵn sàng)
+        if not url:
+            return
+        with self.lock:
+            self.cache[(hwnd, title)] = url
+            self.cache.move_to_end((hwnd, title))
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def run(self):
+        # UI Automation cần khởi tạo COM riêng cho từng thread
+        with self.source.thread_context():
+            while self.running:
+                self.wake.wait()
+                self.wake.clear()
+
+                with self.lock:
+                    job, self.pending = self.pending, None
+                    if job:
+                        self.in_flight = job[:2]
+                if not job:
+                    continue
+
+                hwnd, title, deadline_at = job
+                if time.monotonic() > deadline_at:
+                    continue  # Hết hạn trước khi kịp chạy
+
+                url = self._fetch(hwnd, title)
+                self._store(hwnd, title, url)
+
+                with self.lock:
+                    # Bị huỷ hoặc đã có yêu cầu mới hơn -> bỏ kết quả (đã cache cho lần sau)
+                    still_wanted = self.in_flight == (hwnd, title)
+                    self.in_flight = None
+                if still_wanted and url and time.monotonic() <= deadline_at:
+                    self.resolved.emit(hwnd, title, url)
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.wait()
@@ -0,0 +1,198 @@
+# Các nguồn cung cấp thông tin cửa sổ foreground cho ActivityMonitor
+import contextlib
+import json
+import random
+
+from core.process_cache import ProcessInfo, ProcessInfoCache
+
+
+class WindowSource:
+    """Giao diện chung: Monitor chỉ gọi các hàm này, không gọi thẳng Win32/UIA"""
+
+    def get_foreground_window(self):
+        """Trả về handle (int) của cửa sổ đang active, 0 nếu không có"""
+        raise NotImplementedError
+
+    def get_window_pid(self, hwnd):
+        raise NotImplementedError
+
+    def get_process_name(self, pid):
+        """Tên tiến trình viết thường, 'unknown' nếu tiến trình đã chết"""
+        raise NotImplementedError
+
+    def get_process_info(self, pid):
+        """ProcessInfo (tên, exe, cmdline). Backend nào có cache riêng thì override"""
+        return ProcessInfo(pid, 0.0, self.get_process_name(pid), "", ())
+
+    def get_window_title(self, hwnd):
+        raise NotImplementedError
+
+    def get_browser_url(self, hwnd, window_title):
+        """URL trên thanh địa chỉ, chuỗi rỗng nếu không đọc được"""
+        return ""
+
+    def thread_context(self):
+        """Context cần bọc quanh mỗi thread gọi get_browser_url (vd: khởi tạo COM)"""
+        return contextlib.nullcontext()
+
+
+class Win32WindowSource(WindowSource):
+    """Backend thật trên Windows: win32gui + psutil + UI Automation"""
+
+    def __init__(self):
+        # Import tại đây để module vẫn load được trên Linux (dùng backend giả lập)
+        import psutil
+        import win32gui
+        import win32process
+        import uiautomation as auto
+        self.psutil = psutil
+        self.win32gui = win32gui
+        self.win32process = win32process
+        self.auto = auto
+        self.process_cache = ProcessInfoCache(psutil)
+
+    def get_foreground_window(self):
+        return self.win32gui.GetForegroundWindow()
+
+    def get_window_pid(self, hwnd):
+        _, pid = self.win32process.GetWindowThreadProcessId(hwnd)
+        return pid
+
+    def get_process_name(self, pid):
+        return self.get_process_info(pid).name
+
+    def get_process_info(self, pid):
+        info = self.process_cache.get(pid)
+        if info is None:
+            return ProcessInfo(pid, 0.0, "unknown", "", ())
+        return info
+
+    def get_window_title(self, hwnd):
+        return self.win32gui.GetWindowText(hwnd)
+
+    def get_browser_url(self, hwnd, window_title):
+        """Dùng UI Automation để lấy URL từ thanh địa chỉ"""
+        try:
+            # Tìm cửa sổ trình duyệt (Dùng Handle chính xác và nhanh hơn tìm theo Name)
+            window = self.auto.WindowControl(searchDepth=1, Handle=hwnd)
+            if not window.Exists(0, 0):
+                return ""
+
+            # Tìm thanh địa chỉ (Address Bar)
+            # Chrome/Edge thường để URL trong EditControl
+            edit = window.EditControl(searchDepth=10, RegexName=".*Address.*|.*Bar.*|.*Địa chỉ.*")
+
+            if edit.Exists(0, 0):
+                # Lấy ValuePattern để đọc text
+                return edit.GetValuePattern().Value
+        except Exception:
+            return ""
+        return ""
+
+    def thread_context(self):
+        return self.auto.UIAutomationInitializerInThread()
+
+
+class ReplayWindowSource(WindowSource):
+    """Phát lại một chuỗi mẫu (process, title, url) có sẵn, mỗi lần gọi
+    get_foreground_window() là một nhịp lấy mẫu. Không có độ trễ hệ thống nên
+    có thể đẩy hàng nghìn mẫu/giây để benchmark trên Linux."""
+
+    def __init__(self, samples, loop=True):
+        self.samples = [tuple(s) for s in samples]
+        self.loop = loop
+        self.position = 0
+        # Mỗi cặp (process, title) khác nhau được gán 1 handle giả cố định
+        self._handles = {}
+        self._windows = {}
+        self._pids = {}
+        self._names = {}
+
+    @classmethod
+    def from_jsonl(cls, path, loop=True):
+        """Đọc file JSONL, mỗi dòng: {"process": ..., "title": ..., "url": ...}"""
+        samples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                samples.append((item.get("process", "unknown"), item.get("title", ""), item.get("url", "")))
+        return cls(samples, loop=loop)
+
+    def next_sample(self):
+        if self.position >= len(self.samples):
+            if not self.loop or not self.samples:
+                return None
+            self.position = 0
+        sample = self.samples[self.position]
+        self.position += 1
+        return sample
+
+    def get_foreground_window(self):
+        sample = self.next_sample()
+        if sample is None:
+            return 0
+        process, title, url = sample
+        hwnd = self._handles.get((process, title))
+        if hwnd is None:
+            hwnd = len(self._handles) + 1
+            self._handles[(process, title)] = hwnd
+            if process not in self._pids:
+                pid = 1000 + len(self._pids)
+                self._pids[process] = pid
+                self._names[pid] = process
+        self._windows[hwnd] = sample
+        return hwnd
+
+    def get_window_pid(self, hwnd):
+        if hwnd not in self._windows:
+            return 0
+        return self._pids[self._windows[hwnd][0]]
+
+    def get_process_name(self, pid):
+        return self._names.get(pid, "unknown")
+
+    def get_window_title(self, hwnd):
+        return self._windows[hwnd][1] if hwnd in self._windows else ""
+
+    def get_browser_url(self, hwnd, window_title):
+        return self._windows[hwnd][2] if hwnd in self._windows else ""
+
+
+class SyntheticWindowSource(ReplayWindowSource):
+    """Sinh ngẫu nhiên (có seed => tái lập được) các đoạn tập trung / xao nhãng.
+    Mỗi cửa sổ được giữ trong một số nhịp ngẫu nhiên rồi mới chuyển."""
+
+    DEFAULT_ACTIVITIES = [
+        ("pycharm64.exe", "main.py - CodeFocus", ""),
+        ("code.exe", "monitor.py - Visual Studio Code", ""),
+        ("chrome.exe", "python - Stack Overflow - Google Chrome", "https://stackoverflow.com/questions/tagged/python"),
+        ("msedge.exe", "Peewee documentation - Microsoft Edge", "https://docs.peewee-orm.com/en/latest/"),
+        ("chrome.exe", "YouTube - Google Chrome", "https://www.youtube.com/"),
+        ("chrome.exe", "Facebook - Google Chrome", "https://www.facebook.com/"),
+        ("league of legends.exe", "League of Legends", ""),
+        ("explorer.exe", "", ""),
+    ]
+
+    def __init__(self, activities=None, seed=0, min_dwell=1, max_dwell=30, total=None):
+        super().__init__([], loop=False)
+        self.activities = list(activities or self.DEFAULT_ACTIVITIES)
+        self.rng = random.Random(seed)
+        self.min_dwell = min_dwell
+        self.max_dwell = max_dwell
+        # total = None => sinh vô hạn
+        self.remaining = total
+        self._current = None
+        self._dwell_left = 0
+
+    def next_sample(self):
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+        if self._dwell_left <= 0:
+            self._current = self.rng.choice(self.activities)
+            self._dwell_left = self.rng.randint(self.min_dwell, self.max_dwell)
+        self._dwell_left -= 1
+        return self._current
@@ -0,0 +1,78 @@
+# Lớp kết nối SQLite của CodeFocus
+# - Mỗi thread có kết nối riêng (peewee thread-local): thread giao diện, thread ghi log,
+#   thread nền (phân loại lại, dọn dẹp) và các thread đọc báo cáo của QThreadPool.
+# - Ghi: tuần tự hoá bằng 1 khoá chung + BEGIN IMMEDIATE (xin khoá ghi ngay từ đầu,
+#   không bị lỗi "database is locked" khi nâng cấp từ khoá đọc lên khoá ghi giữa chừng).
+# - Đọc: kết nối của thread báo cáo bật query_only và được giữ mở để dùng lại;
+#   nhờ WAL, đọc không chặn ghi và ngược lại.
+# - Checkpoint WAL do thread ghi log chủ động làm định kỳ (không để lệnh COMMIT của
+#   thread giao diện phải gánh), cắt WAL về 0 khi thoát app.
+import contextlib
+import os
+import sys
+import threading
+import time
+
+from peewee import SqliteDatabase
+
+# Biến môi trường chỉ định file DB (ưu tiên hơn vị trí mặc định)
+DB_PATH_ENV = 'CODEFOCUS_DB'
+DB_FILENAME = 'codefocus.db'
+
+PRAGMAS = {
+    'auto_vacuum': 'incremental',  # Chỉ có tác dụng với DB mới tạo (xem retention.py)
+    'journal_mode': 'wal',
+    'synchronous': 'normal',  # An toàn với WAL, chỉ fsync lúc checkpoint
+    'cache_size': -16000,  # 16MB page cache mỗi kết nối
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+    'busy_timeout': 5000,
+    # Checkpoint tự động chỉ là lưới an toàn, bình thường ActivityLogWriter checkpoint trước
+    'wal_autocheckpoint': 4000,
+}
+
+
+def default_database_path():
+    """CODEFOCUS_DB nếu có, nếu không thì codefocus.db cạnh file exe (bản đóng gói)
+    hoặc cạnh main.py (chạy từ source) - không phụ thuộc thư mục hiện hành"""
+    path = os.environ.get(DB_PATH_ENV)
+    if path:
+        return os.path.abspath(path)
+    if getattr(sys, 'frozen', False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, DB_FILENAME)
+
+
+class CodeFocusDatabase(SqliteDatabase):
+    def __init__(self, database, checkpoint_interval=60.0, **kwargs):
+        kwargs.setdefault('pragmas', PRAGMAS)
+        super().__init__(database, **kwargs)
+        self.write_lock = threading.RLock()
+        self.checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = time.monotonic()
+        self._readers = threading.local()
+
+    @contextlib.contextmanager
+    def write(self):
+        """Transaction ghi: chỉ 1 thread ghi tại 1 thời điểm (gọi lồng nhau được)"""
+        with self.write_lock:
+            with self.atomic('IMMEDIATE'):
+                yield
+
+    def use_read_connection(self):
+        """Đánh dấu kết nối của thread hiện tại là chỉ đọc (thread báo cáo của QThreadPool).
+        Kết nối được giữ mở nên các truy vấn sau trên cùng thread dùng lại được page cache."""
+        conn = self.connection()
+        if getattr(self._readers, 'conn', None) is not conn:
+            conn.execute('PRAGMA query_only = ON')
+            self._readers.conn = conn
+
+    def checkpoint(self, mode='PASSIVE'):
+        """Chép WAL vào file DB. PASSIVE: không chờ ai; TRUNCATE: chờ xong và cắt WAL về 0"""
+        self._last_checkpoint = time.monotonic()
+        return self.execute_sql(f'PRAGMA wal_checkpoint({mode})').fetchone()
+
+    def checkpoint_due(self):
+        return time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
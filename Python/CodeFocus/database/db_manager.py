@@ -1,9 +1,17 @@
 import datetime
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from peewee import *
 from peewee import fn
 
-# Cấu hình DB
-db = SqliteDatabase('codefocus.db', pragmas={'journal_mode': 'wal'})
+from database.connection import CodeFocusDatabase, default_database_path
+from database.migrations import migrate
+
+# Cấu hình DB (đường dẫn: biến môi trường CODEFOCUS_DB hoặc cạnh main.py / file exe)
+db = CodeFocusDatabase(default_database_path())
 
 
 # --- MODELS ---
@@ -18,17 +26,64 @@ class Session(BaseModel):
     duration = IntegerField(default=0)
     mode = CharField(default='Pomodoro')
     is_completed = BooleanField(default=False)
+    # Phiên chép từ DB máy khác (database/sync.py): uuid DB gốc + id gốc, NULL = phiên của máy này
+    source_uuid = CharField(null=True)
+    source_id = IntegerField(null=True)
+
+
+# Bảng từ điển: mỗi chuỗi (tên app / tiêu đề / URL) chỉ lưu 1 lần, ActivityLog trỏ tới bằng id
+class Process(BaseModel):
+    name = CharField(unique=True)
+
+
+class Title(BaseModel):
+    text = CharField(unique=True)
+
+
+class Url(BaseModel):
+    text = CharField(unique=True)
 
 
 class ActivityLog(BaseModel):
+    """Mỗi dòng là 1 khoảng (span) [timestamp, end_time) cùng 1 cửa sổ.
+    Chế độ 'span': các mẫu liên tiếp giống nhau được gộp vào 1 dòng (kéo dài end_time).
+    Chế độ 'sample': mỗi mẫu 1 dòng như cũ.
+    process / title / url là khoá ngoại số nguyên tới bảng từ điển (xem StringInterner)."""
     session = ForeignKeyField(Session, backref='logs', on_delete='CASCADE')
     timestamp = DateTimeField(default=datetime.datetime.now)
-    process_name = CharField()
-    window_title = CharField(null=True)
-    url = CharField(null=True)
+    end_time = DateTimeField(null=True)
+    duration = IntegerField(default=0)  # Số giây thực tế của span
+    samples = IntegerField(default=1)  # Số mẫu đã gộp vào span
+    process = ForeignKeyField(Process, column_name='process_id')
+    title = ForeignKeyField(Title, column_name='title_id', null=True)
+    url = ForeignKeyField(Url, column_name='url_id', null=True)
     category = CharField(default='Work')
 
 
+# category của các dòng DailyStats tổng hợp phiên làm việc (process_name = mode)
+SESSION_CATEGORY = 'Session'
+# Settings: ngày đầu tiên còn ActivityLog trong DB, các ngày trước đã được lưu trữ ra file
+ARCHIVED_BEFORE_KEY = 'archived_before'
+# Settings: định danh riêng của file DB này khi đồng bộ giữa nhiều máy
+DATABASE_UUID_KEY = 'database_uuid'
+
+
+class DailyStats(BaseModel):
+    """Bảng tổng hợp theo (ngày, category, process) để báo cáo không phải quét ActivityLog.
+    Dòng hoạt động: category = Work/Distraction, process_name = tên app.
+    Dòng phiên làm việc: category = SESSION_CATEGORY, process_name = mode, seconds = tổng duration."""
+    day = CharField()  # YYYY-MM-DD
+    category = CharField()
+    process_name = CharField()
+    samples = IntegerField(default=0)
+    seconds = IntegerField(default=0)
+    sessions = IntegerField(default=0)
+    completed_sessions = IntegerField(default=0)
+
+    class Meta:
+        indexes = ((('day', 'category', 'process_name'), True),)
+
+
 class Blacklist(BaseModel):
     value = CharField(unique=True)
     type = CharField()
@@ -40,15 +95,41 @@ class Settings(BaseModel):
     value = CharField()
 
 
+class SyncState(BaseModel):
+    """Mốc đồng bộ của mỗi DB nguồn: các Session có id <= last_session_id đã được chép"""
+    source_uuid = CharField(unique=True)
+    source_path = CharField(default='')
+    last_session_id = IntegerField(default=0)
+    synced_at = DateTimeField(null=True)
+
+
 # --- INITIALIZE ---
+def configure_database(path):
+    """Đổi file DB đang dùng (gọi trước initialize_db, hoặc từ công cụ dòng lệnh)"""
+    db.close()
+    db.init(os.path.abspath(path))
+    # id trong cache thuộc về DB cũ
+    _interner.clear()
+
+
 def initialize_db():
     db.connect()
-    db.create_tables([Session, ActivityLog, Blacklist, Settings], safe=True)
+    create_schema()
+    seed_sample_data()
+
+
+def create_schema():
+    """Tạo bảng, chạy migration và ghi cấu hình mặc định (không tạo dữ liệu mẫu)"""
+    db.create_tables([Session, Process, Title, Url, Blacklist, Settings, DailyStats, SyncState], safe=True)
+    # activitylog của DB cũ do migrate() nâng cấp (tạo index trên cột mới lúc này sẽ lỗi)
+    if not ActivityLog.table_exists():
+        ActivityLog.create_table()
+    migrate(db)
     default_settings = {'pomodoro_minutes': '25', 'break_minutes': '5', 'grace_period_seconds': '60'}
     for key, val in default_settings.items():
         if not Settings.select().where(Settings.key == key).exists():
-            Settings.create(key=key, value=val)
-    seed_sample_data()
+            with db.write():
+                Settings.create(key=key, value=val)
 
 # --- SETTINGS & BLACKLIST ---
 def get_setting(key, default):
@@ -59,14 +140,31 @@ def get_setting(key, default):
 
 
 def update_setting(key, value):
-    Settings.replace(key=key, value=str(value)).execute()
+    with db.write():
+        Settings.replace(key=key, value=str(value)).execute()
+
+
+def get_all_settings():
+    """Toàn bộ bảng Settings trong 1 truy vấn: {key: value (chuỗi)}"""
+    return dict(Settings.select(Settings.key, Settings.value).tuples())
+
+
+# Blacklist mặc định khi người dùng chưa thêm mục nào
+DEFAULT_BLACKLIST = (['league of legends'], ['facebook', 'youtube', 'tiktok'])
+
+
+def get_blacklist_items():
+    """(apps, urls) đúng như trong DB (không áp dụng Blacklist mặc định), 1 truy vấn"""
+    apps, urls = [], []
+    for value, type_ in Blacklist.select(Blacklist.value, Blacklist.type).order_by(Blacklist.id).tuples():
+        (apps if type_ == 'app' else urls).append(value)
+    return apps, urls
 
 
 def get_blacklist():
     try:
-        apps = [b.value for b in Blacklist.select().where(Blacklist.type == 'app')]
-        urls = [b.value for b in Blacklist.select().where(Blacklist.type == 'url')]
-        if not apps and not urls: return (['league of legends'], ['facebook', 'youtube', 'tiktok'])
+        apps, urls = get_blacklist_items()
+        if not apps and not urls: return DEFAULT_BLACKLIST[0][:], DEFAULT_BLACKLIST[1][:]
         return apps, urls
     except:
         return [], []
@@ -74,41 +172,494 @@ def get_blacklist():
 
 def add_to_blacklist(value, type_):
     try:
-        Blacklist.create(value=value.lower(), type=type_); return True
+        with db.write():
+            Blacklist.create(value=value.lower(), type=type_)
+        return True
     except:
         return False
 
 
 def remove_from_blacklist(value):
     try:
-        Blacklist.delete().where(Blacklist.value == value).execute(); return True
+        with db.write():
+            Blacklist.delete().where(Blacklist.value == value).execute()
+        return True
     except:
         return False
 
 
 # --- SESSION & LOGGING ---
 def create_session(mode='Pomodoro'):
-    return Session.create(mode=mode, start_time=datetime.datetime.now())
+    with db.write_lock:
+        with db.write():
+            s = Session.create(mode=mode, start_time=datetime.datetime.now())
+        # DailyStats chỉ cộng phiên khi kết thúc (như rebuild_daily_stats) -> không ghi gì, chỉ báo listener
+        # để Dashboard tính cả phiên đang chạy
+        _notify_daily_stats([{
+            'day': format_date_str(s.start_time), 'category': SESSION_CATEGORY, 'process_name': s.mode,
+            'samples': 0, 'seconds': 0, 'sessions': 0, 'completed_sessions': 0, 'started_session': s.id,
+        }])
+    return s
 
 
 def end_session(session_id, duration_seconds, is_completed=False):
     try:
-        s = Session.get_by_id(session_id)
-        s.end_time = datetime.datetime.now()
-        s.duration = duration_seconds
-        s.is_completed = is_completed
-        s.save()
+        with db.write_lock:
+            with db.write():
+                s = Session.get_by_id(session_id)
+                # Phiên có thể bị kết thúc 2 lần (hết giờ rồi bấm Dừng trong giờ nghỉ)
+                # -> chỉ cộng phần chênh lệch vào DailyStats
+                was_ended = s.end_time is not None
+                delta_seconds = duration_seconds - (s.duration if was_ended else 0)
+                delta_completed = int(bool(is_completed)) - (int(bool(s.is_completed)) if was_ended else 0)
+
+                s.end_time = datetime.datetime.now()
+                s.duration = duration_seconds
+                s.is_completed = is_completed
+                s.save()
+
+                rows = [{
+                    'day': format_date_str(s.start_time), 'category': SESSION_CATEGORY, 'process_name': s.mode,
+                    'samples': 0, 'seconds': delta_seconds, 'sessions': 0 if was_ended else 1,
+                    'completed_sessions': delta_completed,
+                }]
+                _upsert_daily_stats(rows)
+            _notify_daily_stats([dict(rows[0], ended_session=s.id)])
     except:
         pass
 
 
-def log_activity(session_id, process, title, url=None, category='Work'):
-    try:
-        if session_id:
-            ActivityLog.create(session_id=session_id, process_name=process, window_title=title, url=url,
-                               category=category)
-    except Exception as e:
-        print(f"Log Error: {e}")
+# Nơi nhận các phần cộng dồn DailyStats vừa commit (vd: core/today_stats.py).
+# Được gọi từ thread đã ghi (thread giao diện hoặc thread ghi log), vẫn giữ db.write_lock
+# -> ai đọc DailyStats trong lúc giữ write_lock sẽ không nhận trùng / sót phần nào.
+_daily_stats_listeners = []
+
+
+def add_daily_stats_listener(callback):
+    """callback(rows): rows là danh sách dict cùng dạng với _upsert_daily_stats().
+    Dòng từ create_session() / end_session() có thêm khoá 'started_session' / 'ended_session' (id phiên)"""
+    _daily_stats_listeners.append(callback)
+
+
+def remove_daily_stats_listener(callback):
+    if callback in _daily_stats_listeners:
+        _daily_stats_listeners.remove(callback)
+
+
+def _notify_daily_stats(rows):
+    for callback in list(_daily_stats_listeners):
+        try:
+            callback(rows)
+        except Exception as e:
+            print(f"DailyStats Listener Error: {e}")
+
+
+def _upsert_daily_stats(rows):
+    """Cộng dồn vào DailyStats (INSERT ... ON CONFLICT DO UPDATE)"""
+    if not rows:
+        return
+    (DailyStats
+     .insert_many(rows)
+     .on_conflict(conflict_target=[DailyStats.day, DailyStats.category, DailyStats.process_name],
+                  update={DailyStats.samples: DailyStats.samples + EXCLUDED.samples,
+                          DailyStats.seconds: DailyStats.seconds + EXCLUDED.seconds,
+                          DailyStats.sessions: DailyStats.sessions + EXCLUDED.sessions,
+                          DailyStats.completed_sessions: DailyStats.completed_sessions + EXCLUDED.completed_sessions})
+     .execute())
+
+
+def rebuild_daily_stats(days=None):
+    """Tính lại DailyStats từ dữ liệu gốc (Session + ActivityLog).
+    days: danh sách ngày cần tính lại, None = toàn bộ."""
+    day_col = fn.date(ActivityLog.timestamp)
+    activity = (ActivityLog
+                .select(day_col, ActivityLog.category, Process.name, fn.SUM(ActivityLog.samples),
+                        fn.SUM(ActivityLog.duration), 0, 0)
+                .join(Process)
+                .group_by(day_col, ActivityLog.category, ActivityLog.process))
+    session_day = fn.date(Session.start_time)
+    sessions = (Session
+                .select(session_day, Value(SESSION_CATEGORY), Session.mode, 0, fn.SUM(Session.duration),
+                        fn.COUNT(Session.id), fn.SUM(Session.is_completed))
+                .where(Session.end_time.is_null(False))
+                .group_by(session_day, Session.mode))
+    fields = [DailyStats.day, DailyStats.category, DailyStats.process_name, DailyStats.samples,
+              DailyStats.seconds, DailyStats.sessions, DailyStats.completed_sessions]
+
+    # Ngày đã lưu trữ (database/retention.py) không còn ActivityLog trong DB
+    # -> giữ nguyên số liệu hoạt động, chỉ tính lại phần Session
+    archived_before = get_setting(ARCHIVED_BEFORE_KEY, None)
+
+    with db.write():
+        if days is None:
+            if archived_before:
+                DailyStats.delete().where((DailyStats.day >= archived_before) |
+                                          (DailyStats.category == SESSION_CATEGORY)).execute()
+                activity = activity.where(ActivityLog.timestamp >= day_range(archived_before)[0])
+            else:
+                DailyStats.delete().execute()
+            DailyStats.insert_from(activity, fields).execute()
+            DailyStats.insert_from(sessions, fields).execute()
+            return
+        for day in sorted({format_date_str(d)[:10] for d in days}):
+            start, end = day_range(day)
+            if archived_before and day < archived_before:
+                DailyStats.delete().where((DailyStats.day == day) &
+                                          (DailyStats.category == SESSION_CATEGORY)).execute()
+            else:
+                DailyStats.delete().where(DailyStats.day == day).execute()
+                DailyStats.insert_from(
+                    activity.where((ActivityLog.timestamp >= start) & (ActivityLog.timestamp < end)),
+                    fields).execute()
+            DailyStats.insert_from(
+                sessions.where((Session.start_time >= start) & (Session.start_time < end)), fields).execute()
+
+
+class StringInterner:
+    """Cache trong tiến trình cho các bảng từ điển Process / Title / Url:
+    chuỗi -> id (khi ghi) và id -> chuỗi (khi đọc). Chuỗi hay gặp chỉ chạm DB lần đầu.
+    Mỗi bảng giữ tối đa max_size mục (LRU) để tiêu đề cửa sổ lạ không làm phình RAM."""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.ids = {}  # model -> OrderedDict(chuỗi -> id)
+        self.texts = {}  # model -> OrderedDict(id -> chuỗi)
+
+    @staticmethod
+    def _field(model):
+        return model.name if model is Process else model.text
+
+    def _get(self, store, model, key):
+        with self.lock:
+            cache = store.setdefault(model, OrderedDict())
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _remember(self, model, text, id_):
+        with self.lock:
+            for store, key, value in ((self.ids, text, id_), (self.texts, id_, text)):
+                cache = store.setdefault(model, OrderedDict())
+                cache[key] = value
+                if len(cache) > self.max_size:
+                    cache.popitem(last=False)
+
+    def get_id(self, model, text):
+        """id của chuỗi trong bảng từ điển, tự thêm dòng mới nếu chưa có (None -> None)"""
+        if text is None:
+            return None
+        id_ = self._get(self.ids, model, text)
+        if id_ is None:
+            field = self._field(model)
+            id_ = model.select(model.id).where(field == text).scalar()
+            if id_ is None:
+                # Thread khác có thể vừa thêm cùng chuỗi -> bỏ qua xung đột rồi đọc lại
+                with db.write():
+                    model.insert({field: text}).on_conflict_ignore().execute()
+                id_ = model.select(model.id).where(field == text).scalar()
+            self._remember(model, text, id_)
+        return id_
+
+    def get_text(self, model, id_):
+        if id_ is None:
+            return None
+        text = self._get(self.texts, model, id_)
+        if text is None:
+            text = model.select(self._field(model)).where(model.id == id_).scalar()
+            if text is not None:
+                self._remember(model, text, id_)
+        return text
+
+    def clear(self):
+        """Gọi khi transaction ghi bị rollback (id vừa cấp có thể không còn tồn tại)"""
+        with self.lock:
+            self.ids.clear()
+            self.texts.clear()
+
+
+_interner = StringInterner()
+
+
+# Mẫu mới được nối vào span đang mở nếu bắt đầu không quá N giây sau khi span kết thúc
+SPAN_GAP_SECONDS = 5
+SPAN_FIELDS = ('session', 'timestamp', 'end_time', 'duration', 'samples', 'category')
+# Lô ghi lỗi (vd: DB đang bị sync / export giữ khoá) được giữ lại và thử lại ở các lần ghi sau,
+# quá chừng này lần liên tiếp thì mới bỏ
+MAX_WRITE_ATTEMPTS = 6
+
+
+def _span_row(span):
+    """Span (chuỗi gốc) -> dòng ActivityLog (id của bảng từ điển)"""
+    row = {k: span[k] for k in SPAN_FIELDS}
+    row['process'] = _interner.get_id(Process, span['process_name'] or '')
+    row['title'] = _interner.get_id(Title, span['window_title'])
+    row['url'] = _interner.get_id(Url, span['url'] or None)
+    return row
+
+
+class ActivityLogWriter:
+    """Ghi log kiểu write-behind: UI chỉ bỏ mẫu vào hàng đợi (không chờ ổ đĩa),
+    thread nền gom lại và ghi bằng insert_many trong 1 transaction khi đủ
+    max_batch mẫu hoặc mẫu cũ nhất đã chờ quá max_age_seconds.
+    Ở chế độ span, mẫu giống mẫu trước được gộp vào span đang mở (UPDATE tại chỗ)."""
+
+    def __init__(self, max_batch=100, max_age_seconds=10.0, span_mode=True):
+        self.max_batch = max_batch
+        self.max_age_seconds = max_age_seconds
+        self.span_mode = span_mode
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        # Span cuối cùng (chỉ thread ghi mới đụng tới)
+        self.open_span = None
+        # Phần chưa ghi được của các lô lỗi: span đã đóng + cộng dồn DailyStats
+        self.pending_closed = []
+        self.pending_stats = {}
+        self.failed_writes = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="ActivityLogWriter", daemon=True)
+                self.thread.start()
+
+    def submit(self, row):
+        self.start()
+        self.queue.put(row)
+
+    def flush(self, timeout=10.0):
+        """Chờ tới khi mọi mẫu đã gửi trước đó được ghi xuống DB"""
+        if self.thread is None or not self.thread.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def stop(self, timeout=10.0):
+        """Ghi nốt phần còn lại rồi dừng thread (gọi khi thoát app)"""
+        if self.thread is None or not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        buffer = []
+        oldest = None
+        while True:
+            # Chỉ đặt timeout khi đang có mẫu chờ ghi (hoặc lô lỗi chờ thử lại)
+            if buffer:
+                wait = max(0.0, self.max_age_seconds - (time.monotonic() - oldest))
+            else:
+                wait = self.max_age_seconds if self.failed_writes else None
+            try:
+                item = self.queue.get(timeout=wait)
+            except queue.Empty:
+                item = False  # Hết hạn chờ -> ghi
+
+            if isinstance(item, dict):
+                if not buffer:
+                    oldest = time.monotonic()
+                buffer.append(item)
+                if len(buffer) < self.max_batch:
+                    continue
+
+            self._write(buffer)
+            buffer = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                # Thoát app: chép hết WAL vào file DB và cắt WAL về 0
+                self._checkpoint('TRUNCATE')
+                db.close()
+                return
+            # Checkpoint định kỳ ở thread này thay vì để COMMIT của thread giao diện gánh
+            if db.checkpoint_due():
+                self._checkpoint('PASSIVE')
+
+    def _checkpoint(self, mode):
+        try:
+            db.checkpoint(mode)
+        except Exception as e:
+            print(f"Checkpoint Error: {e}")
+
+    def _merge(self, samples):
+        """Gộp mẫu thành span. Trả về (các span đã đóng, cộng dồn DailyStats)"""
+        closed = []
+        stats = {}
+        for sample in samples:
+            duration = sample['duration']
+            end = sample['timestamp']
+            start = end - datetime.timedelta(seconds=duration)
+            span = self.open_span
+            if (self.span_mode and span is not None
+                    and all(span[k] == sample[k] for k in ('session', 'process_name', 'window_title', 'url', 'category'))
+                    and start <= span['end_time'] + datetime.timedelta(seconds=SPAN_GAP_SECONDS)):
+                # Giống hệt mẫu trước và liền mạch -> kéo dài span
+                span['end_time'] = end
+                span['duration'] += duration
+                span['samples'] += 1
+                span['dirty'] = True
+            else:
+                if span is not None:
+                    closed.append(span)
+                span = self.open_span = dict(sample, timestamp=start, end_time=end, samples=1, id=None, dirty=True)
+
+            key = (format_date_str(span['timestamp']), span['category'], span['process_name'])
+            entry = stats.setdefault(key, [0, 0])
+            entry[0] += 1
+            entry[1] += duration
+
+        if not self.span_mode and self.open_span is not None:
+            closed.append(self.open_span)
+            self.open_span = None
+        return closed, stats
+
+    def _write(self, samples):
+        if not samples and not self.failed_writes:
+            return
+        closed, stats = self._merge(samples)
+        # Gộp với phần còn lại của lô lỗi trước
+        self.pending_closed.extend(closed)
+        for key, (count, seconds) in stats.items():
+            entry = self.pending_stats.setdefault(key, [0, 0])
+            entry[0] += count
+            entry[1] += seconds
+        closed = self.pending_closed
+        stats_rows = [{'day': day, 'category': category, 'process_name': process,
+                       'samples': count, 'seconds': seconds, 'sessions': 0, 'completed_sessions': 0}
+                      for (day, category, process), (count, seconds) in self.pending_stats.items()]
+        # id / dirty bị đổi trong transaction -> nhớ lại để khôi phục nếu transaction bị rollback
+        spans = closed + ([self.open_span] if self.open_span is not None else [])
+        saved = [(span, span['id'], span['dirty']) for span in spans]
+        try:
+            # Giữ write_lock tới khi báo xong cho listener (xem _notify_daily_stats)
+            with db.write_lock:
+                with db.write():
+                    new_rows = [_span_row(span) for span in closed if span['id'] is None]
+                    if new_rows:
+                        ActivityLog.insert_many(new_rows).execute()
+                    for span in closed:
+                        if span['id'] is not None and span['dirty']:
+                            self._update_span(span)
+                            span['dirty'] = False
+
+                    # Span đang mở: ghi lần đầu để lấy id, các lần sau chỉ UPDATE tại chỗ
+                    span = self.open_span
+                    if span is not None:
+                        if span['id'] is None:
+                            span['id'] = ActivityLog.insert(_span_row(span)).execute()
+                        elif span['dirty']:
+                            self._update_span(span)
+                        span['dirty'] = False
+
+                    _upsert_daily_stats(stats_rows)
+                _notify_daily_stats(stats_rows)
+        except Exception as e:
+            # Rollback: span chưa hề được ghi / cập nhật -> lần thử lại INSERT / UPDATE lại từ đầu
+            for span, span_id, dirty in saved:
+                span['id'], span['dirty'] = span_id, dirty
+            _interner.clear()
+            self.failed_writes += 1
+            if self.failed_writes < MAX_WRITE_ATTEMPTS:
+                print(f"Log Error (sẽ thử lại): {e}")
+                return
+            print(f"Log Error: {e} -> bỏ {sum(count for count, _ in self.pending_stats.values())} mẫu "
+                  f"sau {self.failed_writes} lần thử")
+            # Bỏ luôn phần chưa ghi của span đang mở (DB giữ giá trị đã commit lần cuối, nếu có)
+            self.open_span = None
+        self.pending_closed = []
+        self.pending_stats = {}
+        self.failed_writes = 0
+
+    def _update_span(self, span):
+        (ActivityLog
+         .update(end_time=span['end_time'], duration=span['duration'], samples=span['samples'])
+         .where(ActivityLog.id == span['id'])
+         .execute())
+
+
+_log_writer = ActivityLogWriter()
+
+
+def log_activity(session_id, process, title, url=None, category='Work', duration=0):
+    """Không chặn UI: mẫu được ghi theo lô bởi ActivityLogWriter.
+    duration: số giây mà mẫu này đại diện (cộng vào DailyStats)"""
+    if session_id:
+        _log_writer.submit({'session': session_id, 'timestamp': datetime.datetime.now(),
+                            'process_name': process, 'window_title': title, 'url': url,
+                            'category': category, 'duration': duration})
+
+
+def set_log_storage_mode(mode):
+    """'span' (mặc định): gộp mẫu giống nhau liên tiếp thành 1 dòng; 'sample': mỗi mẫu 1 dòng"""
+    _log_writer.span_mode = (mode != 'sample')
+
+
+def flush_activity_log():
+    """Ghi ngay các log đang chờ (gọi khi kết thúc phiên / trước khi đọc báo cáo).
+    Chặn tới khi ghi xong -> gọi từ thread nền nếu được (xem ui/report_tab.py)"""
+    _log_writer.flush()
+
+
+def stop_activity_log():
+    _log_writer.stop()
+
+
+def reclassify_activity(classify, chunk_size=5000, progress_callback=None, should_stop=None):
+    """Phân loại lại toàn bộ ActivityLog theo Blacklist hiện tại.
+    Đọc theo từng khúc id tăng dần (không giữ cả bảng trong RAM), chỉ UPDATE các dòng
+    đổi category bằng executemany, mỗi khúc 1 transaction ngắn để không khoá DB lâu.
+    classify(process, title, url) -> 'Work' / 'Distraction'. Trả về số dòng đã đổi."""
+    total = ActivityLog.select().count()
+    sql = f'UPDATE "{ActivityLog._meta.table_name}" SET "category" = ? WHERE "id" = ?'
+
+    # Cùng 1 cửa sổ lặp lại rất nhiều lần -> nhớ kết quả phân loại theo bộ id
+    memo = {}
+    changed_days = set()
+    last_id = 0
+    processed = 0
+    changed = 0
+    while True:
+        rows = list(ActivityLog
+                    .select(ActivityLog.id, ActivityLog.process, ActivityLog.title,
+                            ActivityLog.url, ActivityLog.category, ActivityLog.timestamp)
+                    .where(ActivityLog.id > last_id)
+                    .order_by(ActivityLog.id)
+                    .limit(chunk_size)
+                    .tuples())
+        if not rows:
+            break
+
+        updates = []
+        for row_id, process_id, title_id, url_id, category, timestamp in rows:
+            key = (process_id, title_id, url_id)
+            new_category = memo.get(key)
+            if new_category is None:
+                new_category = memo[key] = classify(_interner.get_text(Process, process_id),
+                                                    _interner.get_text(Title, title_id),
+                                                    _interner.get_text(Url, url_id))
+            if new_category != category:
+                updates.append((new_category, row_id))
+                changed_days.add(format_date_str(timestamp)[:10])
+
+        if updates:
+            with db.write():
+                db.cursor().executemany(sql, updates)
+            changed += len(updates)
+
+        last_id = rows[-1][0]
+        processed += len(rows)
+        if progress_callback:
+            progress_callback(processed, total)
+        if should_stop and should_stop():
+            break
+
+    # Chỉ tính lại DailyStats của những ngày có dòng bị đổi
+    if changed_days:
+        rebuild_daily_stats(changed_days)
+    return changed
 
 
 # --- REPORT & STATS (CÁC HÀM QUAN TRỌNG) ---
@@ -120,29 +671,27 @@ def format_date_str(date_input):
     return str(date_input)  # Nếu là string thì giữ nguyên
 
 
-def get_today_stats():
-    """Thống kê nhanh cho biểu đồ tròn Dashboard"""
-    try:
-        today = datetime.date.today()
-        start = datetime.datetime.combine(today, datetime.time.min)
-        end = datetime.datetime.combine(today, datetime.time.max)
-
-        work = ActivityLog.select().where((ActivityLog.timestamp >= start) & (ActivityLog.timestamp <= end) & (
-                    ActivityLog.category == 'Work')).count()
-        distraction = ActivityLog.select().where((ActivityLog.timestamp >= start) & (ActivityLog.timestamp <= end) & (
-                    ActivityLog.category == 'Distraction')).count()
-        return {'work': work, 'distraction': distraction}
-    except:
-        return {'work': 0, 'distraction': 0}
+def day_range(date_input):
+    """Helper: Khoảng nửa mở [00:00 ngày đó, 00:00 ngày hôm sau).
+    So sánh trực tiếp trên cột (không bọc fn.date) để SQLite dùng được index."""
+    day = datetime.datetime.strptime(format_date_str(date_input)[:10], "%Y-%m-%d")
+    return day, day + datetime.timedelta(days=1)
+
+
+def _daily_sum(day, column, category, process_name=None):
+    """Helper: SUM 1 cột của DailyStats trong 1 ngày (đọc vài dòng thay vì quét ActivityLog)"""
+    query = DailyStats.select(fn.SUM(column)).where(
+        (DailyStats.day == format_date_str(day)[:10]) & (DailyStats.category == category))
+    if process_name is not None:
+        query = query.where(DailyStats.process_name == process_name)
+    return query.scalar() or 0
 
 
 def get_total_work_time_str(date_obj):
     """Tính tổng thời gian làm việc trong ngày -> Trả về chuỗi hiển thị"""
     try:
-        target = format_date_str(date_obj)
-        # Chỉ tính session đã hoàn thành hoặc có duration > 0
-        sessions = Session.select().where((fn.date(Session.start_time) == target) & (Session.mode == 'Pomodoro'))
-        total_sec = sum([s.duration for s in sessions])
+        # Chỉ tính session đã kết thúc (đã được cộng vào DailyStats)
+        total_sec = _daily_sum(date_obj, DailyStats.seconds, SESSION_CATEGORY, 'Pomodoro')
         total_min = total_sec // 60
 
         h = total_min // 60
@@ -152,36 +701,43 @@ def get_total_work_time_str(date_obj):
         return "0 phút", 0
 
 
+# 1 dòng của bảng Top Apps trong báo cáo
+AppStat = namedtuple('AppStat', ['window_title', 'process_name', 'category', 'seconds'])
+
+
 def get_daily_breakdown(date_obj):
     """Lấy danh sách Session và Top Apps"""
-    target = format_date_str(date_obj)
+    start, end = day_range(date_obj)
 
     # 1. Sessions
-    sessions = Session.select().where(fn.date(Session.start_time) == target)
-
-    # 2. Apps Stats (Group by Window Title)
-    app_stats = (ActivityLog
-                 .select(ActivityLog.window_title, ActivityLog.process_name, ActivityLog.category,
-                         fn.COUNT(ActivityLog.id).alias('count'))
-                 .where(fn.date(ActivityLog.timestamp) == target)
-                 .group_by(ActivityLog.window_title)
-                 .order_by(fn.COUNT(ActivityLog.id).desc())
-                 .limit(15))
+    sessions = (Session.select()
+                .where((Session.start_time >= start) & (Session.start_time < end))
+                .order_by(Session.start_time))
+
+    # 2. Apps Stats (Group by Window Title) - GROUP BY / top-N trên id số nguyên,
+    # chỉ tra chuỗi cho 15 dòng kết quả
+    top = list(ActivityLog
+               .select(ActivityLog.title, ActivityLog.process, ActivityLog.category,
+                       fn.SUM(ActivityLog.duration))
+               .where((ActivityLog.timestamp >= start) & (ActivityLog.timestamp < end))
+               .group_by(ActivityLog.title)
+               .order_by(fn.SUM(ActivityLog.duration).desc())
+               .limit(15)
+               .tuples())
+    app_stats = [AppStat(_interner.get_text(Title, title_id), _interner.get_text(Process, process_id),
+                         category, seconds)
+                 for title_id, process_id, category, seconds in top]
 
     return sessions, app_stats
 
 
 def get_daily_health_report(date_obj):
     """Phân tích sức khoẻ"""
-    target = format_date_str(date_obj)
-
-    # Query tổng
-    total_work_query = Session.select(fn.SUM(Session.duration)).where(
-        (fn.date(Session.start_time) == target) & (Session.mode == 'Pomodoro')).scalar()
-    total_work_min = (total_work_query or 0) // 60
+    # Query tổng (từ bảng DailyStats)
+    total_work_min = _daily_sum(date_obj, DailyStats.seconds, SESSION_CATEGORY, 'Pomodoro') // 60
 
-    distraction_count = ActivityLog.select().where(
-        (fn.date(ActivityLog.timestamp) == target) & (ActivityLog.category == 'Distraction')).count()
+    # Thời gian xao nhãng thực tế (cộng duration của các span)
+    distraction_count = _daily_sum(date_obj, DailyStats.seconds, 'Distraction') // 60
 
     # Logic lời khuyên
     advice = "Ngày làm việc bình thường."
@@ -219,18 +775,16 @@ def get_historical_data(days=7):
             # Key phải là chuỗi YYYY-MM-DD chuẩn
             result[d.strftime("%Y-%m-%d")] = 0
 
-        # 3. Truy vấn DB - Sử dụng strftime để ép kiểu ngày tháng chính xác
-        # Cú pháp SQLite: strftime('%Y-%m-%d', column)
-        day_col = fn.strftime('%Y-%m-%d', Session.start_time)
-
-        query = (Session
-                 .select(day_col.alias('day_str'), fn.SUM(Session.duration).alias('total_sec'))
+        # 3. Truy vấn bảng tổng hợp DailyStats (mỗi ngày 1 dòng, không quét Session)
+        query = (DailyStats
+                 .select(DailyStats.day.alias('day_str'), fn.SUM(DailyStats.seconds).alias('total_sec'))
                  .where(
-            (Session.start_time >= start_datetime) &
-            (Session.mode == 'Pomodoro')
+            (DailyStats.day >= format_date_str(start_datetime)) &
+            (DailyStats.category == SESSION_CATEGORY) &
+            (DailyStats.process_name == 'Pomodoro')
         )
-                 .group_by(day_col)
-                 .order_by(day_col))
+                 .group_by(DailyStats.day)
+                 .order_by(DailyStats.day))
 
         # 4. Map dữ liệu từ DB vào dictionary
         for item in query:
@@ -248,6 +802,92 @@ def get_historical_data(days=7):
         return {}
 
 
+# Biểu đồ dài hạn: tối đa MAX_CHART_POINTS điểm, ngày được gộp thành tuần / tháng / năm cho vừa
+MAX_CHART_POINTS = 120
+# Mức gộp (nhỏ -> lớn) -> biểu thức SQL ra ngày đầu nhóm từ cột day 'YYYY-MM-DD'
+HISTORY_BUCKETS = OrderedDict([
+    ('day', lambda day: day),
+    ('week', lambda day: fn.date(day, 'weekday 0', '-6 days')),  # Thứ Hai đầu tuần
+    ('month', lambda day: fn.strftime('%Y-%m-01', day)),
+    ('year', lambda day: fn.strftime('%Y-01-01', day)),
+])
+# start: ngày đầu nhóm 'YYYY-MM-DD'; days: số ngày của nhóm nằm trong khoảng xem; minutes: tổng số phút
+HistoryPoint = namedtuple('HistoryPoint', ['start', 'days', 'minutes'])
+# start: ngày đầu của khoảng xem 'YYYY-MM-DD'
+HistorySeries = namedtuple('HistorySeries', ['bucket', 'start', 'points'])
+
+
+def _bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _next_bucket(start, bucket):
+    if bucket == 'day':
+        return start + datetime.timedelta(days=1)
+    if bucket == 'week':
+        return start + datetime.timedelta(days=7)
+    if bucket == 'month':
+        return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start.replace(year=start.year + 1)
+
+
+def _bucket_count(start, end, bucket):
+    """Số nhóm từ nhóm chứa start tới nhóm chứa end (tính thẳng, không duyệt từng ngày)"""
+    if bucket == 'day':
+        return (end - start).days + 1
+    if bucket == 'week':
+        return (_bucket_start(end, bucket) - _bucket_start(start, bucket)).days // 7 + 1
+    if bucket == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return end.year - start.year + 1
+
+
+def get_history_series(days=None, max_points=MAX_CHART_POINTS):
+    """Dữ liệu biểu đồ dài hạn: số phút Pomodoro của `days` ngày qua (None = toàn bộ lịch sử),
+    tự chọn mức gộp nhỏ nhất để không quá max_points điểm.
+    Gộp ngay trong SQL trên DailyStats (mỗi ngày vài dòng) -> số dòng trả về, phần Python và việc vẽ
+    không phụ thuộc lịch sử dài bao nhiêu. Trả về HistorySeries, nhóm không có dữ liệu = 0 phút."""
+    today = datetime.date.today()
+    pomodoro = (DailyStats.category == SESSION_CATEGORY) & (DailyStats.process_name == 'Pomodoro')
+    if days is None:
+        first = DailyStats.select(fn.MIN(DailyStats.day)).where(pomodoro).scalar()
+        start = datetime.date.fromisoformat(first[:10]) if first else today
+    else:
+        start = today - datetime.timedelta(days=days)
+    start = min(start, today)
+
+    for bucket in HISTORY_BUCKETS:
+        if _bucket_count(start, today, bucket) <= max_points:
+            break
+    else:
+        # Lịch sử dài hơn max_points năm -> chỉ giữ các năm gần nhất
+        start = datetime.date(today.year - max_points + 1, 1, 1)
+
+    bucket_col = HISTORY_BUCKETS[bucket](DailyStats.day)
+    totals = dict(DailyStats
+                  .select(bucket_col, fn.SUM(DailyStats.seconds))
+                  .where(pomodoro & (DailyStats.day >= format_date_str(start)))
+                  .group_by(bucket_col)
+                  .tuples())
+
+    points = []
+    group = _bucket_start(start, bucket)
+    while group <= today:
+        following = _next_bucket(group, bucket)
+        # Nhóm đầu / cuối có thể chỉ nằm 1 phần trong khoảng xem
+        in_range = (min(following, today + datetime.timedelta(days=1)) - max(group, start)).days
+        key = format_date_str(group)
+        points.append(HistoryPoint(key, in_range, (totals.get(key) or 0) // 60))
+        group = following
+    return HistorySeries(bucket, format_date_str(start), points)
+
+
 # --- HÀM TẠO DỮ LIỆU MẪU (NÂNG CẤP) ---
 def seed_sample_data():
     """Tạo dữ liệu giả 30 ngày để test các trường hợp báo cáo"""
@@ -266,9 +906,12 @@ def seed_sample_data():
     work_apps = ["PyCharm", "Visual Studio Code", "StackOverflow", "Document.docx", "Figma"]
     distract_apps = ["Facebook", "YouTube", "TikTok", "Netflix", "League of Legends"]
 
+    # Gom toàn bộ ActivityLog rồi ghi 1 lần bằng insert_many (thay vì ~10k lệnh create() rời)
+    activity_rows = []
+
     # Hàm phụ trợ để tạo 1 phiên làm việc
     def create_fake_session(date_obj, duration_min, is_distracted=False):
-        # Tạo Session
+        # Tạo Session (cần id ngay để gắn cho ActivityLog)
         s = Session.create(
             start_time=date_obj,
             end_time=date_obj + datetime.timedelta(minutes=duration_min),
@@ -289,56 +932,63 @@ def seed_sample_data():
                 cat = 'Work'
                 app = random.choice(work_apps)
 
-            ActivityLog.create(
-                session=s,
-                timestamp=log_time,
-                process_name=app + ".exe",
-                window_title=f"{app} - Window",
-                category=cat
-            )
-
-    # --- KỊCH BẢN 1: HÔM NAY - PHONG ĐỘ TUYỆT VỜI (Green) ---
-    # Làm 4 tiếng, ít xao nhãng
-    base_time = today.replace(hour=8, minute=0)
-    for _ in range(4):  # 4 session x 60p
-        create_fake_session(base_time, 60, is_distracted=False)
-        base_time += datetime.timedelta(minutes=75)  # Nghỉ 15p
-
-    # --- KỊCH BẢN 2: HÔM QUA - MẤT TẬP TRUNG (Orange) ---
-    # Làm ít, chơi nhiều (Distraction count > 20)
-    yesterday = today - datetime.timedelta(days=1)
-    base_time = yesterday.replace(hour=9, minute=0)
-    for _ in range(3):
-        create_fake_session(base_time, 45, is_distracted=True)  # Set flag distracted
-        base_time += datetime.timedelta(minutes=60)
-
-    # --- KỊCH BẢN 3: HÔM KIA - LÀM VIỆC QUÁ SỨC (Red) ---
-    # Làm > 8 tiếng (480 phút)
-    day_minus_2 = today - datetime.timedelta(days=2)
-    base_time = day_minus_2.replace(hour=7, minute=0)
-    # Tạo 10 session, mỗi session 50 phút = 500 phút
-    for _ in range(10):
-        create_fake_session(base_time, 50, is_distracted=False)
-        base_time += datetime.timedelta(minutes=55)
-
-    # --- KỊCH BẢN 4: 27 NGÀY CÒN LẠI (RANDOM) ---
-    for i in range(3, 30):
-        target_date = today - datetime.timedelta(days=i)
-
-        # Random: 20% là ngày nghỉ (không tạo data)
-        if random.random() < 0.2:
-            continue
-
-        # Random số session trong ngày (2 đến 6 session)
-        num_sessions = random.randint(2, 6)
-        start_hour = random.randint(8, 14)
-        base_time = target_date.replace(hour=start_hour, minute=0)
-
-        for _ in range(num_sessions):
-            dur = random.randint(25, 45)
-            # 10% cơ hội là phiên xao nhãng
-            is_bad = random.random() < 0.1
-            create_fake_session(base_time, dur, is_distracted=is_bad)
-            base_time += datetime.timedelta(minutes=dur + 10)
-
-    print("✅ Đã tạo xong dữ liệu mẫu cho 30 ngày!")
\ No newline at end of file
+            activity_rows.append({
+                'session': s.id,
+                'timestamp': log_time,
+                'end_time': log_time + datetime.timedelta(minutes=1),
+                'duration': 60,
+                'process': _interner.get_id(Process, app + ".exe"),
+                'title': _interner.get_id(Title, f"{app} - Window"),
+                'category': cat,
+            })
+
+    # Toàn bộ dữ liệu mẫu ghi trong 1 transaction
+    with db.write():
+        # --- KỊCH BẢN 1: HÔM NAY - PHONG ĐỘ TUYỆT VỜI (Green) ---
+        # Làm 4 tiếng, ít xao nhãng
+        base_time = today.replace(hour=8, minute=0)
+        for _ in range(4):  # 4 session x 60p
+            create_fake_session(base_time, 60, is_distracted=False)
+            base_time += datetime.timedelta(minutes=75)  # Nghỉ 15p
+
+        # --- KỊCH BẢN 2: HÔM QUA - MẤT TẬP TRUNG (Orange) ---
+        # Làm ít, chơi nhiều (Distraction count > 20)
+        yesterday = today - datetime.timedelta(days=1)
+        base_time = yesterday.replace(hour=9, minute=0)
+        for _ in range(3):
+            create_fake_session(base_time, 45, is_distracted=True)  # Set flag distracted
+            base_time += datetime.timedelta(minutes=60)
+
+        # --- KỊCH BẢN 3: HÔM KIA - LÀM VIỆC QUÁ SỨC (Red) ---
+        # Làm > 8 tiếng (480 phút)
+        day_minus_2 = today - datetime.timedelta(days=2)
+        base_time = day_minus_2.replace(hour=7, minute=0)
+        # Tạo 10 session, mỗi session 50 phút = 500 phút
+        for _ in range(10):
+            create_fake_session(base_time, 50, is_distracted=False)
+            base_time += datetime.timedelta(minutes=55)
+
+        # --- KỊCH BẢN 4: 27 NGÀY CÒN LẠI (RANDOM) ---
+        for i in range(3, 30):
+            target_date = today - datetime.timedelta(days=i)
+
+            # Random: 20% là ngày nghỉ (không tạo data)
+            if random.random() < 0.2:
+                continue
+
+            # Random số session trong ngày (2 đến 6 session)
+            num_sessions = random.randint(2, 6)
+            start_hour = random.randint(8, 14)
+            base_time = target_date.replace(hour=start_hour, minute=0)
+
+            for _ in range(num_sessions):
+                dur = random.randint(25, 45)
+                # 10% cơ hội là phiên xao nhãng
+                is_bad = random.random() < 0.1
+                create_fake_session(base_time, dur, is_distracted=is_bad)
+                base_time += datetime.timedelta(minutes=dur + 10)
+
+        for batch in chunked(activity_rows, 500):
+            ActivityLog.insert_many(batch).execute()
+        rebuild_daily_stats()
+    print("✅ Đã tạo xong dữ liệu mẫu cho 30 ngày!")
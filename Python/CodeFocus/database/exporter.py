@@ -0,0 +1,201 @@
+# Xuất Session + ActivityLog của 1 khoảng ngày ra CSV / JSONL / Parquet.
+# Đọc bằng cursor tuple (.iterator(), không cache kết quả) và ghi theo từng khúc
+# -> bộ nhớ không đổi dù khoảng ngày có hàng triệu dòng.
+#
+#   python -m database.exporter --from 2026-01-01 --to 2026-03-31 --format csv --out export/codefocus
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+
+from peewee import JOIN
+
+from database import db_manager
+from database.db_manager import ActivityLog, Session, Process, Title, Url
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+SESSION_COLUMNS = ('id', 'start_time', 'end_time', 'duration', 'mode', 'is_completed')
+ACTIVITY_COLUMNS = ('id', 'session_id', 'timestamp', 'end_time', 'duration', 'samples',
+                    'process', 'title', 'url', 'category')
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def available_formats():
+    return [f for f in FORMATS if f != 'parquet' or parquet_available()]
+
+
+def _text(value):
+    """datetime -> chuỗi giống cách peewee lưu trong DB"""
+    return str(value) if isinstance(value, datetime.datetime) else value
+
+
+class CsvChunkWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows([[_text(v) for v in row] for row in rows])
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlChunkWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.columns = columns
+
+    def write(self, rows):
+        self.file.write("".join(
+            json.dumps(dict(zip(self.columns, (_text(v) for v in row))), ensure_ascii=False) + "\n"
+            for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetChunkWriter:
+    """Mỗi khúc thành 1 row group (cần pyarrow)"""
+
+    def __init__(self, path, columns, types):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.columns = columns
+        self.schema = pyarrow.schema([(c, getattr(pyarrow, t)() if t != 'timestamp' else pyarrow.timestamp('us'))
+                                      for c, t in zip(columns, types)])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        arrays = [list(col) for col in zip(*rows)] if rows else [[] for _ in self.columns]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+# Kiểu cột cho Parquet (tên hàm kiểu của pyarrow)
+SESSION_TYPES = ('int64', 'timestamp', 'timestamp', 'int64', 'string', 'bool_')
+ACTIVITY_TYPES = ('int64', 'int64', 'timestamp', 'timestamp', 'int64', 'int64', 'string', 'string', 'string', 'string')
+
+
+def _open_writer(fmt, path, columns, types):
+    if fmt == 'csv':
+        return CsvChunkWriter(path, columns)
+    if fmt == 'jsonl':
+        return JsonlChunkWriter(path, columns)
+    if fmt == 'parquet':
+        if not parquet_available():
+            raise RuntimeError("Xuất Parquet cần cài pyarrow (pip install pyarrow)")
+        return ParquetChunkWriter(path, columns, types)
+    raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+
+
+def session_query(start, end):
+    return (Session
+            .select(Session.id, Session.start_time, Session.end_time, Session.duration, Session.mode,
+                    Session.is_completed)
+            .where((Session.start_time >= start) & (Session.start_time < end))
+            .order_by(Session.start_time))
+
+
+def activity_query(start, end):
+    return (ActivityLog
+            .select(ActivityLog.id, ActivityLog.session, ActivityLog.timestamp, ActivityLog.end_time,
+                    ActivityLog.duration, ActivityLog.samples, Process.name, Title.text, Url.text,
+                    ActivityLog.category)
+            .join(Process)
+            .switch(ActivityLog).join(Title, JOIN.LEFT_OUTER)
+            .switch(ActivityLog).join(Url, JOIN.LEFT_OUTER)
+            .where((ActivityLog.timestamp >= start) & (ActivityLog.timestamp < end))
+            .order_by(ActivityLog.timestamp))
+
+
+def export_range(prefix, start_date, end_date, fmt='csv', chunk_size=10000, progress_callback=None,
+                 should_stop=None):
+    """Xuất các ngày [start_date, end_date] (tính cả 2 đầu) ra
+    '<prefix>-sessions.<fmt>' và '<prefix>-activity.<fmt>'. Trả về danh sách file đã ghi.
+    progress_callback(số dòng đã ghi, tổng số dòng)"""
+    start, _ = db_manager.day_range(start_date)
+    _, end = db_manager.day_range(end_date)
+    jobs = [(f"{prefix}-sessions.{fmt}", session_query(start, end), SESSION_COLUMNS, SESSION_TYPES),
+            (f"{prefix}-activity.{fmt}", activity_query(start, end), ACTIVITY_COLUMNS, ACTIVITY_TYPES)]
+    total = sum(query.count() for _, query, _, _ in jobs)
+
+    directory = os.path.dirname(os.path.abspath(prefix))
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    files = []
+    for path, query, columns, types in jobs:
+        writer = _open_writer(fmt, path, columns, types)
+        files.append(path)
+        try:
+            chunk = []
+            for row in query.tuples().iterator():
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    writer.write(chunk)
+                    written += len(chunk)
+                    chunk = []
+                    if progress_callback:
+                        progress_callback(written, total)
+                    if should_stop and should_stop():
+                        return files
+            if chunk:
+                writer.write(chunk)
+                written += len(chunk)
+        finally:
+            writer.close()
+        if progress_callback:
+            progress_callback(written, total)
+    return files
+
+
+def _parse_date(text):
+    return datetime.datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(description="Xuất dữ liệu CodeFocus (Session + ActivityLog)")
+    parser.add_argument('--from', dest='start', type=_parse_date, default=today - datetime.timedelta(days=30),
+                        help="Ngày bắt đầu YYYY-MM-DD (mặc định: 30 ngày trước)")
+    parser.add_argument('--to', dest='end', type=_parse_date, default=today, help="Ngày kết thúc YYYY-MM-DD")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--out', default='codefocus-export', help="Tiền tố file xuất")
+    parser.add_argument('--db', default=None, help="File DB nguồn (mặc định như app)")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db_manager.configure_database(args.db)
+    db_manager.db.use_read_connection()
+
+    def progress(done, total):
+        print(f"\r  ... {done:,}/{total:,} dòng", end="", flush=True)
+
+    try:
+        files = export_range(args.out, args.start, args.end, args.format, args.chunk_size, progress)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    print()
+    for path in files:
+        print(f"✅ {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
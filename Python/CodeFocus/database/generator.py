@@ -0,0 +1,283 @@
+# Sinh dữ liệu giả quy mô lớn (1 năm, hàng triệu dòng ActivityLog) để benchmark báo cáo
+# với DB cỡ thật. Ghi bằng insert_many trong các transaction lớn; có thể chia cho nhiều
+# tiến trình, mỗi tiến trình ghi 1 file DB riêng rồi gộp lại bằng ATTACH.
+#
+#   python -m database.generator --out bench.db --days 365 --rows 10000000 --workers 4
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from peewee import chunked, fn
+
+from core.classifier import BlacklistClassifier
+from database import db_manager
+from database.db_manager import db, ActivityLog, Session, Process, Title, Url
+
+# (process, mẫu tiêu đề, mẫu URL, trọng số lúc làm việc, trọng số lúc xao nhãng)
+# {v} được thay bằng biến thể thứ v - biến thể nhỏ xuất hiện nhiều hơn (phân bố Zipf)
+ACTIVITY_TEMPLATES = [
+    ('Code.exe', '{v}.py - codefocus - Visual Studio Code', None, 30, 5),
+    ('pycharm64.exe', 'module_{v}.py - CodeFocus - PyCharm', None, 25, 4),
+    ('chrome.exe', 'Stack Overflow - question {v} - Google Chrome',
+     'https://stackoverflow.com/questions/{v}', 10, 3),
+    ('chrome.exe', 'Python docs - library {v} - Google Chrome',
+     'https://docs.python.org/3/library/lib{v}.html', 8, 1),
+    ('msedge.exe', 'peewee docs - api {v} - Microsoft Edge',
+     'http://docs.peewee-orm.com/en/latest/peewee/api{v}.html', 5, 1),
+    ('WINWORD.EXE', 'Report_{v}.docx - Word', None, 4, 1),
+    ('Figma.exe', 'Design {v} - Figma', None, 3, 1),
+    ('explorer.exe', 'File Explorer', None, 3, 2),
+    ('chrome.exe', 'YouTube - video {v} - Google Chrome', 'https://www.youtube.com/watch?v={v}', 2, 30),
+    ('chrome.exe', 'Facebook - Google Chrome', 'https://www.facebook.com/', 1, 20),
+    ('chrome.exe', 'TikTok - Google Chrome', 'https://www.tiktok.com/@user{v}', 1, 15),
+    ('league of legends', 'League of Legends', None, 0, 10),
+]
+
+ACTIVITY_FIELDS = [ActivityLog.session, ActivityLog.timestamp, ActivityLog.end_time, ActivityLog.duration,
+                   ActivityLog.samples, ActivityLog.process, ActivityLog.title, ActivityLog.url,
+                   ActivityLog.category]
+SESSION_FIELDS = [Session.id, Session.start_time, Session.end_time, Session.duration, Session.mode,
+                  Session.is_completed]
+
+
+class ActivityGenerator:
+    """Sinh Session + span ActivityLog cho từng ngày (chỉ tạo dữ liệu, không ghi DB).
+    rows_per_day: số span trung bình mỗi ngày làm việc (None = khoảng 1 span / 45 giây)."""
+
+    def __init__(self, seed=0, sessions_per_day=(2, 6), session_minutes=(25, 50), rows_per_day=None,
+                 idle_day_ratio=0.2, distracted_ratio=0.1, variants=200, classifier=None):
+        self.rng = random.Random(seed)
+        self.sessions_per_day = sessions_per_day
+        self.session_minutes = session_minutes
+        self.rows_per_day = rows_per_day
+        self.idle_day_ratio = idle_day_ratio
+        self.distracted_ratio = distracted_ratio
+        self.variants = variants
+        self.classifier = classifier or BlacklistClassifier(*db_manager.DEFAULT_BLACKLIST)
+
+        self.work_weights = [t[3] for t in ACTIVITY_TEMPLATES]
+        self.distracted_weights = [t[4] for t in ACTIVITY_TEMPLATES]
+        weights = [1.0 / (i + 1) for i in range(variants)]
+        self.variant_cum = [sum(weights[:i + 1]) for i in range(variants)]
+        self.activities = {}  # (template, biến thể) -> (process, title, url, category)
+
+    def _activity(self, template_index):
+        variant = self.rng.choices(range(self.variants), cum_weights=self.variant_cum)[0]
+        process, title, url, _, _ = ACTIVITY_TEMPLATES[template_index]
+        if '{v}' not in title and (url is None or '{v}' not in url):
+            variant = 0
+        key = (template_index, variant)
+        activity = self.activities.get(key)
+        if activity is None:
+            title = title.format(v=variant)
+            url = url.format(v=variant) if url else None
+            activity = self.activities[key] = (process, title, url, self.classifier.classify(process, title, url))
+        return activity
+
+    def _split(self, total_seconds, count):
+        """Chia 1 phiên thành count span có độ dài ngẫu nhiên (>= 1 giây)"""
+        weights = [self.rng.expovariate(1.0) for _ in range(count)]
+        scale = total_seconds / sum(weights)
+        return [max(1, int(w * scale)) for w in weights]
+
+    def day(self, date_obj):
+        """Trả về [(session, [activity, ...]), ...] của 1 ngày.
+        session: (start, end, duration, completed); activity: (start, end, duration, process, title, url, category)"""
+        rng = self.rng
+        if rng.random() < self.idle_day_ratio:
+            return []
+        num_sessions = rng.randint(*self.sessions_per_day)
+        start = datetime.datetime.combine(date_obj, datetime.time(rng.randint(7, 10), rng.randint(0, 59)))
+        result = []
+        for _ in range(num_sessions):
+            seconds = rng.randint(*self.session_minutes) * 60
+            if self.rows_per_day:
+                mean = self.rows_per_day / num_sessions
+                count = max(1, int(rng.uniform(0.5, 1.5) * mean + 0.5))
+            else:
+                count = max(1, seconds // 45)
+            weights = self.distracted_weights if rng.random() < self.distracted_ratio else self.work_weights
+
+            activities = []
+            t = start
+            for duration, index in zip(self._split(seconds, count), rng.choices(
+                    range(len(ACTIVITY_TEMPLATES)), weights=weights, k=count)):
+                end = t + datetime.timedelta(seconds=duration)
+                activities.append((t, end) + (duration,) + self._activity(index))
+                t = end
+
+            duration = int((t - start).total_seconds())
+            completed = rng.random() < 0.85
+            result.append(((start, t, duration, completed), activities))
+            start = t + datetime.timedelta(minutes=rng.randint(5, 20))
+        return result
+
+
+def use_database(path):
+    """Trỏ db dùng chung sang file khác và tạo schema"""
+    db_manager.configure_database(path)
+    db.connect()
+    db_manager.create_schema()
+    # Dữ liệu giả có thể sinh lại được -> không cần fsync từng transaction
+    db.execute_sql('PRAGMA synchronous = OFF')
+
+
+def _insert_sql(model, fields):
+    """Câu INSERT 1 dòng có tham số (peewee tạo 1 lần) để dùng với executemany"""
+    sql, _ = model.insert({field: None for field in fields}).sql()
+    return sql
+
+
+def write_days(generator, dates, batch_size=2000, transaction_rows=200000, progress=None):
+    """Sinh và ghi các ngày vào DB đang dùng. Trả về số dòng ActivityLog đã ghi.
+    Hàng triệu dòng ActivityLog: dựng SQL cho từng lô insert_many tốn thời gian hơn cả
+    SQLite ghi -> dùng executemany trên 1 câu INSERT chuẩn bị sẵn."""
+    interner = db_manager._interner
+    next_session_id = (Session.select(fn.MAX(Session.id)).scalar() or 0) + 1
+    activity_sql = _insert_sql(ActivityLog, ACTIVITY_FIELDS)
+    sessions, activities = [], []
+    ids = {}  # (process, title, url) -> id trong bảng từ điển
+    written = 0
+
+    def flush():
+        with db.write():
+            for batch in chunked(sessions, batch_size):
+                Session.insert_many(batch, fields=SESSION_FIELDS).execute()
+            db.cursor().executemany(activity_sql, activities)
+        sessions.clear()
+        activities.clear()
+
+    for date_obj in dates:
+        for (start, end, duration, completed), spans in generator.day(date_obj):
+            session_id = next_session_id
+            next_session_id += 1
+            sessions.append((session_id, start, end, duration, 'Pomodoro', completed))
+            for span_start, span_end, span_seconds, process, title, url, category in spans:
+                key = (process, title, url)
+                string_ids = ids.get(key)
+                if string_ids is None:
+                    string_ids = ids[key] = (interner.get_id(Process, process), interner.get_id(Title, title),
+                                             interner.get_id(Url, url))
+                activities.append((session_id, str(span_start), str(span_end), span_seconds,
+                                   max(1, span_seconds // 30)) + string_ids + (category,))
+            if len(activities) >= transaction_rows:
+                written += len(activities)
+                flush()
+                if progress:
+                    progress(written)
+    written += len(activities)
+    flush()
+    if progress:
+        progress(written)
+    return written
+
+
+def merge_database(path):
+    """Gộp 1 file DB (cùng schema) vào DB đang dùng: id Session được dời lên sau id lớn nhất,
+    process / title / url được ánh xạ lại theo chuỗi"""
+    db.execute_sql('ATTACH DATABASE ? AS "src"', (path,))
+    try:
+        with db.write():
+            offset = Session.select(fn.MAX(Session.id)).scalar() or 0
+            for table, column in (('process', 'name'), ('title', 'text'), ('url', 'text')):
+                db.execute_sql(f'INSERT OR IGNORE INTO main."{table}" ("{column}") '
+                               f'SELECT "{column}" FROM src."{table}"')
+            db.execute_sql(
+                'INSERT INTO main."session" ("id", "start_time", "end_time", "duration", "mode", "is_completed") '
+                'SELECT "id" + ?, "start_time", "end_time", "duration", "mode", "is_completed" '
+                'FROM src."session" ORDER BY "id"', (offset,))
+            db.execute_sql(
+                'INSERT INTO main."activitylog" ("session_id", "timestamp", "end_time", "duration", "samples", '
+                '"process_id", "title_id", "url_id", "category") '
+                'SELECT a."session_id" + ?, a."timestamp", a."end_time", a."duration", a."samples", '
+                'p."id", t."id", u."id", a."category" FROM src."activitylog" AS a '
+                'JOIN src."process" AS sp ON sp."id" = a."process_id" '
+                'JOIN main."process" AS p ON p."name" = sp."name" '
+                'LEFT JOIN src."title" AS st ON st."id" = a."title_id" '
+                'LEFT JOIN main."title" AS t ON t."text" = st."text" '
+                'LEFT JOIN src."url" AS su ON su."id" = a."url_id" '
+                'LEFT JOIN main."url" AS u ON u."text" = su."text" '
+                'ORDER BY a."id"', (offset,))
+    finally:
+        db.execute_sql('DETACH DATABASE "src"')
+
+
+def _remove_db_files(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _generate_part(args):
+    """Chạy trong tiến trình con: sinh 1 phần các ngày vào file DB riêng"""
+    path, dates, options = args
+    _remove_db_files(path)
+    use_database(path)
+    try:
+        return write_days(ActivityGenerator(**options), dates)
+    finally:
+        db.close()
+
+
+def generate(path, days=365, rows=None, workers=1, seed=0, end_date=None, sessions_per_day=(2, 6),
+             idle_day_ratio=0.2, verbose=True):
+    """Sinh `days` ngày dữ liệu (kết thúc ở end_date, mặc định hôm nay) vào file `path`.
+    rows: tổng số dòng ActivityLog mong muốn (xấp xỉ). Trả về số dòng đã ghi."""
+    log = print if verbose else (lambda *a, **k: None)
+    end_date = end_date or datetime.date.today()
+    dates = [end_date - datetime.timedelta(days=days - 1 - i) for i in range(days)]
+    rows_per_day = rows / max(1.0, days * (1 - idle_day_ratio)) if rows else None
+    options = {'sessions_per_day': sessions_per_day, 'rows_per_day': rows_per_day, 'idle_day_ratio': idle_day_ratio}
+
+    started = time.perf_counter()
+    use_database(path)
+    if workers <= 1:
+        total = write_days(ActivityGenerator(seed=seed, **options), dates,
+                           progress=lambda n: log(f"  ... {n:,} dòng"))
+    else:
+        # Mỗi tiến trình 1 đoạn ngày liên tiếp -> gộp theo thứ tự để id tăng theo thời gian
+        size = -(-len(dates) // workers)
+        parts = [(f"{path}.part{i}", dates[i * size:(i + 1) * size], dict(options, seed=seed * 1000 + i))
+                 for i in range(workers) if dates[i * size:(i + 1) * size]]
+        with multiprocessing.Pool(len(parts)) as pool:
+            total = sum(pool.map(_generate_part, parts))
+        log(f"  ... {len(parts)} tiến trình đã sinh {total:,} dòng, đang gộp")
+        for part_path, _, _ in parts:
+            merge_database(part_path)
+            _remove_db_files(part_path)
+
+    db_manager.rebuild_daily_stats()
+    log(f"✅ {total:,} dòng ActivityLog / {days} ngày -> {path} ({time.perf_counter() - started:.1f}s)")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu giả cho CodeFocus (benchmark / thử tải)")
+    parser.add_argument('--out', default='codefocus_bench.db', help="File DB đích")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rows', type=int, default=None, help="Tổng số dòng ActivityLog (xấp xỉ)")
+    parser.add_argument('--sessions-per-day', type=int, nargs=2, default=(2, 6), metavar=('MIN', 'MAX'))
+    parser.add_argument('--workers', type=int, default=1, help="Số tiến trình sinh dữ liệu song song")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--force', action='store_true', help="Ghi đè nếu file đích đã tồn tại")
+    parser.add_argument('--append', action='store_true', help="Thêm vào DB đích đã có")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.out) and not args.append:
+        if not args.force:
+            print(f"❌ {args.out} đã tồn tại (dùng --force để ghi đè hoặc --append để thêm)")
+            return 1
+        _remove_db_files(args.out)
+
+    generate(args.out, days=args.days, rows=args.rows, workers=args.workers, seed=args.seed,
+             sessions_per_day=tuple(args.sessions_per_day))
+    db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Nâng cấp schema theo phiên bản (PRAGMA user_version), chạy khi khởi động app
+# Mỗi migration chỉ chạy 1 lần; DB cũ (codefocus.db) được nâng cấp tại chỗ.
+# DB mới tạo bằng create_tables() đã có schema mới nhất nhưng vẫn đi qua mọi bước,
+# nên mỗi bước phải chạy được trên cả 2 trường hợp.
+# Bước nào trả về True => cần tính lại DailyStats (làm 1 lần sau bước cuối, bằng code hiện tại).
+
+
+def _add_column(db, table, column, ddl):
+    if column not in {c.name for c in db.get_columns(table)}:
+        db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {ddl}')
+
+
+def _v1_report_indexes(db):
+    """Index phục vụ các truy vấn báo cáo theo ngày"""
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "activitylog_timestamp_category" '
+                   'ON "activitylog" ("timestamp", "category")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "activitylog_session_id" ON "activitylog" ("session_id")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "session_mode_start_time" ON "session" ("mode", "start_time")')
+
+
+def _v2_daily_stats(db):
+    """Bảng tổng hợp DailyStats, tính lần đầu từ dữ liệu cũ"""
+    from database import db_manager
+    db_manager.DailyStats.create_table(safe=True)
+    return True
+
+
+def _v3_activity_spans(db):
+    """ActivityLog lưu theo span: thêm end_time / duration / samples.
+    Dòng cũ (mỗi dòng 1 mẫu) được coi là span dài đúng 1 chu kỳ ghi log."""
+    from database import db_manager
+    _add_column(db, 'activitylog', 'end_time', 'DATETIME')
+    _add_column(db, 'activitylog', 'duration', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(db, 'activitylog', 'samples', 'INTEGER NOT NULL DEFAULT 1')
+    seconds = int(db_manager.get_setting('log_interval_seconds', 30))
+    db.execute_sql('UPDATE "activitylog" SET "duration" = ?, "end_time" = datetime("timestamp", ?) '
+                   'WHERE "end_time" IS NULL', (seconds, f'+{seconds} seconds'))
+    return True
+
+
+def _v4_string_tables(db):
+    """Tách process_name / window_title / url của ActivityLog ra bảng từ điển Process / Title / Url.
+    SQLite không đổi kiểu cột tại chỗ được -> dựng lại bảng activitylog (giữ nguyên id)."""
+    from database import db_manager
+    db.create_tables([db_manager.Process, db_manager.Title, db_manager.Url], safe=True)
+    if 'process_name' not in {c.name for c in db.get_columns('activitylog')}:
+        return False  # DB mới: create_tables() đã tạo schema mới
+
+    db.execute_sql('INSERT OR IGNORE INTO "process" ("name") '
+                   'SELECT DISTINCT "process_name" FROM "activitylog"')
+    db.execute_sql('INSERT OR IGNORE INTO "title" ("text") '
+                   'SELECT DISTINCT "window_title" FROM "activitylog" WHERE "window_title" IS NOT NULL')
+    db.execute_sql('INSERT OR IGNORE INTO "url" ("text") '
+                   'SELECT DISTINCT "url" FROM "activitylog" WHERE "url" IS NOT NULL AND "url" != \'\'')
+
+    # Index đi theo bảng khi đổi tên -> xoá trước để tạo lại cho bảng mới
+    for index in db.get_indexes('activitylog'):
+        db.execute_sql(f'DROP INDEX IF EXISTS "{index.name}"')
+    db.execute_sql('ALTER TABLE "activitylog" RENAME TO "activitylog_v3"')
+    db_manager.ActivityLog.create_table(safe=False)
+    db.execute_sql(
+        'INSERT INTO "activitylog" ("id", "session_id", "timestamp", "end_time", "duration", "samples", '
+        '"process_id", "title_id", "url_id", "category") '
+        'SELECT a."id", a."session_id", a."timestamp", a."end_time", a."duration", a."samples", '
+        'p."id", t."id", u."id", a."category" FROM "activitylog_v3" AS a '
+        'JOIN "process" AS p ON p."name" = a."process_name" '
+        'LEFT JOIN "title" AS t ON t."text" = a."window_title" '
+        'LEFT JOIN "url" AS u ON u."text" = a."url"')
+    db.execute_sql('DROP TABLE "activitylog_v3"')
+    _v1_report_indexes(db)
+    return False
+
+
+def _v5_sync(db):
+    """Đồng bộ nhiều máy (database/sync.py): Session nhớ nguồn gốc (source_uuid, source_id) để không
+    chép trùng, bảng SyncState lưu mốc đã chép của từng DB nguồn, mỗi DB có 1 uuid riêng"""
+    import uuid
+    from database import db_manager
+    _add_column(db, 'session', 'source_uuid', 'VARCHAR(255)')
+    _add_column(db, 'session', 'source_id', 'INTEGER')
+    db.execute_sql('CREATE UNIQUE INDEX IF NOT EXISTS "session_source_uuid_source_id" '
+                   'ON "session" ("source_uuid", "source_id")')
+    db_manager.SyncState.create_table(safe=True)
+    db.execute_sql('INSERT OR IGNORE INTO "settings" ("key", "value") VALUES (?, ?)',
+                   (db_manager.DATABASE_UUID_KEY, uuid.uuid4().hex))
+    return False
+
+
+def fts5_available(db):
+    return any(row[0] == 'ENABLE_FTS5' for row in db.execute_sql('PRAGMA compile_options'))
+
+
+def _v6_search(db):
+    """Tìm kiếm toàn văn (database/search.py): bảng FTS5 cho Title / Url, giữ đồng bộ bằng trigger.
+    Index (title_id, timestamp) / (url_id, timestamp) thay index khoá ngoại 1 cột: lấy các span mới nhất
+    của 1 chuỗi theo đúng thứ tự index, không phải sắp xếp."""
+    for table in ('title', 'url'):
+        db.execute_sql(f'DROP INDEX IF EXISTS "activitylog_{table}_id"')
+        db.execute_sql(f'CREATE INDEX IF NOT EXISTS "activitylog_{table}_id_timestamp" '
+                       f'ON "activitylog" ("{table}_id", "timestamp")')
+    if not fts5_available(db):
+        print("⚠️ SQLite không có FTS5 -> tìm kiếm dùng LIKE")
+        return False
+
+    for table in ('title', 'url'):
+        fts = f'{table}_fts'
+        db.execute_sql(f'CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5('
+                       f'text, content="{table}", content_rowid="id", tokenize="unicode61 remove_diacritics 2")')
+        db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{table}_fts_insert" AFTER INSERT ON "{table}" BEGIN '
+                       f'INSERT INTO "{fts}" (rowid, text) VALUES (new.id, new.text); END')
+        db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{table}_fts_delete" AFTER DELETE ON "{table}" BEGIN '
+                       f'INSERT INTO "{fts}" ("{fts}", rowid, text) VALUES (\'delete\', old.id, old.text); END')
+        db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{table}_fts_update" AFTER UPDATE ON "{table}" BEGIN '
+                       f'INSERT INTO "{fts}" ("{fts}", rowid, text) VALUES (\'delete\', old.id, old.text); '
+                       f'INSERT INTO "{fts}" (rowid, text) VALUES (new.id, new.text); END')
+        # Chuỗi đã có từ trước
+        db.execute_sql(f'INSERT INTO "{fts}" ("{fts}") VALUES (\'rebuild\')')
+    return False
+
+
+def _v7_session_start_time(db):
+    """Index session(start_time): các truy vấn theo ngày (get_daily_breakdown, export, analytics) chỉ lọc
+    theo start_time, index (mode, start_time) của v1 không dùng được -> trước đây phải quét cả bảng"""
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "session_start_time" ON "session" ("start_time")')
+
+
+# (phiên bản, hàm) - CHỈ được thêm vào cuối, không sửa migration đã phát hành
+MIGRATIONS = [
+    (1, _v1_report_indexes),
+    (2, _v2_daily_stats),
+    (3, _v3_activity_spans),
+    (4, _v4_string_tables),
+    (5, _v5_sync),
+    (6, _v6_search),
+    (7, _v7_session_start_time),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db):
+    return db.execute_sql('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(db):
+    """Chạy các migration còn thiếu, mỗi bước trong 1 transaction riêng"""
+    current = get_schema_version(db)
+    needs_rebuild = False
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with db.write():
+            needs_rebuild = bool(step(db)) or needs_rebuild
+            db.execute_sql(f'PRAGMA user_version = {version}')
+        print(f"🔧 Đã nâng cấp database lên phiên bản {version}")
+
+    if needs_rebuild:
+        from database import db_manager
+        db_manager.rebuild_daily_stats()
+    return get_schema_version(db)
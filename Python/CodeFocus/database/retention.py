@@ -0,0 +1,160 @@
+# Dọn dữ liệu cũ: ActivityLog quá N ngày được chuyển sang file nén theo tháng
+# (archive/activitylog-YYYY-MM.jsonl.gz cạnh file DB), xoá khỏi DB theo từng lô nhỏ,
+# rồi thu hồi dung lượng (incremental_vacuum) và cắt WAL (wal_checkpoint).
+# DailyStats giữ nguyên nên biểu đồ / tổng giờ các ngày cũ không đổi; chi tiết Top Apps
+# của ngày đã lưu trữ được đọc lại từ file khi mở báo cáo ngày đó.
+import datetime
+import gzip
+import json
+import os
+
+from peewee import JOIN
+
+from database import db_manager
+from database.db_manager import db, ActivityLog, Process, Title, Url, AppStat, ARCHIVED_BEFORE_KEY
+
+ARCHIVE_FIELDS = ('id', 'session_id', 'timestamp', 'end_time', 'duration', 'samples',
+                  'process', 'title', 'url', 'category')
+
+
+def get_archive_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(db.database)), 'archive')
+
+
+def archive_path(month, archive_dir=None):
+    """month: 'YYYY-MM'"""
+    return os.path.join(archive_dir or get_archive_dir(), f"activitylog-{month}.jsonl.gz")
+
+
+def get_archived_before():
+    return db_manager.get_setting(ARCHIVED_BEFORE_KEY, None)
+
+
+def is_archived(date_obj):
+    archived_before = get_archived_before()
+    return bool(archived_before) and db_manager.format_date_str(date_obj)[:10] < archived_before
+
+
+def _old_rows(cutoff, limit):
+    return list(ActivityLog
+                .select(ActivityLog.id, ActivityLog.session, ActivityLog.timestamp, ActivityLog.end_time,
+                        ActivityLog.duration, ActivityLog.samples, Process.name, Title.text, Url.text,
+                        ActivityLog.category)
+                .join(Process)
+                .switch(ActivityLog).join(Title, JOIN.LEFT_OUTER)
+                .switch(ActivityLog).join(Url, JOIN.LEFT_OUTER)
+                .where(ActivityLog.timestamp < cutoff)
+                .order_by(ActivityLog.timestamp, ActivityLog.id)
+                .limit(limit)
+                .tuples())
+
+
+def _append_archive(rows, archive_dir):
+    """Ghi thêm các dòng vào file của từng tháng (gzip cho phép nối nhiều member vào 1 file)"""
+    by_month = {}
+    for row in rows:
+        record = dict(zip(ARCHIVE_FIELDS, row))
+        for key in ('timestamp', 'end_time'):
+            if record[key] is not None:
+                record[key] = str(record[key])
+        by_month.setdefault(record['timestamp'][:7], []).append(record)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    for month, records in by_month.items():
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with open(archive_path(month, archive_dir), 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+                f.write(data.encode('utf-8'))
+            raw.flush()
+            # Phải nằm chắc trên đĩa trước khi xoá khỏi DB
+            os.fsync(raw.fileno())
+
+
+def archive_old_activity(retention_days, batch_size=5000, archive_dir=None, should_stop=None):
+    """Chuyển ActivityLog cũ hơn retention_days ngày ra archive rồi xoá khỏi DB.
+    Mỗi lô: ghi file (fsync) trước, xoá sau, mỗi lô 1 transaction ngắn để không chặn ghi log.
+    Nếu bị ngắt giữa chừng, lần chạy sau có thể ghi trùng vài dòng -> đọc archive sẽ lọc theo id.
+    Trả về số dòng đã chuyển."""
+    if not retention_days or retention_days <= 0:
+        return 0
+    archive_dir = archive_dir or get_archive_dir()
+    cutoff_day = datetime.date.today() - datetime.timedelta(days=retention_days)
+    cutoff, _ = db_manager.day_range(cutoff_day)
+
+    # Đánh dấu trước khi xoá -> từ đây rebuild_daily_stats() không tính lại (và làm mất)
+    # số liệu hoạt động của các ngày này nữa
+    cutoff_str = db_manager.format_date_str(cutoff_day)
+    if (get_archived_before() or '') < cutoff_str:
+        db_manager.update_setting(ARCHIVED_BEFORE_KEY, cutoff_str)
+
+    moved = 0
+    while True:
+        rows = _old_rows(cutoff, batch_size)
+        if not rows:
+            break
+        _append_archive(rows, archive_dir)
+        with db.write():
+            ActivityLog.delete().where(ActivityLog.id.in_([row[0] for row in rows])).execute()
+        moved += len(rows)
+        if should_stop and should_stop():
+            break
+    return moved
+
+
+def enable_incremental_vacuum():
+    """DB tạo trước khi bật auto_vacuum = INCREMENTAL: cần VACUUM toàn bộ 1 lần để đổi chế độ.
+    Gọi lúc khởi động, trước khi Monitor / giao diện bắt đầu ghi (VACUUM giữ khoá ghi suốt lúc chạy)."""
+    if db.execute_sql('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    print("🔧 Đang chuyển database sang auto_vacuum = INCREMENTAL (chỉ 1 lần)...")
+    db.execute_sql('PRAGMA auto_vacuum = INCREMENTAL')
+    db.execute_sql('VACUUM')
+    return True
+
+
+def compact_database():
+    """Trả trang trống về cho hệ điều hành và cắt file WAL về 0"""
+    # incremental_vacuum chỉ trả từng trang trống nên nhanh, giữ khoá ghi của app cho gọn
+    # (DB chưa chuyển chế độ thì không làm được gì, xem enable_incremental_vacuum())
+    with db.write_lock:
+        if db.execute_sql('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            db.execute_sql('PRAGMA incremental_vacuum')
+    db.checkpoint('TRUNCATE')
+
+
+def run_retention(retention_days, batch_size=5000, archive_dir=None, should_stop=None):
+    """Job dọn dẹp đầy đủ: lưu trữ + xoá + thu gọn. Trả về số dòng đã chuyển"""
+    moved = archive_old_activity(retention_days, batch_size, archive_dir, should_stop)
+    if moved and not (should_stop and should_stop()):
+        compact_database()
+    return moved
+
+
+def read_archive(date_obj, archive_dir=None):
+    """Các dòng ActivityLog đã lưu trữ của 1 ngày (dict theo ARCHIVE_FIELDS)"""
+    day = db_manager.format_date_str(date_obj)[:10]
+    path = archive_path(day[:7], archive_dir)
+    if not os.path.exists(path):
+        return []
+    records = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            # Lọc nhanh trước khi parse JSON
+            if f'"timestamp": "{day}' not in line:
+                continue
+            record = json.loads(line)
+            records[record['id']] = record
+    return sorted(records.values(), key=lambda r: (r['timestamp'], r['id']))
+
+
+def get_archived_breakdown(date_obj, limit=15, archive_dir=None):
+    """Top Apps của ngày đã lưu trữ - cùng cách gom nhóm với get_daily_breakdown()"""
+    groups = {}
+    for record in read_archive(date_obj, archive_dir):
+        entry = groups.get(record['title'])
+        if entry is None:
+            groups[record['title']] = [record['process'], record['category'], record['duration']]
+        else:
+            entry[2] += record['duration']
+    top = sorted(groups.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [AppStat(title, process, category, seconds) for title, (process, category, seconds) in top]
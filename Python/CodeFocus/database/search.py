@@ -0,0 +1,97 @@
+# Tìm kiếm toàn văn theo tiêu đề cửa sổ / URL ("lần cuối mở ticket Jira đó là khi nào?")
+# - FTS5 chỉ đánh chỉ mục bảng từ điển Title / Url (mỗi chuỗi 1 lần) chứ không phải từng span
+#   -> tìm chuỗi khớp mất vài ms dù ActivityLog có hàng triệu dòng. Trigger giữ FTS đồng bộ (migration v6).
+# - Mỗi kết quả là 1 tiêu đề / URL khớp kèm span gần nhất của nó, xếp theo lần dùng cuối (mới nhất trước).
+#   Tất cả nằm trong 1 câu SQL: span gần nhất của từng chuỗi lấy bằng 1 lần tra index (title_id, timestamp)
+#   / (url_id, timestamp) -> chi phí theo số chuỗi khớp, không phụ thuộc lịch sử dài bao nhiêu.
+# - Chuỗi không còn span nào (đã lưu trữ ra file bởi retention.py) không được tính và không hiện.
+# - Phân trang bằng con trỏ (timestamp, id, is_title) của kết quả cuối trang trước.
+# - SQLite không có FTS5 thì tìm chuỗi bằng LIKE (vẫn nhanh vì chỉ quét bảng từ điển).
+from collections import namedtuple
+
+from database.db_manager import db, ActivityLog
+
+PAGE_SIZE = 50
+# Số chuỗi khớp tốt nhất được xét (mỗi bảng), chặn các từ khoá quá chung (vd: "a")
+MAX_MATCHED_STRINGS = 5000
+
+# kind: 'title' / 'url' (chuỗi khớp); các trường còn lại là của span gần nhất có chuỗi đó
+SearchHit = namedtuple('SearchHit', ['kind', 'id', 'timestamp', 'end_time', 'duration', 'process_name',
+                                     'window_title', 'url', 'category'])
+# hits: các kết quả của trang; next_cursor: truyền vào search_activity() để lấy trang sau (None = hết);
+# matched: số tiêu đề / URL khớp còn span trong DB
+SearchPage = namedtuple('SearchPage', ['hits', 'next_cursor', 'matched'])
+
+
+def _terms(text):
+    # Bỏ các "từ" toàn dấu câu (FTS5 báo lỗi với cụm rỗng)
+    return [term for term in text.split() if any(ch.isalnum() for ch in term)]
+
+
+def fts_query(text):
+    """Chuỗi người dùng gõ -> truy vấn FTS5: mỗi từ là 1 cụm trong ngoặc kép (không lỗi cú pháp
+    với '-', ':', '/'...) tìm theo tiền tố, các từ nối bằng AND"""
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in _terms(text))
+
+
+def has_fts():
+    return 'title_fts' in db.get_tables()
+
+
+def _matched_ids(table, text, use_fts):
+    """(câu SELECT id của các chuỗi khớp trong bảng, tham số)"""
+    if use_fts:
+        return (f'SELECT rowid AS id FROM "{table}_fts" WHERE "{table}_fts" MATCH ? ORDER BY rank LIMIT ?',
+                [fts_query(text), MAX_MATCHED_STRINGS])
+    terms = _terms(text)
+    condition = " AND ".join('"text" LIKE ?' for _ in terms)
+    return (f'SELECT "id" FROM "{table}" WHERE {condition} ORDER BY "id" DESC LIMIT ?',
+            [f"%{term}%" for term in terms] + [MAX_MATCHED_STRINGS])
+
+
+def _latest_span(column, matched_sql):
+    # Span gần nhất của từng chuỗi: ORDER BY ... LIMIT 1 đi theo index (<column>, timestamp) -> 1 lần tra
+    return (f'SELECT m.id AS string_id, (SELECT a.id FROM activitylog a WHERE a."{column}" = m.id '
+            f'ORDER BY a.timestamp DESC, a.id DESC LIMIT 1) AS span_id FROM ({matched_sql}) m')
+
+
+def search_activity(text, limit=PAGE_SIZE, cursor=None):
+    """Các tiêu đề / URL khớp `text`, dùng gần nhất trước. cursor: next_cursor của trang trước (None = trang đầu)"""
+    if not _terms(text):
+        return SearchPage([], None, 0)
+    use_fts = has_fts()
+    title_sql, title_params = _matched_ids('title', text, use_fts)
+    url_sql, url_params = _matched_ids('url', text, use_fts)
+    # Cùng 1 span có thể là kết quả gần nhất của cả tiêu đề lẫn URL -> is_title phân biệt (tiêu đề trước)
+    sql = (f'WITH latest AS ('
+           f'SELECT 1 AS is_title, span_id FROM ({_latest_span("title_id", title_sql)}) '
+           f'UNION ALL SELECT 0, span_id FROM ({_latest_span("url_id", url_sql)})), '
+           f'hits AS ('
+           f'SELECT l.is_title, a.id, a.timestamp, a.end_time, a.duration, p.name AS process_name, '
+           f't.text AS window_title, u.text AS url, a.category, COUNT(*) OVER () AS matched '
+           f'FROM latest l '
+           f'JOIN activitylog a ON a.id = l.span_id '  # span_id NULL = chuỗi không còn span -> bị loại
+           f'JOIN process p ON p.id = a.process_id '
+           f'LEFT JOIN title t ON t.id = a.title_id '
+           f'LEFT JOIN url u ON u.id = a.url_id) '
+           f'SELECT * FROM hits')
+    params = title_params + url_params
+    if cursor:
+        sql += ' WHERE (timestamp, id, is_title) < (?, ?, ?)'
+        params += list(cursor)
+    sql += ' ORDER BY timestamp DESC, id DESC, is_title DESC LIMIT ?'
+    params.append(limit + 1)  # Lấy dư 1 dòng để biết còn trang sau không
+
+    rows = db.execute_sql(sql, params).fetchall()
+    # COUNT(*) OVER () tính trên cả tập kết quả trước khi lọc theo con trỏ -> trang nào cũng là tổng số
+    matched = rows[0][-1] if rows else 0
+    hits, next_cursor = [], None
+    for is_title, span_id, timestamp, end_time, duration, process, title, url, category, _ in rows[:limit]:
+        hits.append(SearchHit('title' if is_title else 'url', span_id,
+                              ActivityLog.timestamp.python_value(timestamp),
+                              ActivityLog.end_time.python_value(end_time),
+                              duration, process, title, url, category))
+        next_cursor = (timestamp, span_id, is_title)
+    if len(rows) <= limit:
+        next_cursor = None
+    return SearchPage(hits, next_cursor, matched)
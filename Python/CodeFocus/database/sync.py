@@ -0,0 +1,197 @@
+# Gộp dữ liệu từ codefocus.db của máy khác vào DB đang dùng (báo cáo chung nhiều máy).
+# - Mỗi DB có 1 uuid riêng (Settings 'database_uuid'); SyncState nhớ id Session lớn nhất đã chép
+#   của từng DB nguồn -> lần sau chỉ chép phần mới, chi phí theo lượng dữ liệu mới chứ không theo lịch sử.
+# - Chép hàng loạt bằng INSERT ... SELECT từ DB nguồn được ATTACH, trong 1 transaction:
+#   + Session: id mới bên DB đích, giữ (source_uuid, source_id) gốc -> index UNIQUE chặn chép trùng,
+#     kể cả khi dữ liệu đi vòng qua máy thứ 3 (A -> B -> C rồi A -> C).
+#   + ActivityLog: session_id ánh xạ qua Session vừa chép, process / title / url ánh xạ lại theo chuỗi.
+# - Chỉ chép phiên đã kết thúc: mốc dừng ngay trước phiên còn đang chạy đầu tiên ở máy nguồn
+#   (phiên đó còn ghi thêm log). Phiên bỏ dở quá OPEN_SESSION_TIMEOUT (app bị tắt ngang) coi như đã xong.
+# - ActivityLog mà máy nguồn đã lưu trữ ra file (retention.py) không được chép, chỉ có Session.
+#
+#   python -m database.sync D:/may-2/codefocus.db [E:/may-3/codefocus.db ...] [--db codefocus.db]
+import argparse
+import datetime
+import os
+import sys
+import uuid
+from collections import namedtuple
+
+from peewee import DatabaseError, fn
+
+from database import db_manager
+from database.db_manager import (db, ActivityLog, Process, Session, SyncState, ARCHIVED_BEFORE_KEY,
+                                 DATABASE_UUID_KEY)
+
+OPEN_SESSION_TIMEOUT = datetime.timedelta(hours=24)
+# Phiên bản schema tối thiểu của DB nguồn (có uuid + cột source_uuid / source_id)
+MIN_SOURCE_VERSION = 5
+
+SyncResult = namedtuple('SyncResult', ['source_uuid', 'sessions', 'activities', 'days'])
+
+
+def get_database_uuid():
+    """uuid của DB đang dùng (tạo mới nếu DB chưa có)"""
+    value = db_manager.get_setting(DATABASE_UUID_KEY, None)
+    if not value:
+        value = uuid.uuid4().hex
+        db_manager.update_setting(DATABASE_UUID_KEY, value)
+    return value
+
+
+def _source_uuid():
+    version = db.execute_sql('PRAGMA "src".user_version').fetchone()[0]
+    row = None
+    if version >= MIN_SOURCE_VERSION:
+        row = db.execute_sql('SELECT "value" FROM "src"."settings" WHERE "key" = ?',
+                             (DATABASE_UUID_KEY,)).fetchone()
+    if not row:
+        raise RuntimeError("DB nguồn dùng schema cũ: mở nó bằng CodeFocus bản mới 1 lần rồi đồng bộ lại")
+    return row[0]
+
+
+def _high_water_mark(last_session_id):
+    """id Session lớn nhất của DB nguồn có thể chép lần này (chỉ tính phiên đã kết thúc)"""
+    abandoned = str(datetime.datetime.now() - OPEN_SESSION_TIMEOUT)
+    first_open = db.execute_sql(
+        'SELECT MIN("id") FROM "src"."session" '
+        'WHERE "id" > ? AND "end_time" IS NULL AND "start_time" >= ?', (last_session_id, abandoned)).fetchone()[0]
+    if first_open is not None:
+        return first_open - 1
+    return db.execute_sql('SELECT MAX("id") FROM "src"."session"').fetchone()[0] or 0
+
+
+def _copy_strings(low, high):
+    """Thêm vào bảng từ điển của DB đích các chuỗi mà phần dữ liệu mới dùng tới"""
+    for table, column, key in (('process', 'name', 'process_id'), ('title', 'text', 'title_id'),
+                               ('url', 'text', 'url_id')):
+        db.execute_sql(
+            f'INSERT OR IGNORE INTO "main"."{table}" ("{column}") '
+            f'SELECT DISTINCT s."{column}" FROM "src"."activitylog" AS a '
+            f'JOIN "src"."{table}" AS s ON s."id" = a."{key}" '
+            f'WHERE a."session_id" > ? AND a."session_id" <= ?', (low, high))
+
+
+def _copy_sessions(source_uuid, local_uuid, low, high):
+    # Phiên vốn của DB đích (đi vòng qua máy khác rồi quay về) thì bỏ qua
+    return db.execute_sql(
+        'INSERT OR IGNORE INTO "main"."session" ("start_time", "end_time", "duration", "mode", "is_completed", '
+        '"source_uuid", "source_id") '
+        'SELECT "start_time", "end_time", "duration", "mode", "is_completed", '
+        'COALESCE("source_uuid", ?1), COALESCE("source_id", "id") FROM "src"."session" '
+        'WHERE "id" > ?3 AND "id" <= ?4 AND COALESCE("source_uuid", ?1) != ?2 ORDER BY "id"',
+        (source_uuid, local_uuid, low, high)).rowcount
+
+
+def _copy_activity(source_uuid, low, high, first_new_session):
+    # Chỉ nối với Session vừa thêm lần này (id >= first_new_session) -> phiên đã có sẵn không bị chép log lần 2
+    return db.execute_sql(
+        'INSERT INTO "main"."activitylog" ("session_id", "timestamp", "end_time", "duration", "samples", '
+        '"process_id", "title_id", "url_id", "category") '
+        'SELECT ms."id", a."timestamp", a."end_time", a."duration", a."samples", '
+        'p."id", t."id", u."id", a."category" FROM "src"."activitylog" AS a '
+        'JOIN "src"."session" AS s ON s."id" = a."session_id" '
+        'JOIN "main"."session" AS ms ON ms."source_uuid" = COALESCE(s."source_uuid", ?1) '
+        'AND ms."source_id" = COALESCE(s."source_id", s."id") AND ms."id" >= ?4 '
+        'JOIN "src"."process" AS sp ON sp."id" = a."process_id" '
+        'JOIN "main"."process" AS p ON p."name" = sp."name" '
+        'LEFT JOIN "src"."title" AS st ON st."id" = a."title_id" '
+        'LEFT JOIN "main"."title" AS t ON t."text" = st."text" '
+        'LEFT JOIN "src"."url" AS su ON su."id" = a."url_id" '
+        'LEFT JOIN "main"."url" AS u ON u."text" = su."text" '
+        'WHERE a."session_id" > ?2 AND a."session_id" <= ?3 ORDER BY a."id"',
+        (source_uuid, low, high, first_new_session)).rowcount
+
+
+def _update_daily_stats(first_new_session):
+    """Tính lại DailyStats cho các ngày có dữ liệu vừa chép, trả về danh sách ngày"""
+    days = [row[0] for row in db.execute_sql(
+        'SELECT date("start_time") FROM "session" WHERE "id" >= ? '
+        'UNION SELECT date("timestamp") FROM "activitylog" WHERE "session_id" >= ?',
+        (first_new_session, first_new_session))]
+    if not days:
+        return days
+    db_manager.rebuild_daily_stats(days)
+
+    # Ngày đã lưu trữ: rebuild_daily_stats() giữ nguyên số liệu hoạt động -> cộng phần mới vào
+    # (các dòng này còn trong DB tới lần dọn dẹp sau thì được đưa ra archive)
+    archived_before = db_manager.get_setting(ARCHIVED_BEFORE_KEY, None)
+    if archived_before and min(days) < archived_before:
+        day_col = fn.date(ActivityLog.timestamp)
+        old = (ActivityLog
+               .select(day_col.alias('day'), ActivityLog.category, Process.name.alias('process_name'),
+                       fn.SUM(ActivityLog.samples).alias('samples'), fn.SUM(ActivityLog.duration).alias('seconds'))
+               .join(Process)
+               .where((ActivityLog.session >= first_new_session) &
+                      (ActivityLog.timestamp < db_manager.day_range(archived_before)[0]))
+               .group_by(day_col, ActivityLog.category, ActivityLog.process)
+               .dicts())
+        db_manager._upsert_daily_stats([dict(row, sessions=0, completed_sessions=0) for row in old])
+    return days
+
+
+def sync_from(path):
+    """Chép phần dữ liệu mới của DB `path` vào DB đang dùng. Trả về SyncResult"""
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    local_uuid = get_database_uuid()
+
+    # ATTACH / DETACH không chạy được trong transaction
+    db.execute_sql('ATTACH DATABASE ? AS "src"', (path,))
+    try:
+        source_uuid = _source_uuid()
+        if source_uuid == local_uuid:
+            raise RuntimeError("DB nguồn trùng uuid với DB đích (cùng 1 file, hoặc file được sao chép ra)")
+
+        with db.write():
+            state = SyncState.get_or_none(SyncState.source_uuid == source_uuid)
+            low = state.last_session_id if state else 0
+            high = _high_water_mark(low)
+            sessions = activities = 0
+            days = []
+            if high > low:
+                first_new_session = (Session.select(fn.MAX(Session.id)).scalar() or 0) + 1
+                _copy_strings(low, high)
+                sessions = _copy_sessions(source_uuid, local_uuid, low, high)
+                if sessions:
+                    activities = _copy_activity(source_uuid, low, high, first_new_session)
+                    days = _update_daily_stats(first_new_session)
+            (SyncState
+             .insert(source_uuid=source_uuid, source_path=path, last_session_id=max(low, high),
+                     synced_at=datetime.datetime.now())
+             .on_conflict(conflict_target=[SyncState.source_uuid],
+                          preserve=[SyncState.source_path, SyncState.last_session_id, SyncState.synced_at])
+             .execute())
+    finally:
+        db.execute_sql('DETACH DATABASE "src"')
+    return SyncResult(source_uuid, sessions, activities, days)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gộp dữ liệu CodeFocus từ DB của máy khác")
+    parser.add_argument('sources', nargs='+', help="File codefocus.db nguồn")
+    parser.add_argument('--db', default=None, help="File DB đích (mặc định như app)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db_manager.configure_database(args.db)
+    db.connect(reuse_if_open=True)
+    db_manager.create_schema()
+
+    status = 0
+    for source in args.sources:
+        try:
+            result = sync_from(source)
+        except (OSError, RuntimeError, DatabaseError) as e:
+            print(f"❌ {source}: {e}")
+            status = 1
+            continue
+        print(f"✅ {source}: +{result.sessions:,} phiên, +{result.activities:,} dòng hoạt động, "
+              f"{len(result.days)} ngày được tính lại")
+    db.close()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
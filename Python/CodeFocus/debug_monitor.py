@@ -1,11 +1,13 @@
+import argparse
 import time
-import psutil
-import win32gui
-import win32process
-import uiautomation as auto
 
 
 def test_logic():
+    import psutil
+    import win32gui
+    import win32process
+    import uiautomation as auto
+
     print("--- BẮT ĐẦU TEST MONITOR ---")
     while True:
         try:
@@ -51,5 +53,55 @@ def test_logic():
         time.sleep(1.5)
 
 
+def profile_logic(source_name, samples, report_every, interval_ms, replay_path=None):
+    """Chạy đúng vòng lấy mẫu của ActivityMonitor và in histogram độ trễ từng bước"""
+    from core.monitor import ActivityMonitor
+    from core.window_source import Win32WindowSource, SyntheticWindowSource, ReplayWindowSource
+
+    if source_name == "synthetic":
+        source = SyntheticWindowSource(seed=0)
+    elif source_name == "replay":
+        source = ReplayWindowSource.from_jsonl(replay_path)
+    else:
+        source = Win32WindowSource()
+
+    # Không start thread: gọi sample_once() trực tiếp, URL được đọc đồng bộ nên đo được trọn vẹn
+    monitor = ActivityMonitor(source=source, interval_ms=interval_ms, adaptive=False)
+    print(f"--- PROFILE MONITOR ({source_name}) ---")
+
+    count = 0
+    last_report = time.perf_counter()
+    try:
+        while samples <= 0 or count < samples:
+            try:
+                monitor.sample_once()
+            except Exception as e:
+                print(f"🔥 LỖI: {e}")
+            count += 1
+
+            if time.perf_counter() - last_report >= report_every:
+                print(monitor.profiler.format_table())
+                print("-" * 62)
+                last_report = time.perf_counter()
+            if interval_ms:
+                time.sleep(interval_ms / 1000.0)
+    except KeyboardInterrupt:
+        pass
+
+    print(monitor.profiler.format_table())
+
+
 if __name__ == "__main__":
-    test_logic()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Debug / profile ActivityMonitor")
+    parser.add_argument("--profile", action="store_true", help="In p50/p95/p99/max của từng bước trong nhịp lấy mẫu")
+    parser.add_argument("--source", choices=["win32", "synthetic", "replay"], default="win32")
+    parser.add_argument("--replay", help="File JSONL cho --source replay")
+    parser.add_argument("--samples", type=int, default=0, help="Số mẫu cần lấy (0 = chạy tới khi Ctrl+C)")
+    parser.add_argument("--interval", type=int, default=1000, help="Khoảng nghỉ giữa 2 mẫu (ms)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Chu kỳ in bảng thống kê (giây)")
+    args = parser.parse_args()
+
+    if args.profile:
+        profile_logic(args.source, args.samples, args.report_every, args.interval, args.replay)
+    else:
+        test_logic()
\ No newline at end of file
@@ -3,12 +3,15 @@ from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon
 from ui.main_window import MainWindow
 from database.db_manager import initialize_db, seed_sample_data
+from database.retention import enable_incremental_vacuum
 
 
 def main():
     # 1. Khởi tạo Database
     # Kiểm tra và tạo bảng nếu chưa có
     initialize_db()
+    # DB cũ: đổi sang auto_vacuum = INCREMENTAL 1 lần, lúc chưa có ai ghi
+    enable_incremental_vacuum()
     seed_sample_data()
     # (Tùy chọn) Thêm dữ liệu mẫu nếu DB trống để test
 
@@ -1,15 +1,21 @@
 import os
 import sys
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QLabel, QPushButton,
-                               QHBoxLayout, QFrame, QTabWidget, QSystemTrayIcon, QMenu)
+                               QHBoxLayout, QFrame, QTabWidget, QSystemTrayIcon, QMenu, QMessageBox)
 from PySide6.QtCore import QTimer, Qt, QUrl
-from PySide6.QtGui import QIcon, QAction
+from PySide6.QtGui import QIcon, QAction, QShortcut, QKeySequence
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 
 # Import các module tự định nghĩa
-from database.db_manager import (create_session, end_session, log_activity,
-                                 get_blacklist, get_setting)
+from database.db_manager import (create_session, end_session, log_activity, flush_activity_log,
+                                 stop_activity_log, set_log_storage_mode)
+from core.classifier import BlacklistClassifier
+from core.settings_store import get_settings_store
 from core.monitor import ActivityMonitor
+from core.profiler import format_stats
+from core.reclassifier import ReclassifyWorker
+from core.maintenance import RetentionWorker
+from core.today_stats import TodayStats
 from ui.overlay import PenaltyOverlay
 from ui.report_tab import ReportTab
 from ui.settings_tab import SettingsTab
@@ -35,6 +41,17 @@ class MainWindow(QMainWindow):
         self.last_process = ""
         self.last_title = ""
         self.last_url = ""
+        self.current_started_at = 0.0
+        self.current_is_bad = False
+        self.reclassify_worker = None
+        self.retention_worker = None
+        # Số ngày giữ đổi khi đang lưu trữ -> chạy lại theo giá trị mới khi xong
+        self.retention_rerun = False
+
+        # Cấu hình nạp 1 lần; thay đổi sau đó báo qua signal
+        self.settings = get_settings_store()
+        self.settings.changed.connect(self.on_setting_changed)
+        self.settings.blacklist_changed.connect(self.on_blacklist_changed)
 
         # --- 2. UI & COMPONENTS ---
         self.setup_ui()
@@ -42,6 +59,11 @@ class MainWindow(QMainWindow):
         self.setup_system_tray()
         self.apply_styles()
 
+        # Số liệu hôm nay giữ trong bộ nhớ (đọc DB 1 lần, sau đó cộng dồn theo log)
+        self.today_stats = TodayStats(self)
+        self.today_stats.changed.connect(self.update_today_label)
+        self.update_today_label()
+
         # Màn hình phạt / nghỉ ngơi
         self.overlay = PenaltyOverlay()
         self.overlay.unlock_signal.connect(self.unlock_from_penalty)
@@ -54,12 +76,21 @@ class MainWindow(QMainWindow):
         self.timer.timeout.connect(self.update_timer)
 
         self.monitor_thread = ActivityMonitor()
-        self.monitor_thread.activity_signal.connect(self.update_activity_ui)
+        self.monitor_thread.focus_changed.connect(self.update_activity_ui)
+        self.monitor_thread.heartbeat.connect(self.on_activity_heartbeat)
+        self.monitor_thread.url_resolved.connect(self.on_url_resolved)
+        self.monitor_thread.set_sampling_limits(self.sample_min_ms, self.sample_max_ms)
         self.monitor_thread.start()
 
         # --- 5. AUDIO SETUP (MỚI THÊM) ---
         self.setup_audio()
 
+        # Dọn dữ liệu cũ ở thread nền, đợi app khởi động xong cho đỡ tranh ổ đĩa
+        QTimer.singleShot(10000, self.start_retention)
+
+        # Ctrl+Shift+P (hoặc nút trong tab Cài đặt): xem độ trễ từng bước của Monitor
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, activated=self.show_monitor_profile)
+
     def setup_audio(self):
         """Cấu hình bộ phát âm thanh (Hỗ trợ chạy file .exe)"""
         self.sfx_player = QMediaPlayer()
@@ -95,6 +126,8 @@ class MainWindow(QMainWindow):
     # =========================================================================
     def update_timer(self):
         """Hàm chạy mỗi giây"""
+        self.tick_activity()
+
         self.current_time -= 1
         time_str = self.format_time(self.current_time)
 
@@ -136,6 +169,7 @@ class MainWindow(QMainWindow):
         session = create_session(mode="Pomodoro")
         self.current_session_id = session.id
         self.timer.start(1000)
+        self.monitor_thread.set_session_active(True)
 
         self.hide()
         self.float_widget.show()
@@ -144,8 +178,12 @@ class MainWindow(QMainWindow):
     def finish_work_cycle(self):
         """Kết thúc giờ làm -> Chuyển sang Nghỉ"""
         self.flush_remaining_log()
+        flush_activity_log()
         if self.current_session_id:
             end_session(self.current_session_id, self.work_duration, is_completed=True)
+        # Giờ nghỉ không cần cưỡng chế -> cho Monitor quét chậm lại
+        self.monitor_thread.set_session_active(False)
+        self.monitor_thread.set_violation_active(False)
 
         self.on_break = True
         self.current_time = self.break_duration
@@ -176,7 +214,7 @@ class MainWindow(QMainWindow):
         self.lbl_status.setStyleSheet("color: #94a3b8;")
         self.lbl_timer.setStyleSheet("color: #10b981;")
 
-        self.refresh_settings()
+        self.apply_timer_settings()
         self.tab_report.load_data()
         self.show_main_from_float()
         self.tray_icon.showMessage("CodeFocus", "Đã hết giờ nghỉ! Quay lại làm việc nào.", QSystemTrayIcon.Information)
@@ -185,6 +223,7 @@ class MainWindow(QMainWindow):
         """Người dùng bấm nút Dừng thủ công"""
         self.timer.stop()
         self.flush_remaining_log()
+        flush_activity_log()
 
         duration = self.work_duration - self.current_time
         if self.current_session_id:
@@ -192,10 +231,12 @@ class MainWindow(QMainWindow):
 
         self.is_running = False
         self.on_break = False
+        self.monitor_thread.set_session_active(False)
+        self.monitor_thread.set_violation_active(False)
         self.overlay.hide()
         self.float_widget.update_status("idle")
 
-        self.refresh_settings()
+        self.apply_timer_settings()
         self.btn_start.setEnabled(True)
         self.btn_stop.setEnabled(False)
         self.lbl_status.setText("ĐÃ DỪNG PHIÊN")
@@ -207,58 +248,79 @@ class MainWindow(QMainWindow):
     def flush_remaining_log(self):
         if self.is_running and self.log_counter > 0 and self.current_session_id:
             try:
-                cat = "Distraction" if self.check_is_forbidden(self.last_process, self.last_title,
-                                                               self.last_url) else "Work"
-                log_activity(self.current_session_id, self.last_process, self.last_title, self.last_url, category=cat)
+                cat = "Distraction" if self.current_is_bad else "Work"
+                log_activity(self.current_session_id, self.last_process, self.last_title, self.last_url, category=cat,
+                             duration=self.log_counter)
             except Exception:
                 pass
             self.log_counter = 0
 
-    def update_activity_ui(self, process, title, url):
+    def update_activity_ui(self, process, title, url, started_at=0.0, prev_dwell=0.0):
+        """Chỉ chạy khi cửa sổ foreground thay đổi (không còn chạy mỗi giây)"""
         # 1. Cập nhật thông tin tiến trình hiện tại vào biến tạm
         self.last_process = process
         self.last_title = title
         self.last_url = url
+        self.current_started_at = started_at
 
         # 2. Hiển thị lên giao diện Dashboard (cắt ngắn nếu tên quá dài)
         display_name = title if (title and title.strip()) else process
         short_dashboard_title = (display_name[:40] + '..') if len(display_name) > 40 else display_name
         self.lbl_activity.setText(f"[{process}] {short_dashboard_title}")
-
-        # 3. LOGIC KIỂM TRA VI PHẠM (Chỉ chạy khi đang làm việc + chưa bị khóa)
-        if self.is_running and not self.on_break and not self.is_locked:
-            is_bad = self.check_is_forbidden(process, title, url)
-
-            if is_bad:
-                # Nếu vi phạm -> Tăng biến đếm
-                self.violation_counter += 1
-                remaining = self.violation_limit - self.violation_counter
-
-                if remaining > 0:
-                    # Giai đoạn cảnh báo
-                    target_name = title if (title and title.strip()) else process
-                    if len(target_name) > 25: target_name = target_name[:22] + "..."
-
-                    # Cập nhật Label chính
-                    self.lbl_status.setText(f"⚠️ CẢNH BÁO: Tắt {target_name} ({remaining}s)")
-                    self.lbl_status.setStyleSheet("color: #f59e0b; font-weight: bold;")
-
-                    # Cập nhật Bong bóng (Floating Widget)
-                    msg = f"⚠️ Tắt {target_name} ngay! ({remaining}s)"
-                    self.float_widget.update_status("work", custom_text=msg)
-                else:
-                    # Hết thời gian cảnh báo -> PHẠT
-                    self.trigger_penalty()
+        self.lbl_activity.setToolTip("")
+
+        # 3. Phân loại 1 lần cho cả interval, dùng lại ở tick_activity()
+        self.current_is_bad = self.check_is_forbidden(process, title, url)
+
+        # Nếu đã quay lại cửa sổ hợp lệ -> Reset cảnh báo nếu trước đó lỡ vi phạm
+        if not self.current_is_bad and self.violation_counter > 0:
+            self.violation_counter = 0
+            self.monitor_thread.set_violation_active(False)
+            if self.is_running and not self.on_break and not self.is_locked:
+                self.lbl_status.setText("DEEP WORK MODE")
+                self.lbl_status.setStyleSheet("color: #10b981;")
+                self.float_widget.update_status("work", custom_text="Đã quay lại tập trung 👍")
+
+    def on_url_resolved(self, process, title, url):
+        """URL của tab hiện tại đọc xong sau (bất đồng bộ) -> phân loại lại interval"""
+        if process != self.last_process or title != self.last_title:
+            return
+        self.last_url = url
+        self.current_is_bad = self.check_is_forbidden(process, title, url)
+
+    def on_activity_heartbeat(self, started_at, dwell):
+        """Nhịp báo sống của Monitor: chỉ cập nhật tooltip thời gian ở cửa sổ hiện tại"""
+        self.lbl_activity.setToolTip(f"Đã ở cửa sổ này {int(dwell) // 60} phút {int(dwell) % 60} giây")
+
+    def tick_activity(self):
+        """Gọi mỗi giây từ update_timer: đếm vi phạm & ghi log dựa trên interval hiện tại"""
+        # 1. LOGIC KIỂM TRA VI PHẠM (Chỉ chạy khi đang làm việc + chưa bị khóa)
+        if self.is_running and not self.on_break and not self.is_locked and self.current_is_bad:
+            # Nếu vi phạm -> Tăng biến đếm
+            self.violation_counter += 1
+            # Đang đếm ngược -> Monitor quét dày hơn để nhận ra ngay khi người dùng tắt app
+            self.monitor_thread.set_violation_active(True)
+            remaining = self.violation_limit - self.violation_counter
+
+            if remaining > 0:
+                # Giai đoạn cảnh báo
+                title, process = self.last_title, self.last_process
+                target_name = title if (title and title.strip()) else process
+                if len(target_name) > 25: target_name = target_name[:22] + "..."
+
+                # Cập nhật Label chính
+                self.lbl_status.setText(f"⚠️ CẢNH BÁO: Tắt {target_name} ({remaining}s)")
+                self.lbl_status.setStyleSheet("color: #f59e0b; font-weight: bold;")
+
+                # Cập nhật Bong bóng (Floating Widget)
+                msg = f"⚠️ Tắt {target_name} ngay! ({remaining}s)"
+                self.float_widget.update_status("work", custom_text=msg)
             else:
-                # Nếu không vi phạm -> Reset cảnh báo nếu trước đó lỡ vi phạm
-                if self.violation_counter > 0:
-                    self.violation_counter = 0
-                    self.lbl_status.setText("DEEP WORK MODE")
-                    self.lbl_status.setStyleSheet("color: #10b981;")
-                    self.float_widget.update_status("work", custom_text="Đã quay lại tập trung 👍")
-
-        # 4. LOGIC GHI LOG (Lưu vào Database)
-        if self.is_running and not self.on_break:
+                # Hết thời gian cảnh báo -> PHẠT
+                self.trigger_penalty()
+
+        # 2. LOGIC GHI LOG (Lưu vào Database)
+        if self.is_running and not self.on_break and self.last_process:
             self.log_counter += 1
 
             # --- ĐOẠN ĐÃ SỬA: Lấy thời gian từ Cài đặt ---
@@ -266,29 +328,40 @@ class MainWindow(QMainWindow):
             limit = getattr(self, 'log_interval_limit', 30)
 
             if self.log_counter >= limit:
-                cat = "Distraction" if self.check_is_forbidden(process, title, url) else "Work"
-                log_activity(self.current_session_id, process, title, url, category=cat)
+                cat = "Distraction" if self.current_is_bad else "Work"
+                log_activity(self.current_session_id, self.last_process, self.last_title, self.last_url,
+                             category=cat, duration=self.log_counter)
                 self.log_counter = 0  # Reset đếm
 
+    def update_today_label(self):
+        """Tóm tắt hôm nay trên Dashboard (đọc từ bộ nhớ, không truy vấn DB)"""
+        stats = self.today_stats.snapshot()
+        focus_min = stats['focus_seconds'] // 60
+        text = (f"Hôm nay: {focus_min // 60} giờ {focus_min % 60} phút tập trung • "
+                f"{stats['completed_sessions']}/{stats['sessions']} phiên hoàn thành • "
+                f"xao nhãng {stats['distraction'] // 60} phút")
+        if stats['top_apps']:
+            text += "\nDùng nhiều nhất: " + ", ".join(
+                f"{name} ({seconds // 60}p)" for name, seconds in stats['top_apps'])
+        self.lbl_today.setText(text)
+
     def check_is_forbidden(self, process, title, url):
-        p_check = process.lower() if process else ""
-        t_check = title.lower() if title else ""
-        u_check = url.lower() if url else ""
-        if p_check in [a.lower() for a in self.blacklist_apps]: return True
-        for kw in self.blacklist_urls:
-            kw = kw.lower().strip()
-            if u_check and (kw in u_check): return True
-            if kw in t_check: return True
-            clean_kw = kw.replace("https://", "").replace("http://", "").replace("www.", "")
-            domain_only = clean_kw.split('/')[0]
-            if domain_only and (domain_only in t_check): return True
-        return False
+        # Blacklist đã được biên dịch sẵn trong refresh_settings()
+        return self.classifier.is_forbidden(process, title, url)
+
+    def show_monitor_profile(self):
+        """Hiện bảng p50/p95/p99/max (ms) của từng bước trong nhịp lấy mẫu"""
+        box = QMessageBox(self)
+        box.setWindowTitle("Monitor Profile")
+        box.setText(f"<pre>{format_stats(self.monitor_thread.get_stage_stats())}</pre>")
+        box.exec()
 
     def trigger_penalty(self):
         self.is_locked = True
         self.overlay.set_mode("penalty")
         self.overlay.showFullScreen()
         self.violation_counter = 0
+        self.monitor_thread.set_violation_active(False)
         self.float_widget.hide()
 
     def unlock_from_penalty(self):
@@ -347,6 +420,11 @@ class MainWindow(QMainWindow):
         self.lbl_activity.setAlignment(Qt.AlignCenter)
         activity_layout.addWidget(self.lbl_activity)
         container_layout.addWidget(activity_frame)
+        self.lbl_today = QLabel("")
+        self.lbl_today.setObjectName("TodayLabel")
+        self.lbl_today.setAlignment(Qt.AlignCenter)
+        self.lbl_today.setWordWrap(True)
+        container_layout.addWidget(self.lbl_today)
         btn_layout = QHBoxLayout()
         self.btn_start = QPushButton("▶ BẮT ĐẦU PHIÊN")
         self.btn_start.setObjectName("StartButton")
@@ -390,17 +468,87 @@ class MainWindow(QMainWindow):
         if reason == QSystemTrayIcon.DoubleClick: self.show_main_from_float()
 
     def refresh_settings(self):
-        self.blacklist_apps, self.blacklist_urls = get_blacklist()
-        if not self.is_running:
-            self.work_duration = int(get_setting('pomodoro_minutes', 25)) * 60
-            self.break_duration = int(get_setting('break_minutes', 5)) * 60
-            self.violation_limit = int(get_setting('grace_period_seconds', 60))
+        """Áp dụng toàn bộ cấu hình (lúc khởi động). Về sau chỉ phần nào đổi mới được áp dụng lại"""
+        self.apply_blacklist()
+        # Cách lưu ActivityLog: 'span' (gộp mẫu liên tiếp) hoặc 'sample' (mỗi mẫu 1 dòng)
+        set_log_storage_mode(self.settings.get_str('log_storage_mode'))
+        self.apply_sampling_limits()
+        self.apply_timer_settings()
+
+    def apply_blacklist(self):
+        self.blacklist_apps, self.blacklist_urls = self.settings.get_blacklist()
+        self.classifier = BlacklistClassifier(self.blacklist_apps, self.blacklist_urls)
+        # Blacklist có thể vừa đổi -> phân loại lại cửa sổ hiện tại
+        self.current_is_bad = self.check_is_forbidden(self.last_process, self.last_title, self.last_url)
+
+    def apply_sampling_limits(self):
+        # Giới hạn nhịp quét của Monitor (đổi được cả khi đang chạy phiên)
+        self.sample_min_ms = self.settings.get_int('monitor_min_interval_ms')
+        self.sample_max_ms = self.settings.get_int('monitor_max_interval_seconds') * 1000
+        if hasattr(self, 'monitor_thread'):
+            self.monitor_thread.set_sampling_limits(self.sample_min_ms, self.sample_max_ms)
+
+    def apply_timer_settings(self):
+        # Đang chạy phiên -> giữ nguyên, áp dụng khi phiên kết thúc
+        if self.is_running:
+            return
+        self.work_duration = self.settings.get_int('pomodoro_minutes') * 60
+        self.break_duration = self.settings.get_int('break_minutes') * 60
+        self.violation_limit = self.settings.get_int('grace_period_seconds')
+
+        self.log_interval_limit = self.settings.get_int('log_interval_seconds')
 
-            self.log_interval_limit = int(get_setting('log_interval_seconds', 30))
-
-            self.current_time = self.work_duration
-            if hasattr(self, 'lbl_timer'):
-                self.lbl_timer.setText(self.format_time(self.work_duration))
+        self.current_time = self.work_duration
+        if hasattr(self, 'lbl_timer'):
+            self.lbl_timer.setText(self.format_time(self.work_duration))
+
+    def on_setting_changed(self, key, value):
+        if key in ('monitor_min_interval_ms', 'monitor_max_interval_seconds'):
+            self.apply_sampling_limits()
+        elif key == 'log_storage_mode':
+            set_log_storage_mode(value)
+        elif key in ('pomodoro_minutes', 'break_minutes', 'grace_period_seconds', 'log_interval_seconds'):
+            self.apply_timer_settings()
+        elif key == 'retention_days':
+            # Áp dụng ngay thay vì đợi lần khởi động sau
+            self.start_retention()
+
+    def on_blacklist_changed(self):
+        """Blacklist vừa thêm/xoá: biên dịch lại & phân loại lại lịch sử ở thread nền"""
+        self.apply_blacklist()
+        self.start_reclassify()
+
+    def start_reclassify(self):
+        # Đang chạy dở theo Blacklist cũ -> huỷ, chạy lại từ đầu theo Blacklist mới
+        if self.reclassify_worker and self.reclassify_worker.isRunning():
+            self.reclassify_worker.cancel()
+            self.reclassify_worker.wait()
+
+        self.reclassify_worker = ReclassifyWorker(self.classifier)
+        self.reclassify_worker.progress.connect(self.tab_settings.show_reclassify_progress)
+        self.reclassify_worker.done.connect(self.on_reclassify_done)
+        self.reclassify_worker.start()
+
+    def start_retention(self):
+        if self.retention_worker and self.retention_worker.isRunning():
+            self.retention_rerun = True
+            return
+        self.retention_worker = RetentionWorker(self.settings.get_int('retention_days'))
+        self.retention_worker.done.connect(self.on_retention_done)
+        self.retention_worker.start()
+
+    def on_retention_done(self, moved):
+        if moved > 0:
+            print(f"🗄️ Đã lưu trữ {moved} dòng ActivityLog cũ")
+        if self.retention_rerun:
+            self.retention_rerun = False
+            self.start_retention()
+
+    def on_reclassify_done(self, changed):
+        self.tab_settings.finish_reclassify(changed)
+        # DailyStats vừa được tính lại -> nạp lại số liệu hôm nay
+        self.today_stats.reload()
+        self.tab_report.load_data()
 
     def on_tab_change(self, index):
         if index == 1: self.tab_report.load_data()
@@ -422,8 +570,21 @@ class MainWindow(QMainWindow):
                                    2000)
 
     def quit_app(self):
+        # Các thread nền còn ghi DB (phân loại lại, lưu trữ) -> dừng sau khúc hiện tại (khúc đó vẫn được commit)
+        # trước khi stop_activity_log() checkpoint TRUNCATE và đóng DB
+        if self.reclassify_worker and self.reclassify_worker.isRunning():
+            self.reclassify_worker.cancel()
+            self.reclassify_worker.wait()
+        if self.retention_worker and self.retention_worker.isRunning():
+            self.retention_worker.cancel()
+            self.retention_worker.wait()
+        # Thread chỉ đọc (truy vấn báo cáo, xuất dữ liệu) cũng dừng trước khi đóng DB
+        self.tab_report.query_service.shutdown()
+        self.tab_report.stop_export()
         self.flush_remaining_log()
-        if self.monitor_thread.isRunning(): self.monitor_thread.terminate()
+        stop_activity_log()
+        self.today_stats.close()
+        if self.monitor_thread.isRunning(): self.monitor_thread.stop()
         self.float_widget.close()
         self.overlay.close()
         self.close()
@@ -437,6 +598,7 @@ class MainWindow(QMainWindow):
             QLabel#TimerLabel { color: #e2e8f0; font-size: 72px; font-weight: bold; font-family: 'Consolas'; }
             QFrame#ActivityFrame { background-color: #0f172a; border-radius: 10px; padding: 10px; border: 1px solid #334155;}
             QLabel { color: #94a3b8; font-size: 14px; }
+            QLabel#TodayLabel { color: #cbd5e1; font-size: 13px; margin-top: 10px; }
             QPushButton { height: 50px; border-radius: 10px; font-weight: bold; font-size: 14px;}
             QPushButton#StartButton { background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 #10b981, stop:1 #059669); color: white; border: none;}
             QPushButton#StartButton:hover { background: #047857; }
@@ -1,16 +1,63 @@
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.dates as mdates
+from matplotlib.colors import LinearSegmentedColormap
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                                QComboBox, QFrame, QSplitter, QTableWidget,
-                               QTableWidgetItem, QHeaderView, QDateEdit)
-from PySide6.QtCore import Qt, QDate
+                               QTableWidgetItem, QHeaderView, QDateEdit, QPushButton,
+                               QProgressBar, QFileDialog, QMessageBox, QLineEdit)
+from PySide6.QtCore import Qt, QDate, QTimer
 from PySide6.QtGui import QColor
 import datetime
+import os
 
 # Import DB Functions
-from database.db_manager import (get_historical_data, get_daily_breakdown,
-                                 get_daily_health_report, get_total_work_time_str)
+from database.db_manager import (get_history_series, get_daily_breakdown,
+                                 get_daily_health_report, get_total_work_time_str, flush_activity_log)
+from database.retention import is_archived, get_archived_breakdown
+from database.exporter import available_formats
+from database.search import search_activity, PAGE_SIZE
+from core.query_service import ReportQueryService
+from core.analytics import focus_analytics, WEEKDAY_LABELS
+from core.export_worker import ExportWorker
+
+# Bộ lọc của hộp thoại lưu file cho từng định dạng xuất
+EXPORT_FILTERS = {'csv': "CSV (*.csv)", 'jsonl': "JSON Lines (*.jsonl)", 'parquet': "Parquet (*.parquet)"}
+# Thang màu heatmap: ô trống trùng nền tối, càng tập trung càng xanh sáng
+HEATMAP_CMAP = LinearSegmentedColormap.from_list('focus', ['#0f172a', '#1d4ed8', '#60a5fa'])
+# Các khoảng của biểu đồ: (nhãn, số ngày, None = toàn bộ lịch sử)
+CHART_RANGES = [("7 Ngày qua", 7), ("30 Ngày qua", 30), ("90 Ngày qua", 90), ("1 Năm qua", 365), ("Toàn bộ", None)]
+# Heatmap đọc từng dòng ActivityLog -> khoảng dài hơn thì chỉ tính chừng này ngày gần nhất
+ANALYTICS_MAX_DAYS = 365
+# Mức gộp của biểu đồ -> (định dạng trục ngày, nhãn trục giá trị)
+BUCKET_LABELS = {'day': ('%d/%m', "Phút"), 'week': ('%d/%m/%y', "Phút/ngày (TB tuần)"),
+                 'month': ('%m/%Y', "Phút/ngày (TB tháng)"), 'year': ('%Y', "Phút/ngày (TB năm)")}
+
+
+def flushed(fn):
+    """Bọc fn để chạy sau khi log đang chờ trong bộ đệm của ActivityLogWriter được ghi xuống DB
+    (chạy ở thread nền) -> báo cáo / tìm kiếm thấy cả span đang mở"""
+    def run(*args):
+        flush_activity_log()
+        return fn(*args)
+    return run
+
+
+def fetch_daily_detail(py_date):
+    """Chạy ở thread nền: gom mọi truy vấn của 1 ngày, trả về dữ liệu thuần (đã đọc hết cursor)"""
+    time_str, total_min = get_total_work_time_str(py_date)
+    health_report = get_daily_health_report(py_date)
+    sessions, app_stats = get_daily_breakdown(py_date)
+    if not app_stats and is_archived(py_date):
+        # Ngày cũ đã chuyển ra archive -> đọc Top Apps từ file nén của tháng đó
+        app_stats = get_archived_breakdown(py_date)
+    return {
+        'time_str': time_str,
+        'total_min': total_min,
+        'health': health_report,
+        'sessions': list(sessions),
+        'app_stats': list(app_stats),
+    }
 
 
 class ReportTab(QWidget):
@@ -19,6 +66,27 @@ class ReportTab(QWidget):
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(20, 20, 20, 20)
         self.current_dates_map = []
+        # Ngày đầu của khoảng biểu đồ đang hiển thị (dùng cho "Toàn bộ")
+        self.chart_start = None
+        self.export_worker = None
+
+        # Truy vấn chạy nền, kết quả trả về qua signal
+        self.query_service = ReportQueryService(parent=self)
+        # Gộp các lần đổi ngày liên tiếp (kéo DatePicker) thành 1 truy vấn
+        self.detail_timer = QTimer(self)
+        self.detail_timer.setSingleShot(True)
+        self.detail_timer.setInterval(150)
+        self.detail_timer.timeout.connect(self.request_daily_detail)
+        # Tìm kiếm: chờ người dùng ngừng gõ rồi mới truy vấn
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.start_search)
+        self.search_text = ""
+        # Con trỏ của từng trang kết quả đã xem (trang đầu = None) -> quay lại trang trước không cần tính lại
+        self.search_cursors = [None]
+        self.search_page = 0
+
         self.init_ui()
 
     def init_ui(self):
@@ -41,11 +109,43 @@ class ReportTab(QWidget):
 
         # Combo Filter Chart
         self.combo_chart = QComboBox()
-        self.combo_chart.addItems(["7 Ngày qua", "30 Ngày qua"])
+        self.combo_chart.addItems([label for label, _ in CHART_RANGES])
         self.combo_chart.currentIndexChanged.connect(self.load_chart_data)
         header.addWidget(self.combo_chart)
+
+        # Xuất dữ liệu của khoảng đang xem (chạy nền)
+        self.btn_export = QPushButton("⬇ Xuất dữ liệu")
+        self.btn_export.setCursor(Qt.PointingHandCursor)
+        self.btn_export.setToolTip("Xuất Session + ActivityLog của khoảng ngày đang chọn trên biểu đồ")
+        self.btn_export.clicked.connect(self.export_data)
+        header.addWidget(self.btn_export)
+        self.export_bar = QProgressBar()
+        self.export_bar.setFixedWidth(120)
+        self.export_bar.hide()
+        header.addWidget(self.export_bar)
         self.layout.addLayout(header)
 
+        # Tìm kiếm theo tiêu đề cửa sổ / URL trong toàn bộ lịch sử
+        search_row = QHBoxLayout()
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("🔍 Tìm theo tiêu đề cửa sổ / URL (vd: jira PROJ-123)")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        search_row.addWidget(self.search_box, 1)
+        self.lbl_search = QLabel("")
+        self.lbl_search.setStyleSheet("color: #94a3b8;")
+        search_row.addWidget(self.lbl_search)
+        self.btn_search_prev = QPushButton("◀")
+        self.btn_search_prev.clicked.connect(lambda: self.request_search_page(self.search_page - 1))
+        self.btn_search_next = QPushButton("▶")
+        self.btn_search_next.clicked.connect(lambda: self.request_search_page(self.search_page + 1))
+        for btn in (self.btn_search_prev, self.btn_search_next):
+            btn.setCursor(Qt.PointingHandCursor)
+            btn.setFixedWidth(32)
+            btn.setEnabled(False)
+            search_row.addWidget(btn)
+        self.layout.addLayout(search_row)
+
         # SPLITTER
         self.splitter = QSplitter(Qt.Vertical)
 
@@ -58,9 +158,40 @@ class ReportTab(QWidget):
         self.canvas = FigureCanvas(self.figure)
         # Bắt sự kiện click vào biểu đồ
         self.canvas.mpl_connect('button_press_event', self.on_chart_click)
-        chart_vbox.addWidget(self.canvas)
+
+        # Heatmap giờ tập trung (thứ x giờ) của cùng khoảng ngày, bên phải biểu đồ đường
+        self.heat_figure, self.heat_ax = plt.subplots(figsize=(4, 3), dpi=100)
+        self.heat_canvas = FigureCanvas(self.heat_figure)
+        self.lbl_analytics = QLabel("")
+        self.lbl_analytics.setStyleSheet("color: #94a3b8; font-size: 11px;")
+        self.lbl_analytics.setAlignment(Qt.AlignCenter)
+
+        charts_row = QHBoxLayout()
+        charts_row.addWidget(self.canvas, 3)
+        heat_col = QVBoxLayout()
+        heat_col.addWidget(self.heat_canvas)
+        heat_col.addWidget(self.lbl_analytics)
+        charts_row.addLayout(heat_col, 2)
+        chart_vbox.addLayout(charts_row)
         self.splitter.addWidget(self.chart_frame)
 
+        # === KẾT QUẢ TÌM KIẾM (chỉ hiện khi đang tìm) ===
+        self.table_search = QTableWidget(0, 4)
+        self.table_search.setHorizontalHeaderLabels(["Lần cuối", "Thời lượng", "Tiêu đề / URL", "Ứng dụng"])
+        self.table_search.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.table_search.setColumnWidth(0, 130)
+        self.table_search.setColumnWidth(1, 80)
+        self.table_search.setColumnWidth(3, 110)
+        self.table_search.verticalHeader().setVisible(False)
+        self.table_search.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table_search.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table_search.setStyleSheet("QTableWidget { background: #0f172a; color: white; border: none; }")
+        self.table_search.setToolTip("Click 1 dòng để xem chi tiết ngày đó")
+        # Click 1 kết quả -> xem chi tiết ngày đó
+        self.table_search.cellClicked.connect(self.on_search_result_click)
+        self.table_search.hide()
+        self.splitter.addWidget(self.table_search)
+
         # === 2. CHI TIẾT ===
         self.detail_container = QWidget()
         detail_layout = QVBoxLayout(self.detail_container)
@@ -119,51 +250,57 @@ class ReportTab(QWidget):
         self.layout.addWidget(self.splitter)
 
         self.splitter.setStretchFactor(0, 4)
-        self.splitter.setStretchFactor(1, 7)
+        self.splitter.setStretchFactor(1, 4)
+        self.splitter.setStretchFactor(2, 7)
 
     def load_data(self):
         """Hàm này được gọi mỗi khi chuyển Tab"""
         self.load_chart_data()
         self.load_daily_detail()
 
-    def load_chart_data(self):
-        days = 7 if self.combo_chart.currentIndex() == 0 else 30
-        history = get_historical_data(days)
+    def chart_days(self):
+        """Số ngày của khoảng đang chọn, None = toàn bộ lịch sử"""
+        return CHART_RANGES[max(self.combo_chart.currentIndex(), 0)][1]
 
+    def load_chart_data(self):
+        days = self.chart_days()
+        # Gộp ngày / tuần / tháng ngay trong SQL -> số điểm vẽ có giới hạn dù lịch sử dài bao nhiêu
+        self.query_service.submit('chart', self.render_chart, flushed(get_history_series), days)
+        today = datetime.date.today()
+        analytics_days = min(days or ANALYTICS_MAX_DAYS, ANALYTICS_MAX_DAYS)
+        self.query_service.submit('analytics', self.render_analytics, flushed(focus_analytics),
+                                  today - datetime.timedelta(days=analytics_days), today)
+
+    def render_chart(self, series, error=""):
         self.ax.clear()
         self.current_dates_map = []
 
-        if not history:
+        if not series or not series.points:
             self.canvas.draw()
             return
+        self.chart_start = datetime.date.fromisoformat(series.start)
 
         date_objs = []
         values = []
-
-        # Chuyển đổi dict history sang list để vẽ
-        sorted_keys = sorted(history.keys())  # Sắp xếp theo ngày
-
-        for date_str in sorted_keys:
-            try:
-                val = history[date_str]
-                d_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d")
-                date_objs.append(d_obj)
-                values.append(val)
-                self.current_dates_map.append(date_str)
-            except ValueError:
-                continue
+        for point in series.points:
+            date_objs.append(datetime.datetime.strptime(point.start, "%Y-%m-%d"))
+            # Nhóm tuần / tháng / năm: trung bình mỗi ngày để nhóm thiếu ngày (đầu / cuối khoảng) không bị thấp
+            values.append(point.minutes if series.bucket == 'day' else point.minutes / max(point.days, 1))
+            # Click vào 1 điểm -> xem ngày đầu nhóm
+            self.current_dates_map.append(point.start)
+        date_format, value_label = BUCKET_LABELS[series.bucket]
 
         # Setup giao diện biểu đồ
         self.figure.patch.set_facecolor('#1e293b')
         self.ax.set_facecolor('#1e293b')
 
-        self.ax.plot(date_objs, values, marker='o', color='#3b82f6', linewidth=2)
+        self.ax.plot(date_objs, values, marker='o' if len(values) <= 60 else None, color='#3b82f6', linewidth=2)
         self.ax.fill_between(date_objs, values, color='#3b82f6', alpha=0.15)
 
-        myFmt = mdates.DateFormatter('%d/%m')
+        myFmt = mdates.DateFormatter(date_format)
         self.ax.xaxis.set_major_formatter(myFmt)
 
-        self.ax.set_ylabel("Phút", color='#94a3b8', fontsize=9)
+        self.ax.set_ylabel(value_label, color='#94a3b8', fontsize=9)
         self.ax.tick_params(axis='x', colors='#cbd5e1', labelsize=8)
         self.ax.tick_params(axis='y', colors='#cbd5e1', labelsize=8)
         self.ax.grid(axis='y', color='#334155', linestyle='--', alpha=0.5)
@@ -175,6 +312,40 @@ class ReportTab(QWidget):
         self.figure.tight_layout()
         self.canvas.draw()
 
+    def render_analytics(self, data, error=""):
+        self.heat_ax.clear()
+        self.heat_figure.patch.set_facecolor('#1e293b')
+        self.heat_ax.set_facecolor('#1e293b')
+        if error or data is None:
+            self.lbl_analytics.setText("")
+            self.heat_canvas.draw()
+            return
+
+        self.heat_ax.imshow(data['heatmap'], aspect='auto', cmap=HEATMAP_CMAP, interpolation='nearest',
+                            vmin=0, vmax=max(1.0, data['heatmap'].max()))
+        self.heat_ax.set_yticks(range(7))
+        self.heat_ax.set_yticklabels(WEEKDAY_LABELS)
+        self.heat_ax.set_xticks(range(0, 24, 3))
+        self.heat_ax.set_xticklabels([f"{h}h" for h in range(0, 24, 3)])
+        start = datetime.date.fromisoformat(data['start']).strftime('%d/%m/%Y')
+        self.heat_ax.set_title(f"Phút tập trung / giờ (từ {start})", color='#cbd5e1', fontsize=9)
+        self.heat_ax.tick_params(colors='#cbd5e1', labelsize=8)
+        for s in self.heat_ax.spines.values(): s.set_visible(False)
+
+        # Tóm tắt: trung bình trượt của ngày cuối + giờ hay chuyển cửa sổ nhất
+        switches = data['switches_per_hour']
+        rolling = data['rolling_minutes']
+        parts = []
+        if len(rolling):
+            parts.append(f"TB 7 ngày: {rolling[-1]:.0f} phút/ngày")
+        if switches.max() > 0:
+            peak = int(switches.argmax())
+            parts.append(f"Chuyển cửa sổ nhiều nhất lúc {peak}h ({switches[peak]:.0f} lần/giờ)")
+        self.lbl_analytics.setText(" • ".join(parts))
+
+        self.heat_figure.tight_layout()
+        self.heat_canvas.draw()
+
     def on_chart_click(self, event):
         """Khi click vào điểm trên biểu đồ -> Load dữ liệu ngày đó"""
         if event.inaxes != self.ax or event.xdata is None: return
@@ -192,15 +363,33 @@ class ReportTab(QWidget):
             pass
 
     def load_daily_detail(self):
+        # Hiện trạng thái đang tải ngay, truy vấn thật chạy sau khi người dùng ngừng đổi ngày
+        display_date = self.date_picker.date().toString('dd/MM')
+        self.lbl_total_time.setText(f"⏳ Đang tải ngày {display_date}...")
+        self.lbl_total_time.setStyleSheet("font-size: 18px; font-weight: bold; color: #94a3b8; margin-bottom: 5px;")
+        self.lbl_advice_content.setText("...")
+        self.table_sessions.setEnabled(False)
+        self.table_apps.setEnabled(False)
+        self.detail_timer.start()
+
+    def request_daily_detail(self):
         # 1. Lấy ngày từ Picker và CHUYỂN ĐỔI sang Python Date
         qdate = self.date_picker.date()
         # Chuyển đổi quan trọng: QDate (Qt) -> Python date object
         py_date = datetime.date(qdate.year(), qdate.month(), qdate.day())
+        self.query_service.submit('detail', lambda data, error: self.render_daily_detail(qdate, data, error),
+                                  flushed(fetch_daily_detail), py_date)
 
+    def render_daily_detail(self, qdate, data, error=""):
+        self.table_sessions.setEnabled(True)
+        self.table_apps.setEnabled(True)
         display_date = qdate.toString('dd/MM')
+        if error or data is None:
+            self.lbl_total_time.setText(f"⚠️ Không tải được dữ liệu ngày {display_date}")
+            return
 
         # 2. Load Tổng quan
-        time_str, total_min = get_total_work_time_str(py_date)
+        time_str, total_min = data['time_str'], data['total_min']
         self.lbl_total_time.setText(f"⏱ Ngày {display_date}: {time_str}")
 
         color = "#10b981"
@@ -211,13 +400,13 @@ class ReportTab(QWidget):
         self.lbl_total_time.setStyleSheet(f"font-size: 18px; font-weight: bold; color: {color}; margin-bottom: 5px;")
 
         # 3. Load Lời khuyên
-        health_report = get_daily_health_report(py_date)
+        health_report = data['health']
         self.lbl_advice_content.setText(health_report['advice'])
         self.advice_card.setStyleSheet(
             f"background: #0f172a; border-radius: 8px; border-left: 5px solid {health_report['color']}; padding: 10px;")
 
         # 4. Load Bảng chi tiết
-        sessions, app_stats = get_daily_breakdown(py_date)
+        sessions, app_stats = data['sessions'], data['app_stats']
 
         # Fill bảng Sessions
         self.table_sessions.setRowCount(0)
@@ -254,4 +443,126 @@ class ReportTab(QWidget):
                 item_name.setForeground(QColor("#f59e0b"))
 
             self.table_apps.setItem(row, 0, item_name)
-            self.table_apps.setItem(row, 1, QTableWidgetItem(f"{app.count} p"))
\ No newline at end of file
+            seconds = app.seconds or 0
+            time_text = f"{seconds // 60} p" if seconds >= 60 else f"{seconds} s"
+            self.table_apps.setItem(row, 1, QTableWidgetItem(time_text))
+
+    # --- TÌM KIẾM ---
+    def start_search(self):
+        self.search_text = self.search_box.text().strip()
+        self.search_cursors = [None]
+        if not self.search_text:
+            self.query_service.cancel('search')
+            self.table_search.hide()
+            self.lbl_search.setText("")
+            self.btn_search_prev.setEnabled(False)
+            self.btn_search_next.setEnabled(False)
+            return
+        self.request_search_page(0)
+
+    def request_search_page(self, page):
+        if not self.search_text or not 0 <= page < len(self.search_cursors):
+            return
+        self.search_page = page
+        self.lbl_search.setText("⏳ Đang tìm...")
+        self.btn_search_prev.setEnabled(False)
+        self.btn_search_next.setEnabled(False)
+        text = self.search_text
+        self.query_service.submit('search', lambda data, error: self.render_search(text, page, data, error),
+                                  flushed(search_activity), text, PAGE_SIZE, self.search_cursors[page])
+
+    def render_search(self, text, page, data, error=""):
+        if text != self.search_text:
+            return
+        if error or data is None:
+            self.lbl_search.setText("⚠️ Không tìm được")
+            return
+        # Ghi nhớ con trỏ của trang kế tiếp
+        del self.search_cursors[page + 1:]
+        if data.next_cursor:
+            self.search_cursors.append(data.next_cursor)
+
+        self.table_search.setRowCount(0)
+        for hit in data.hits:
+            row = self.table_search.rowCount()
+            self.table_search.insertRow(row)
+            time_item = QTableWidgetItem(hit.timestamp.strftime('%d/%m/%Y %H:%M'))
+            time_item.setData(Qt.UserRole, hit.timestamp.strftime('%Y-%m-%d'))
+            self.table_search.setItem(row, 0, time_item)
+            seconds = hit.duration or 0
+            self.table_search.setItem(row, 1, QTableWidgetItem(f"{seconds // 60} p" if seconds >= 60 else f"{seconds} s"))
+            # Mỗi dòng là 1 tiêu đề / URL khớp, kèm span gần nhất của nó
+            display_name = hit.window_title if hit.kind == 'title' else "🔗 " + (hit.url or "")
+            item_name = QTableWidgetItem(display_name)
+            item_name.setToolTip("\n".join(filter(None, (hit.window_title, hit.url))))
+            if hit.category == "Distraction":
+                item_name.setForeground(QColor("#f59e0b"))
+            self.table_search.setItem(row, 2, item_name)
+            self.table_search.setItem(row, 3, QTableWidgetItem(hit.process_name))
+        self.table_search.show()
+
+        if data.hits or page:
+            self.lbl_search.setText(f"{data.matched} tiêu đề/URL khớp · trang {page + 1}")
+        else:
+            self.lbl_search.setText("Không có kết quả")
+        self.btn_search_prev.setEnabled(page > 0)
+        self.btn_search_next.setEnabled(data.next_cursor is not None)
+
+    def on_search_result_click(self, row, column):
+        item = self.table_search.item(row, 0)
+        if item:
+            # Set lại DatePicker -> Sẽ tự trigger load_daily_detail
+            self.date_picker.setDate(QDate.fromString(item.data(Qt.UserRole), "yyyy-MM-dd"))
+
+    # --- XUẤT DỮ LIỆU ---
+    def export_data(self):
+        if self.export_worker and self.export_worker.isRunning():
+            return
+        formats = available_formats()
+        path, selected = QFileDialog.getSaveFileName(self, "Xuất dữ liệu", "codefocus-export",
+                                                     ";;".join(EXPORT_FILTERS[f] for f in formats))
+        if not path:
+            return
+        self.start_export(path, selected)
+
+    def start_export(self, path, selected_filter=""):
+        formats = available_formats()
+        prefix, ext = os.path.splitext(path)
+        fmt = next((f for f in formats if EXPORT_FILTERS[f] == selected_filter), ext.lstrip('.').lower())
+        if fmt not in formats:
+            fmt = 'csv'
+
+        # Khoảng ngày giống biểu đồ, tính tới ngày đang chọn
+        qdate = self.date_picker.date()
+        end = datetime.date(qdate.year(), qdate.month(), qdate.day())
+        days = self.chart_days()
+        if days is None:
+            start = min(self.chart_start or end, end)
+        else:
+            start = end - datetime.timedelta(days=days)
+
+        self.export_worker = ExportWorker(prefix, start, end, fmt)
+        self.export_worker.progress.connect(self.show_export_progress)
+        self.export_worker.done.connect(self.on_export_done)
+        self.btn_export.setEnabled(False)
+        self.export_bar.setValue(0)
+        self.export_bar.show()
+        self.export_worker.start()
+
+    def show_export_progress(self, written, total):
+        self.export_bar.setMaximum(max(total, 1))
+        self.export_bar.setValue(min(written, max(total, 1)))
+
+    def on_export_done(self, files, error):
+        self.export_bar.hide()
+        self.btn_export.setEnabled(True)
+        if error:
+            QMessageBox.warning(self, "Xuất dữ liệu", f"Lỗi khi xuất dữ liệu:\n{error}")
+        else:
+            QMessageBox.information(self, "Xuất dữ liệu", "Đã xuất:\n" + "\n".join(files))
+
+    def stop_export(self):
+        """Gọi khi thoát app"""
+        if self.export_worker and self.export_worker.isRunning():
+            self.export_worker.cancel()
+            self.export_worker.wait()
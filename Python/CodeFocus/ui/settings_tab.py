@@ -1,10 +1,9 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
                                QLineEdit, QPushButton, QLabel, QComboBox, QSpinBox, QFrame,
-                               QListWidgetItem, QGraphicsDropShadowEffect)
+                               QListWidgetItem, QGraphicsDropShadowEffect, QProgressBar)
 from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, QPoint
 from PySide6.QtGui import QFont, QColor
-from database.db_manager import (get_blacklist, add_to_blacklist, remove_from_blacklist,
-                                 get_setting, update_setting)
+from core.settings_store import get_settings_store
 
 
 # --- GIỮ NGUYÊN CLASS ToastNotification NHƯ CŨ ---
@@ -91,6 +90,8 @@ class SettingsTab(QWidget):
     def __init__(self, main_window_ref):
         super().__init__()
         self.main_window = main_window_ref
+        self.settings = get_settings_store()
+        self.settings.blacklist_changed.connect(self.load_list)
 
         # Main Layout
         self.layout = QVBoxLayout()
@@ -116,30 +117,56 @@ class SettingsTab(QWidget):
         grid_timers.setSpacing(10)
 
         # 1. Thời gian làm việc
-        self.spin_time = self._create_spinbox(int(get_setting('pomodoro_minutes', 25)), " phút")
+        self.spin_time = self._create_spinbox(self.settings.get_int('pomodoro_minutes'), " phút")
         grid_timers.addWidget(QLabel("🔥 Làm việc:", styleSheet="color: #e2e8f0; font-weight: bold;"), 0, 0)
         grid_timers.addWidget(self.spin_time, 0, 1)
 
         # 2. Thời gian nghỉ ngơi
-        self.spin_break = self._create_spinbox(int(get_setting('break_minutes', 5)), " phút")
+        self.spin_break = self._create_spinbox(self.settings.get_int('break_minutes'), " phút")
         self.spin_break.setRange(1, 60)
         grid_timers.addWidget(QLabel("☕ Nghỉ ngơi:", styleSheet="color: #e2e8f0; font-weight: bold;"), 0, 2)
         grid_timers.addWidget(self.spin_break, 0, 3)
 
         # 3. Thời gian ân hạn
-        current_grace = int(get_setting('grace_period_seconds', 60))
+        current_grace = self.settings.get_int('grace_period_seconds')
         self.spin_grace = self._create_spinbox(current_grace, " giây")
         self.spin_grace.setRange(5, 300)
         grid_timers.addWidget(QLabel("⚠️ Ân hạn:", styleSheet="color: #f59e0b; font-weight: bold;"), 1, 0)
         grid_timers.addWidget(self.spin_grace, 1, 1)
 
         # 4. [MỚI] Thời gian ghi Log
-        current_log = int(get_setting('log_interval_seconds', 30))
+        current_log = self.settings.get_int('log_interval_seconds')
         self.spin_log = self._create_spinbox(current_log, " giây")
         self.spin_log.setRange(5, 300)  # Từ 5s đến 300s
         grid_timers.addWidget(QLabel("📝 Ghi log:", styleSheet="color: #60a5fa; font-weight: bold;"), 1, 2)
         grid_timers.addWidget(self.spin_log, 1, 3)
 
+        # 5. Nhịp quét nhanh nhất (khi đang đếm ngược vi phạm)
+        current_min_rate = self.settings.get_int('monitor_min_interval_ms')
+        self.spin_rate_min = self._create_spinbox(current_min_rate, " ms")
+        self.spin_rate_min.setRange(100, 1000)
+        self.spin_rate_min.setSingleStep(50)
+        self.spin_rate_min.setValue(current_min_rate)  # Đặt lại sau setRange (range mặc định chỉ tới 120)
+        grid_timers.addWidget(QLabel("⚡ Quét nhanh:", styleSheet="color: #10b981; font-weight: bold;"), 2, 0)
+        grid_timers.addWidget(self.spin_rate_min, 2, 1)
+
+        # 6. Nhịp quét chậm nhất (khi rảnh / cửa sổ đứng yên lâu)
+        current_max_rate = self.settings.get_int('monitor_max_interval_seconds')
+        self.spin_rate_max = self._create_spinbox(current_max_rate, " giây")
+        self.spin_rate_max.setRange(1, 60)
+        grid_timers.addWidget(QLabel("🐢 Quét chậm:", styleSheet="color: #94a3b8; font-weight: bold;"), 2, 2)
+        grid_timers.addWidget(self.spin_rate_max, 2, 3)
+
+        # 7. Số ngày giữ log chi tiết trong DB (cũ hơn -> chuyển ra file nén)
+        current_retention = self.settings.get_int('retention_days')
+        self.spin_retention = self._create_spinbox(current_retention, " ngày")
+        self.spin_retention.setRange(0, 3650)
+        self.spin_retention.setSingleStep(30)
+        self.spin_retention.setSpecialValueText("Mãi mãi")
+        self.spin_retention.setValue(current_retention)
+        grid_timers.addWidget(QLabel("🗄️ Giữ log:", styleSheet="color: #a78bfa; font-weight: bold;"), 3, 0)
+        grid_timers.addWidget(self.spin_retention, 3, 1)
+
         time_layout.addLayout(grid_timers)
 
         # Hàng nút bấm
@@ -166,7 +193,19 @@ class SettingsTab(QWidget):
             }
             QPushButton:hover { background: #1d4ed8; }
         """)
+        # Độ trễ từng bước của Monitor (cũng mở được bằng Ctrl+Shift+P)
+        btn_profile = QPushButton("📈 Hiệu năng Monitor")
+        btn_profile.clicked.connect(lambda: self.main_window.show_monitor_profile())
+        btn_profile.setCursor(Qt.PointingHandCursor)
+        btn_profile.setFixedHeight(40)
+        btn_profile.setStyleSheet("""
+            QPushButton {
+                background: #334155; color: white; border-radius: 8px; font-weight: bold; padding: 0 15px;
+            }
+            QPushButton:hover { background: #475569; }
+        """)
         btn_row.addWidget(btn_suggest)
+        btn_row.addWidget(btn_profile)
         btn_row.addStretch()
         btn_row.addWidget(btn_save)
         time_layout.addLayout(btn_row)
@@ -240,6 +279,20 @@ class SettingsTab(QWidget):
         """)
         blacklist_layout.addWidget(btn_del)
 
+        # Tiến độ phân loại lại lịch sử (chỉ hiện khi Blacklist vừa thay đổi)
+        self.reclassify_bar = QProgressBar()
+        self.reclassify_bar.setFixedHeight(18)
+        self.reclassify_bar.setFormat("🔄 Đang phân loại lại lịch sử... %p%")
+        self.reclassify_bar.setStyleSheet("""
+            QProgressBar {
+                background: #1a202c; color: #f7fafc; border: 1px solid #2d3748;
+                border-radius: 6px; text-align: center; font-size: 9pt;
+            }
+            QProgressBar::chunk { background: #3b82f6; border-radius: 6px; }
+        """)
+        self.reclassify_bar.hide()
+        blacklist_layout.addWidget(self.reclassify_bar)
+
         self.layout.addWidget(blacklist_frame)
 
         # INIT TOAST
@@ -298,19 +351,26 @@ class SettingsTab(QWidget):
         break_min = self.spin_break.value()
         grace_sec = self.spin_grace.value()
         log_sec = self.spin_log.value()  # Lấy giá trị Log
-
-        update_setting('pomodoro_minutes', work_min)
-        update_setting('break_minutes', break_min)
-        update_setting('grace_period_seconds', grace_sec)
-        update_setting('log_interval_seconds', log_sec)  # Lưu vào DB
-
-        self.main_window.refresh_settings()
+        rate_min_ms = self.spin_rate_min.value()
+        rate_max_sec = self.spin_rate_max.value()
+        retention_days = self.spin_retention.value()
+
+        # Ghi xuống DB; MainWindow nhận signal changed và chỉ áp dụng các key đã đổi
+        self.settings.update({
+            'pomodoro_minutes': work_min,
+            'break_minutes': break_min,
+            'grace_period_seconds': grace_sec,
+            'log_interval_seconds': log_sec,
+            'monitor_min_interval_ms': rate_min_ms,
+            'monitor_max_interval_seconds': rate_max_sec,
+            'retention_days': retention_days,
+        })
 
         self.toast.show_toast(f"✅ Đã lưu cấu hình thành công!", "success")
 
     def load_list(self):
         self.list_widget.clear()
-        apps, urls = get_blacklist()
+        apps, urls = self.settings.get_blacklist()
         for u in urls:
             item = QListWidgetItem(f"🌐 {u}")
             item.setFont(QFont("Segoe UI", 10))
@@ -332,12 +392,9 @@ class SettingsTab(QWidget):
 
         item_type = 'app' if is_app else 'url'
 
-        if add_to_blacklist(text, item_type):
+        # blacklist_changed -> load_list() + MainWindow.on_blacklist_changed()
+        if self.settings.add_to_blacklist(text, item_type):
             self.txt_input.clear()
-            self.load_list()
-            if hasattr(self.main_window, 'refresh_settings'):
-                self.main_window.refresh_settings()
-
             msg = f"✅ Đã thêm: {text}"
             self.toast.show_toast(msg, "success")
             self.txt_input.setFocus()
@@ -353,10 +410,17 @@ class SettingsTab(QWidget):
         text = self.list_widget.item(row).text()
         val = text.split(" ", 1)[1]
 
-        remove_from_blacklist(val)
-        self.load_list()
+        self.settings.remove_from_blacklist(val)
+        self.toast.show_toast("🗑️ Đã xóa mục khỏi danh sách", "success")
 
-        if hasattr(self.main_window, 'refresh_settings'):
-            self.main_window.refresh_settings()
+    def show_reclassify_progress(self, processed, total):
+        self.reclassify_bar.setMaximum(max(total, 1))
+        self.reclassify_bar.setValue(min(processed, max(total, 1)))
+        self.reclassify_bar.show()
 
-        self.toast.show_toast("🗑️ Đã xóa mục khỏi danh sách", "success")
\ No newline at end of file
+    def finish_reclassify(self, changed):
+        self.reclassify_bar.hide()
+        if changed > 0:
+            self.toast.show_toast(f"🔄 Đã cập nhật lại {changed} bản ghi lịch sử", "info")
+        elif changed < 0:
+            self.toast.show_toast("⚠️ Lỗi khi phân loại lại lịch sử", "error")
\ No newline at end of file